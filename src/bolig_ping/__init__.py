@@ -1 +1,4 @@
 """Get a ping when your dream home becomes available."""
+
+from .client import BoligPing
+from .data_models import Circle, Home, HomeChange, Polygon, SearchQuery
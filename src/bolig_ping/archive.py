@@ -0,0 +1,263 @@
+"""Local archive of homes and their descriptions, with an index for keyword queries.
+
+The descriptions are normalised, and every trigram of the normalised descriptions is
+stored in an inverted index. A keyword query is answered by intersecting the postings of
+the trigrams of the query, and then verifying the few candidates, which only requires
+the network for homes that are not yet in the archive.
+"""
+
+import datetime as dt
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+
+from .cache import connect_to_cache
+from .data_models import Home
+
+# Archived descriptions older than this are neither used nor kept
+ARCHIVE_MAX_AGE = dt.timedelta(days=30)
+
+
+def normalise_text(text: str) -> str:
+    """Normalise a Danish text for keyword matching.
+
+    The text is Unicode normalised and case folded, the old spelling "aa" is replaced by
+    "å", and all runs of non-alphanumeric characters are replaced by a single space.
+
+    Args:
+        text:
+            The text to normalise.
+
+    Returns:
+        The normalised text.
+
+    Example:
+        >>> normalise_text("Dejligt  BADEKAR, tæt på Aabenraa-centret!")
+        'dejligt badekar tæt på åbenrå centret '
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = text.replace("aa", "å")
+    return re.sub(r"[\W_]+", " ", text)
+
+
+def get_trigrams(text: str) -> set[str]:
+    """Get the trigrams of a normalised text.
+
+    Args:
+        text:
+            The normalised text.
+
+    Returns:
+        The trigrams of the text.
+
+    Example:
+        >>> sorted(get_trigrams("altan"))
+        ['alt', 'lta', 'tan']
+    """
+    return {text[idx : idx + 3] for idx in range(len(text) - 2)}
+
+
+def matches_queries(description: str, queries: list[str]) -> bool:
+    """Check if a description contains any of the keyword queries.
+
+    Args:
+        description:
+            The description to check.
+        queries:
+            The keyword queries.
+
+    Returns:
+        True if the normalised description contains any normalised query.
+    """
+    normalised_description = normalise_text(text=description)
+    return any(
+        normalise_text(text=query).strip() in normalised_description
+        for query in queries
+    )
+
+
+def archive_homes(
+    homes: list[Home], cache_path: Path = Path(".bolig_ping_cache")
+) -> None:
+    """Store homes with fetched descriptions in the archive.
+
+    Homes whose descriptions have not been fetched, or are not available, are skipped.
+
+    Args:
+        homes:
+            The homes to archive.
+        cache_path (optional):
+            The path to the cache file storing the archive. Defaults to
+            ".bolig_ping_cache".
+    """
+    now = int(time.time())
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_archive_tables(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        for home in homes:
+            if not home.description_is_fetched() or home.description is None:
+                continue
+            home_id = home.url.split("/")[-1]
+            normalised_description = normalise_text(text=home.description)
+            connection.execute(
+                "INSERT OR REPLACE INTO archive_homes VALUES (?, ?, ?, ?)",
+                (home_id, home.description, normalised_description, now),
+            )
+            connection.execute(
+                "DELETE FROM archive_trigrams WHERE home_id = ?", (home_id,)
+            )
+            connection.executemany(
+                "INSERT INTO archive_trigrams VALUES (?, ?)",
+                (
+                    (trigram, home_id)
+                    for trigram in get_trigrams(text=normalised_description)
+                ),
+            )
+        connection.execute("COMMIT")
+
+
+def load_archived_descriptions(
+    homes: list[Home],
+    cache_path: Path = Path(".bolig_ping_cache"),
+    max_age: dt.timedelta = ARCHIVE_MAX_AGE,
+) -> list[Home]:
+    """Set the descriptions of the homes that are in the archive.
+
+    Args:
+        homes:
+            The homes to load the descriptions of.
+        cache_path (optional):
+            The path to the cache file storing the archive. Defaults to
+            ".bolig_ping_cache".
+        max_age (optional):
+            Descriptions archived longer ago than this are ignored. Defaults to 30
+            days.
+
+    Returns:
+        The homes whose descriptions were loaded from the archive.
+    """
+    home_ids = {home.url.split("/")[-1]: home for home in homes}
+    cutoff = time.time() - max_age.total_seconds()
+    archived_homes: list[Home] = list()
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_archive_tables(connection=connection)
+        connection.execute("CREATE TEMPORARY TABLE wanted (home_id TEXT PRIMARY KEY)")
+        connection.executemany(
+            "INSERT OR IGNORE INTO wanted VALUES (?)", ((id_,) for id_ in home_ids)
+        )
+        for home_id, description in connection.execute(
+            "SELECT archive_homes.home_id, description FROM archive_homes "
+            "JOIN wanted ON archive_homes.home_id = wanted.home_id "
+            "WHERE updated >= ?",
+            (cutoff,),
+        ):
+            home = home_ids[home_id]
+            home.set_description(description=description)
+            archived_homes.append(home)
+    return archived_homes
+
+
+def prune_archive(
+    cache_path: Path = Path(".bolig_ping_cache"),
+    max_age: dt.timedelta = ARCHIVE_MAX_AGE,
+) -> int:
+    """Remove the expired homes from the archive, along with their trigrams.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file storing the archive. Defaults to
+            ".bolig_ping_cache".
+        max_age (optional):
+            Homes archived longer ago than this are removed. Defaults to 30 days.
+
+    Returns:
+        The number of homes removed from the archive.
+    """
+    if not cache_path.exists():
+        return 0
+
+    cutoff = time.time() - max_age.total_seconds()
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_archive_tables(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute(
+            "DELETE FROM archive_trigrams WHERE home_id IN ("
+            "SELECT home_id FROM archive_homes WHERE updated < ?)",
+            (cutoff,),
+        )
+        num_removed = connection.execute(
+            "DELETE FROM archive_homes WHERE updated < ?", (cutoff,)
+        ).rowcount
+        connection.execute("COMMIT")
+    return num_removed
+
+
+def search_archive(
+    queries: list[str], cache_path: Path = Path(".bolig_ping_cache")
+) -> set[str]:
+    """Find the archived homes whose descriptions contain any of the keyword queries.
+
+    Args:
+        queries:
+            The keyword queries.
+        cache_path (optional):
+            The path to the cache file storing the archive. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        The IDs of the matching homes.
+    """
+    matching_ids: set[str] = set()
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_archive_tables(connection=connection)
+        for query in queries:
+            normalised_query = normalise_text(text=query).strip()
+            trigrams = sorted(get_trigrams(text=normalised_query))
+            if trigrams:
+                placeholders = ", ".join("?" for _ in trigrams)
+                candidates = connection.execute(
+                    "SELECT archive_homes.home_id, normalised FROM archive_homes "
+                    "WHERE home_id IN ("
+                    "SELECT home_id FROM archive_trigrams "
+                    f"WHERE trigram IN ({placeholders}) "
+                    "GROUP BY home_id HAVING count(*) = ?)",
+                    (*trigrams, len(trigrams)),
+                )
+            else:
+                candidates = connection.execute(
+                    "SELECT home_id, normalised FROM archive_homes"
+                )
+            matching_ids |= {
+                home_id
+                for home_id, normalised in candidates
+                if normalised_query in normalised
+            }
+    return matching_ids
+
+
+def create_archive_tables(connection: sqlite3.Connection) -> None:
+    """Create the tables storing the archive, if they do not exist.
+
+    Args:
+        connection:
+            The connection to the cache.
+    """
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS archive_homes ("
+        "home_id TEXT PRIMARY KEY, "
+        "description TEXT NOT NULL, "
+        "normalised TEXT NOT NULL, "
+        "updated INTEGER NOT NULL)"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS archive_trigrams ("
+        "trigram TEXT NOT NULL, "
+        "home_id TEXT NOT NULL, "
+        "PRIMARY KEY (trigram, home_id)) WITHOUT ROWID"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS archive_trigrams_home_id "
+        "ON archive_trigrams (home_id)"
+    )
@@ -1,59 +1,273 @@
-"""Cache to store already sent homes."""
+"""Cache to store already sent homes.
 
+The cache is an SQLite database, which allows several processes to share the same cache
+safely. Every (home, email) pair is stored at most once, so that a pair can be claimed
+atomically by inserting it, without having to lock the entire cache. Along with the time
+a home was first sent, we store the time it was last seen in a search, so that homes
+that are still on the market are never expired from the cache.
+"""
+
+import datetime as dt
 import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from collections.abc import Generator
+from contextlib import closing, contextmanager
 from pathlib import Path
 
 from .data_models import Home
 
+logger = logging.getLogger(__package__)
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# The share of free pages in the cache at which compacting it also rebuilds the file
+VACUUM_FREE_FRACTION = 0.25
+
+
+@contextmanager
+def connect_to_cache(
+    cache_path: Path = Path(".bolig_ping_cache"),
+) -> Generator[sqlite3.Connection, None, None]:
+    """Connect to the cache, creating it if it does not exist.
+
+    Legacy caches, which stored one JSON object per line, are migrated to the current
+    format.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file. Defaults to ".bolig_ping_cache".
+
+    Yields:
+        A connection to the cache, in autocommit mode.
+    """
+    migrate_legacy_cache(cache_path=cache_path)
+    with closing(
+        sqlite3.connect(cache_path, timeout=60, isolation_level=None)
+    ) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sent_homes ("
+            "home_id TEXT NOT NULL, "
+            "email TEXT NOT NULL, "
+            "timestamp INTEGER NOT NULL, "
+            "last_seen INTEGER NOT NULL, "
+            "PRIMARY KEY (home_id, email))"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS sent_homes_last_seen ON sent_homes (last_seen)"
+        )
+        yield connection
 
-def store_to_cache(
+
+def claim_homes_per_recipient(
     homes: list[Home], emails: list[str], cache_path: Path = Path(".bolig_ping_cache")
-) -> None:
-    """Store the homes to the cache.
+) -> dict[str, list[Home]]:
+    """Atomically store the homes to the cache, returning the new ones per recipient.
+
+    Each (home, email) pair is inserted with a statement that is ignored if the pair
+    already exists, so if several processes claim the same home at the same time,
+    exactly one of them succeeds. All the pairs are inserted in a single transaction, to
+    avoid committing once per pair, and whether an insertion succeeded tells whether the
+    home was new to that recipient, so no separate lookup is needed. The pairs that
+    already existed have their last seen timestamp refreshed, as the homes are still on
+    the market.
 
     Args:
         homes:
-            The homes to store in the cache.
+            The homes to claim.
         emails:
             The receiver(s) of the homes.
         cache_path (optional):
             The path to the cache file. Defaults to ".bolig_ping_cache".
+
+    Returns:
+        A dictionary mapping every email to the homes that were not already in the
+        cache for it, in their original order.
     """
-    homes = remove_cached_homes(homes=homes, emails=emails, cache_path=cache_path)
-    for email in emails:
-        added_homes: set[tuple[str, str]] = set()
-        with cache_path.open("a") as file:
-            for home in homes:
-                home_id = home.url.split("/")[-1]
-                if (home_id, email) in added_homes:
-                    continue
-                home_json = json.dumps(dict(id=home_id, email=email))
-                file.write(f"{home_json}\n")
-                added_homes.add((home_id, email))
-
-
-def remove_cached_homes(
+    timestamp = int(time.time())
+    claimed_homes: dict[str, list[Home]] = {email: list() for email in emails}
+    seen_pairs: list[tuple[str, str]] = list()
+    with connect_to_cache(cache_path=cache_path) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        for home in dict.fromkeys(homes):
+            home_id = home.url.split("/")[-1]
+            for email in claimed_homes:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO sent_homes "
+                    "(home_id, email, timestamp, last_seen) VALUES (?, ?, ?, ?)",
+                    (home_id, email, timestamp, timestamp),
+                )
+                if cursor.rowcount > 0:
+                    claimed_homes[email].append(home)
+                else:
+                    seen_pairs.append((home_id, email))
+        connection.executemany(
+            "UPDATE sent_homes SET last_seen = ? WHERE home_id = ? AND email = ?",
+            ((timestamp, home_id, email) for home_id, email in seen_pairs),
+        )
+        connection.execute("COMMIT")
+    return claimed_homes
+
+
+def release_homes(
     homes: list[Home], emails: list[str], cache_path: Path = Path(".bolig_ping_cache")
-) -> list[Home]:
-    """Remove the cached homes from the list of homes.
+) -> None:
+    """Remove the homes from the cache, so that they can be claimed again.
 
     Args:
         homes:
-            The homes to remove the cached homes from.
+            The homes to release.
         emails:
             The receiver(s) of the homes.
         cache_path (optional):
             The path to the cache file. Defaults to ".bolig_ping_cache".
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        connection.executemany(
+            "DELETE FROM sent_homes WHERE home_id = ? AND email = ?",
+            ((home.url.split("/")[-1], email) for home in homes for email in emails),
+        )
+
+
+def compact_cache(
+    cache_path: Path = Path(".bolig_ping_cache"),
+    max_age: dt.timedelta | None = None,
+    max_entries: int | None = None,
+) -> int:
+    """Compact the cache, removing expired and surplus entries.
+
+    Entries expire and are evicted based on when their home was last seen in a search,
+    so homes that are still on the market are only removed if the cache is full of
+    homes seen more recently. The entries are removed in a single transaction, so that
+    other processes never see a partially compacted cache. As the cache is shared with
+    the other tables of the package, the file is only rebuilt when at least
+    `VACUUM_FREE_FRACTION` of its pages are free, rather than whenever an entry is
+    removed.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file. Defaults to ".bolig_ping_cache".
+        max_age (optional):
+            Entries whose home has not been seen for this long are removed. Can be None
+            to keep entries of any age. Defaults to None.
+        max_entries (optional):
+            The maximum number of entries to keep, where the most recently seen entries
+            are kept. Can be None to keep any number of entries. Defaults to None.
+
+    Returns:
+        The number of entries removed from the cache.
+    """
+    if not cache_path.exists():
+        return 0
+
+    num_removed = 0
+    with connect_to_cache(cache_path=cache_path) as connection:
+        connection.execute("BEGIN IMMEDIATE")
+        if max_age is not None:
+            cutoff = time.time() - max_age.total_seconds()
+            num_removed += connection.execute(
+                "DELETE FROM sent_homes WHERE last_seen < ?", (cutoff,)
+            ).rowcount
+        if max_entries is not None:
+            num_removed += connection.execute(
+                "DELETE FROM sent_homes WHERE rowid NOT IN ("
+                "SELECT rowid FROM sent_homes ORDER BY last_seen DESC LIMIT ?)",
+                (max_entries,),
+            ).rowcount
+        connection.execute("COMMIT")
+        (num_free_pages,) = connection.execute("PRAGMA freelist_count").fetchone()
+        (num_pages,) = connection.execute("PRAGMA page_count").fetchone()
+        if num_removed and num_free_pages >= VACUUM_FREE_FRACTION * num_pages:
+            connection.execute("VACUUM")
+    return num_removed
+
+
+def migrate_legacy_cache(cache_path: Path = Path(".bolig_ping_cache")) -> None:
+    """Migrate a legacy cache, storing one JSON object per line, to an SQLite cache.
+
+    The new cache is built in a temporary file, which then atomically replaces the
+    legacy cache. A lock file ensures that only one process migrates the cache.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file. Defaults to ".bolig_ping_cache".
+    """
+    if not is_legacy_cache(cache_path=cache_path):
+        return
+
+    lock_path = cache_path.with_name(f"{cache_path.name}.lock")
+    try:
+        lock = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Another process is migrating the cache, so we wait for it to finish. If the
+        # lock is stale then the other process crashed, and we start over
+        while lock_path.exists():
+            try:
+                if time.time() - lock_path.stat().st_mtime > 60:
+                    lock_path.unlink(missing_ok=True)
+                    return migrate_legacy_cache(cache_path=cache_path)
+            except FileNotFoundError:
+                break
+            time.sleep(0.1)
+        return
+
+    try:
+        if not is_legacy_cache(cache_path=cache_path):
+            return
+        now = int(time.time())
+        with tempfile.NamedTemporaryFile(
+            dir=cache_path.parent, prefix=f"{cache_path.name}.", delete=False
+        ) as file:
+            temporary_path = Path(file.name)
+        with closing(sqlite3.connect(temporary_path)) as connection, connection:
+            connection.execute(
+                "CREATE TABLE sent_homes ("
+                "home_id TEXT NOT NULL, "
+                "email TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, "
+                "last_seen INTEGER NOT NULL, "
+                "PRIMARY KEY (home_id, email))"
+            )
+            # The legacy cache did not store when the homes were last seen, so we
+            # assume that they were last seen when they were sent
+            with cache_path.open() as file:
+                connection.executemany(
+                    "INSERT INTO sent_homes VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT DO UPDATE SET timestamp = "
+                    "max(timestamp, excluded.timestamp), last_seen = "
+                    "max(last_seen, excluded.last_seen)",
+                    (
+                        (
+                            json_data["id"],
+                            json_data["email"],
+                            json_data.get("timestamp", now),
+                            json_data.get("timestamp", now),
+                        )
+                        for json_data in map(json.loads, filter(str.strip, file))
+                    ),
+                )
+        os.replace(temporary_path, cache_path)
+        logger.info(f"Migrated the cache at {cache_path} to the new cache format.")
+    finally:
+        os.close(lock)
+        lock_path.unlink(missing_ok=True)
+
+
+def is_legacy_cache(cache_path: Path) -> bool:
+    """Check if a cache file uses the legacy format of one JSON object per line.
+
+    Args:
+        cache_path:
+            The path to the cache file.
 
     Returns:
-        The homes without the cached homes.
+        True if the cache is a non-empty legacy cache, False otherwise.
     """
-    cache_path.touch(exist_ok=True)
-    with cache_path.open() as file:
-        for line in file:
-            json_data = json.loads(line)
-            if any(json_data["email"] == email for email in emails):
-                homes = [
-                    home for home in homes if home.url.split("/")[-1] != json_data["id"]
-                ]
-    return homes
+    if not cache_path.exists() or cache_path.stat().st_size == 0:
+        return False
+    with cache_path.open("rb") as file:
+        return file.read(len(SQLITE_HEADER)) != SQLITE_HEADER
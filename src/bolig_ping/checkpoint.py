@@ -0,0 +1,108 @@
+"""Checkpoints of scraping progress, allowing interrupted scrapes to be resumed."""
+
+import datetime as dt
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic import BaseModel, Field, ValidationError
+
+from .data_models import Home, SearchQuery
+
+logger = logging.getLogger(__package__)
+
+
+class ScrapeCheckpoint(BaseModel):
+    """The progress of a scrape of a search query."""
+
+    fingerprint: str
+    total_hits: int = Field(ge=0)
+    num_pages: int = Field(ge=1)
+    pages: dict[int, list[Home]] = Field(default_factory=dict)
+    timestamp: float = Field(default_factory=time.time)
+
+
+def get_fingerprint(search_query: SearchQuery) -> str:
+    """Get a fingerprint of the search parameters sent to the API.
+
+    Args:
+        search_query:
+            The search query to get the fingerprint of.
+
+    Returns:
+        The fingerprint of the search query.
+    """
+    return hashlib.sha256(search_query.get_url().encode()).hexdigest()[:16]
+
+
+def load_checkpoint(
+    search_query: SearchQuery,
+    checkpoint_dir: Path = Path(".bolig_ping_checkpoints"),
+    max_age: dt.timedelta = dt.timedelta(hours=1),
+) -> ScrapeCheckpoint | None:
+    """Load the checkpoint of a search query.
+
+    Args:
+        search_query:
+            The search query to load the checkpoint of.
+        checkpoint_dir (optional):
+            The directory containing the checkpoints. Defaults to
+            ".bolig_ping_checkpoints".
+        max_age (optional):
+            Checkpoints older than this are ignored. Defaults to 1 hour.
+
+    Returns:
+        The checkpoint, or None if there is no fresh and valid checkpoint.
+    """
+    fingerprint = get_fingerprint(search_query=search_query)
+    checkpoint_path = checkpoint_dir / f"{fingerprint}.json"
+    if not checkpoint_path.exists():
+        return None
+    try:
+        checkpoint = ScrapeCheckpoint.model_validate_json(checkpoint_path.read_text())
+    except (OSError, ValidationError) as e:
+        logger.warning(f"Ignoring invalid checkpoint {checkpoint_path}: {e}")
+        return None
+    if time.time() - checkpoint.timestamp > max_age.total_seconds():
+        return None
+    return checkpoint
+
+
+def save_checkpoint(
+    checkpoint: ScrapeCheckpoint, checkpoint_dir: Path = Path(".bolig_ping_checkpoints")
+) -> None:
+    """Save a checkpoint, atomically replacing any existing one.
+
+    Args:
+        checkpoint:
+            The checkpoint to save.
+        checkpoint_dir (optional):
+            The directory containing the checkpoints. Defaults to
+            ".bolig_ping_checkpoints".
+    """
+    checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint.timestamp = time.time()
+    with tempfile.NamedTemporaryFile(
+        mode="w", dir=checkpoint_dir, suffix=".tmp", delete=False
+    ) as file:
+        file.write(checkpoint.model_dump_json())
+    os.replace(file.name, checkpoint_dir / f"{checkpoint.fingerprint}.json")
+
+
+def delete_checkpoint(
+    search_query: SearchQuery, checkpoint_dir: Path = Path(".bolig_ping_checkpoints")
+) -> None:
+    """Delete the checkpoint of a search query, if it exists.
+
+    Args:
+        search_query:
+            The search query to delete the checkpoint of.
+        checkpoint_dir (optional):
+            The directory containing the checkpoints. Defaults to
+            ".bolig_ping_checkpoints".
+    """
+    fingerprint = get_fingerprint(search_query=search_query)
+    (checkpoint_dir / f"{fingerprint}.json").unlink(missing_ok=True)
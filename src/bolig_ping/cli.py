@@ -1,24 +1,41 @@
 """Command line interface for the project."""
 
+import contextlib
+import datetime as dt
+import functools
 import logging
+import multiprocessing
 import os
+import time
+from collections.abc import Callable
 from pathlib import Path
 
 import click
+import requests
 from dotenv import load_dotenv
 
-from .cache import remove_cached_homes, store_to_cache
-from .data_models import SearchQuery
+from .archive import prune_archive
+from .cache import claim_homes_per_recipient, compact_cache, release_homes
+from .client import BoligPing
+from .data_models import Circle, Home, HomeChange, Polygon, SearchQuery
+from .deadline import Deadline
+from .digest import add_to_digest, mark_digest_sent, pop_due_digest
 from .email import compose_email, send_emails
-from .filtering import filter_results
-from .scraper import scrape_results
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s ⋅ %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+from .filtering import filter_by_listing
+from .jobs import (
+    SavedSearch,
+    add_saved_search,
+    list_saved_searches,
+    remove_saved_search,
+    run_worker,
 )
-logger = logging.getLogger(__package__)
+from .output import HomeWriter, OutputFormat, get_writer
+from .polling import PollingSchedule
+from .scraper import ScrapeStatus
+from .snapshots import find_changes, update_snapshots
+from .webhook import WebhookFormat, WebhookNotifier
 
-load_dotenv(dotenv_path=".env")
+logger = logging.getLogger(__package__)
 
 
 @click.command("bolig_ping")
@@ -84,6 +101,20 @@ load_dotenv(dotenv_path=".env")
     default=None,
     help="The type of property to search for.",
 )
+@click.option(
+    "--near",
+    type=str,
+    multiple=True,
+    help="Only include homes within a radius of a point, given as "
+    "`<latitude>,<longitude>,<radius-in-km>`.",
+)
+@click.option(
+    "--polygon",
+    type=str,
+    multiple=True,
+    help="Only include homes inside a polygon, given as its vertices "
+    "`<latitude>,<longitude>;<latitude>,<longitude>;...`.",
+)
 @click.option(
     "--email",
     "-e",
@@ -92,12 +123,186 @@ load_dotenv(dotenv_path=".env")
     help="Email address to send the notification to. Leave empty to print directly to "
     "the console.",
 )
+@click.option(
+    "--output",
+    type=click.Choice(["jsonl", "csv", "parquet"], case_sensitive=False),
+    default=None,
+    help="Write the homes in a machine-readable format as they are found, rather than "
+    "printing them to the console. Parquet output requires the `pyarrow` package.",
+)
+@click.option(
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help="The file to write the homes to when using `--output`. Default is to write to "
+    "standard output.",
+)
+@click.option(
+    "--webhook",
+    type=str,
+    multiple=True,
+    help="URL of a webhook to post the homes to, such as a dashboard, a chat bot or an "
+    "ntfy topic. Can be used several times.",
+)
+@click.option(
+    "--webhook-format",
+    type=click.Choice(["json", "ntfy"]),
+    default="json",
+    show_default=True,
+    help="The format of the webhook requests, being a JSON object with the homes, or a "
+    "plain text ntfy message.",
+)
+@click.option(
+    "--webhook-batch-size",
+    type=click.IntRange(min=1),
+    default=50,
+    show_default=True,
+    help="The maximum number of homes in every webhook request.",
+)
+@click.option(
+    "--digest-hours",
+    type=float,
+    default=0,
+    show_default=True,
+    help="Send at most one email per recipient within this many hours, collecting the "
+    "homes found in the meantime into a single digest. Use 0 to send an email on every "
+    "run that finds new homes.",
+)
 @click.option(
     "--cache/--no-cache",
     default=True,
     show_default=True,
     help="Whether to cache the homes that are found.",
 )
+@click.option(
+    "--archive/--no-archive",
+    default=True,
+    show_default=True,
+    help="Whether to archive the descriptions of the homes, so that keyword queries "
+    "on homes that have been seen before do not need to fetch their descriptions.",
+)
+@click.option(
+    "--notify-changes/--no-notify-changes",
+    default=True,
+    show_default=True,
+    help="Whether to also notify about price reductions and relistings of homes that "
+    "have been seen before. This requires the cache to be enabled.",
+)
+@click.option(
+    "--http-cache/--no-http-cache",
+    default=True,
+    show_default=True,
+    help="Whether to store the result pages of the API in the cache, so that the next "
+    "run only downloads the pages that have changed.",
+)
+@click.option(
+    "--cache-max-age",
+    type=int,
+    default=365,
+    show_default=True,
+    help="The number of days after which cached homes that have not been seen in a "
+    "search expire. Use 0 to never expire cached homes.",
+)
+@click.option(
+    "--cache-max-entries",
+    type=int,
+    default=0,
+    show_default=True,
+    help="The maximum number of entries to keep in the cache, where the entries whose "
+    "homes were seen the longest ago are removed first. Use 0 for no limit.",
+)
+@click.option(
+    "--deadline",
+    type=float,
+    default=None,
+    help="The maximum number of seconds to spend fetching homes. When the deadline is "
+    "reached, the homes found so far are used. Default is no deadline.",
+)
+@click.option(
+    "--max-results",
+    type=int,
+    default=None,
+    help="The maximum number of homes to notify about per search, where the newest "
+    "listings closest to the search criteria are picked first. Default is no limit.",
+)
+@click.option(
+    "--max-description-fetches",
+    type=int,
+    default=None,
+    help="The maximum number of listing descriptions to fetch per search when using "
+    "`--query`, where the newest listings are fetched first. Default is no limit.",
+)
+@click.option(
+    "--watch/--no-watch",
+    default=False,
+    show_default=True,
+    help="Keep searching in a loop, where the interval between searches adapts to how "
+    "often new homes are listed.",
+)
+@click.option(
+    "--min-interval",
+    type=float,
+    default=5,
+    show_default=True,
+    help="The minimum number of minutes between searches when using `--watch`.",
+)
+@click.option(
+    "--max-interval",
+    type=float,
+    default=120,
+    show_default=True,
+    help="The maximum number of minutes between searches when using `--watch`.",
+)
+@click.option(
+    "--save-search",
+    type=str,
+    default=None,
+    help="Save the search under this name, to be run periodically by "
+    "`bolig-ping-worker` rather than now. A saved search with the same name is "
+    "replaced.",
+)
+@click.option(
+    "--search-interval",
+    type=float,
+    default=10,
+    show_default=True,
+    help="The number of minutes between runs of a saved search.",
+)
+@click.option(
+    "--list-searches",
+    is_flag=True,
+    default=False,
+    help="List the saved searches, rather than searching.",
+)
+@click.option(
+    "--remove-search",
+    type=str,
+    default=None,
+    help="Remove the saved search with this name, rather than searching.",
+)
+@click.option(
+    "--checkpoint/--no-checkpoint",
+    default=True,
+    show_default=True,
+    help="Whether to checkpoint the scraping progress, so that an interrupted scrape "
+    "is resumed in the next run.",
+)
+@click.option(
+    "--checkpoint-max-age",
+    type=int,
+    default=60,
+    show_default=True,
+    help="The number of minutes after which an interrupted scrape is started over "
+    "rather than resumed.",
+)
+@click.option(
+    "--max-shard-size",
+    type=int,
+    default=1_000,
+    show_default=True,
+    help="Searches with more results than this are split into smaller searches, which "
+    "are scraped in parallel. Use 0 to never split searches.",
+)
 def main(
     city: list[str],
     min_price: int | None,
@@ -110,10 +315,44 @@ def main(
     max_size: int | None,
     query: list[str],
     property_type: list[str] | None,
+    near: list[str],
+    polygon: list[str],
     email: list[str],
+    output: OutputFormat | None,
+    output_file: Path | None,
+    webhook: list[str],
+    webhook_format: WebhookFormat,
+    webhook_batch_size: int,
+    digest_hours: float,
     cache: bool,
+    archive: bool,
+    notify_changes: bool,
+    http_cache: bool,
+    cache_max_age: int,
+    cache_max_entries: int,
+    deadline: float | None,
+    max_results: int | None,
+    max_description_fetches: int | None,
+    watch: bool,
+    min_interval: float,
+    max_interval: float,
+    save_search: str | None,
+    search_interval: float,
+    list_searches: bool,
+    remove_search: str | None,
+    checkpoint: bool,
+    checkpoint_max_age: int,
+    max_shard_size: int,
 ) -> None:
     """Search for homes in Denmark."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s ⋅ %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    load_dotenv(dotenv_path=".env")
+    run_deadline = Deadline(seconds=deadline)
+
     # Check if the required environment variables are set
     if email and "GMAIL_EMAIL" not in os.environ:
         logger.error(
@@ -128,14 +367,41 @@ def main(
         )
         return
 
-    # Backwards compatibility of cache name
+    # Backwards compatibility of cache name. We link rather than rename, as linking
+    # fails if another process has created the new cache in the meantime
     old_cache_path = Path(".boligping_cache")
     new_cache_path = Path(".bolig_ping_cache")
     if old_cache_path.exists() and not new_cache_path.exists():
-        old_cache_path.rename(new_cache_path)
-        logger.warning(
-            "Renamed the cache file from `.boligping_cache` to `.bolig_ping_cache`."
-        )
+        try:
+            os.link(old_cache_path, new_cache_path)
+            logger.warning(
+                "Renamed the cache file from `.boligping_cache` to `.bolig_ping_cache`."
+            )
+        except (FileExistsError, FileNotFoundError):
+            pass
+        old_cache_path.unlink(missing_ok=True)
+
+    if list_searches:
+        saved_searches = list_saved_searches(cache_path=new_cache_path)
+        if not saved_searches:
+            logger.info("There are no saved searches.")
+        for saved_search in saved_searches:
+            recipients = saved_search.emails + saved_search.webhooks
+            click.echo(
+                f"{saved_search.name}: every "
+                f"{saved_search.interval.total_seconds() / 60:g} minutes, notifying "
+                f"{', '.join(recipients) or 'nobody'}"
+            )
+        return
+    if remove_search is not None:
+        if remove_saved_search(name=remove_search, cache_path=new_cache_path):
+            logger.info(f"Removed the saved search {remove_search!r}.")
+        else:
+            raise click.BadParameter(
+                f"There is no saved search named {remove_search!r}.",
+                param_hint="--remove-search",
+            )
+        return
 
     search_query = SearchQuery(
         cities=[c.replace("-", " ").lower() for c in city],
@@ -149,6 +415,8 @@ def main(
         max_size=max_size,
         queries=query,
         property_type=property_type,
+        circles=[parse_circle(value=value) for value in near],
+        polygons=[parse_polygon(value=value) for value in polygon],
     )
 
     if search_query.is_empty():
@@ -158,34 +426,653 @@ def main(
             "the arguments with `bolig-ping --help`."
         )
 
-    homes = scrape_results(search_query=search_query)
-    if homes is None:
-        logger.warning("No results found. Double check your search query.")
+    if save_search is not None:
+        # Saved searches are run in the background by the workers, so they cannot
+        # write the homes to the console or a file, nor keep watching
+        if output is not None or output_file is not None or watch:
+            raise click.UsageError(
+                "`--output`, `--output-file` and `--watch` cannot be used with "
+                "`--save-search`, as saved searches are run by `bolig-ping-worker`."
+            )
+        add_saved_search(
+            saved_search=SavedSearch(
+                name=save_search,
+                search_query=search_query,
+                emails=email,
+                webhooks=webhook,
+                webhook_format=webhook_format,
+                webhook_batch_size=webhook_batch_size,
+                interval=dt.timedelta(minutes=search_interval),
+                digest_hours=digest_hours,
+                notify_changes=notify_changes,
+                cache=cache,
+                deadline=deadline,
+                max_results=max_results,
+                max_description_fetches=max_description_fetches,
+            ),
+            cache_path=new_cache_path,
+        )
+        logger.info(
+            f"Saved the search {save_search!r}, which will be run every "
+            f"{search_interval:g} minutes by `bolig-ping-worker`."
+        )
         return
 
+    try:
+        writer = get_writer(output_format=output, path=output_file) if output else None
+    except ImportError as e:
+        raise click.UsageError(str(e))
+
+    with (
+        BoligPing(
+            cache_path=new_cache_path,
+            archive_path=new_cache_path if archive else None,
+            page_cache_path=new_cache_path if http_cache else None,
+            checkpoint_dir=Path(".bolig_ping_checkpoints") if checkpoint else None,
+            checkpoint_max_age=dt.timedelta(minutes=checkpoint_max_age),
+            max_shard_size=max_shard_size,
+        ) as client,
+        writer or contextlib.nullcontext(),
+        (
+            WebhookNotifier(
+                urls=list(webhook),
+                webhook_format=webhook_format,
+                batch_size=webhook_batch_size,
+                session=client.session,
+            )
+            if webhook
+            else contextlib.nullcontext()
+        ) as webhooks,
+    ):
+        poll = functools.partial(
+            notify,
+            client=client,
+            search_query=search_query,
+            emails=email,
+            writer=writer,
+            webhooks=webhooks,
+            cache=cache,
+            notify_changes=notify_changes,
+            cache_max_age=cache_max_age,
+            cache_max_entries=cache_max_entries,
+            digest_hours=digest_hours,
+            max_results=max_results,
+            max_description_fetches=max_description_fetches,
+        )
+        if not watch:
+            poll(deadline=run_deadline)
+            return
+        try:
+            schedule = PollingSchedule(
+                min_interval=dt.timedelta(minutes=min_interval),
+                max_interval=dt.timedelta(minutes=max_interval),
+            )
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        watch_for_homes(poll=poll, schedule=schedule, deadline=deadline)
+
+
+def notify(
+    client: BoligPing,
+    search_query: SearchQuery,
+    emails: list[str],
+    writer: HomeWriter | None,
+    deadline: Deadline,
+    cache: bool,
+    notify_changes: bool,
+    cache_max_age: int,
+    cache_max_entries: int,
+    digest_hours: float,
+    webhooks: WebhookNotifier | None = None,
+    max_results: int | None = None,
+    max_description_fetches: int | None = None,
+) -> list[Home]:
+    """Search for new homes and notify the recipients about them.
+
+    Args:
+        client:
+            The client to search with.
+        search_query:
+            The search query.
+        emails:
+            The email addresses to notify, each about the homes that are new to them.
+            If empty and neither a writer nor webhooks are given then the homes are
+            logged instead.
+        writer:
+            The writer to write the homes to as they are found, or None to not write
+            them.
+        deadline:
+            The deadline for the search.
+        cache:
+            Whether to cache the homes, to only notify about new homes.
+        notify_changes:
+            Whether to also notify about changes to homes that have been seen before.
+        cache_max_age:
+            The number of days after which cached homes expire, or 0 to never expire.
+        cache_max_entries:
+            The maximum number of entries in the cache, or 0 for no limit.
+        digest_hours:
+            The minimum number of hours between emails to the same recipient, or 0 to
+            email on every search.
+        webhooks (optional):
+            The webhooks to post the homes to, or None to not post them. Defaults to
+            None.
+        max_results (optional):
+            The maximum number of new homes to notify about, or None for no limit.
+            Defaults to None.
+        max_description_fetches (optional):
+            The maximum number of descriptions to fetch, or None for no limit. Defaults
+            to None.
+
+    Returns:
+        All the homes found by the search, including the ones seen before.
+    """
+    status = ScrapeStatus()
+    homes = client.scrape(search_query=search_query, deadline=deadline, status=status)
+    if not homes:
+        logger.warning("No results found. Double check your search query.")
+        return list()
+    scraped_homes = homes
+
+    recipients = emails or ["no-email"]
+    subscribers = [*recipients, *(webhooks.urls if webhooks is not None else list())]
+    changes: list[HomeChange] = list()
+    if cache and notify_changes:
+        changes = find_changes(
+            homes=homes,
+            search_query=search_query,
+            recipients=subscribers,
+            cache_path=client.cache_path,
+        )
+
+    def store_snapshots() -> None:
+        """Store the snapshots of the scrape, once the changes have been delivered."""
+        if cache and notify_changes:
+            update_snapshots(
+                homes=scraped_homes,
+                search_query=search_query,
+                recipients=subscribers,
+                is_complete=status.is_complete(),
+                cache_path=client.cache_path,
+            )
+
+    # Homes failing the criteria that need no descriptions are never notified about, so
+    # they are filtered out before they are claimed, rather than claimed and released
+    homes = filter_by_listing(homes=homes, search_query=search_query)
+
+    # Every recipient gets the homes that are new to them, so we claim the homes per
+    # recipient, and only check the descriptions of the union of the new homes once
+    new_homes_per_recipient = {recipient: homes for recipient in recipients}
     if cache:
-        homes = remove_cached_homes(homes=homes, emails=email or ["no-email"])
-        store_to_cache(homes=homes, emails=email or ["no-email"])
+        new_homes_per_recipient = claim_homes_per_recipient(
+            homes=homes, emails=recipients, cache_path=client.cache_path
+        )
+
+        # We compact the cache after claiming the homes, which marks the homes that are
+        # still on the market as seen, so that they are not removed
+        max_age = dt.timedelta(days=cache_max_age) if cache_max_age > 0 else None
+        num_removed = compact_cache(
+            max_age=max_age,
+            max_entries=cache_max_entries or None,
+            cache_path=client.cache_path,
+        )
+        if num_removed:
+            logger.info(f"Removed {num_removed:,} stale entries from the cache.")
+        claimed_homes = {
+            home
+            for recipient_homes in new_homes_per_recipient.values()
+            for home in recipient_homes
+        }
+        homes = [home for home in homes if home in claimed_homes]
 
-    homes = filter_results(homes=homes, search_query=search_query)
+    if client.archive_path is not None:
+        num_pruned = prune_archive(cache_path=client.archive_path)
+        if num_pruned:
+            logger.info(f"Removed {num_pruned:,} expired homes from the archive.")
+
+    unfiltered_homes = homes
+    homes = list()
+    for home in client.iter_filter(
+        homes=unfiltered_homes,
+        search_query=search_query,
+        deadline=deadline,
+        max_results=max_results,
+        max_description_fetches=max_description_fetches,
+    ):
+        homes.append(home)
+        if writer is not None:
+            writer.write(home=home)
+
+    # Homes whose descriptions were skipped due to the deadline or the fetch budget, or
+    # which did not make the cut of the maximum number of results, have not been
+    # checked, so we release them from the cache to check them in the next run
+    is_limited = max_results is not None or max_description_fetches is not None
+    if cache and (is_limited or (search_query.queries and deadline.expired())):
+        results = set(homes)
+        unchecked_homes = {
+            home
+            for home in unfiltered_homes
+            if home not in results
+            and (not search_query.queries or not home.description_is_fetched())
+        }
+        for recipient, recipient_homes in new_homes_per_recipient.items():
+            release_homes(
+                homes=[home for home in recipient_homes if home in unchecked_homes],
+                emails=[recipient],
+                cache_path=client.cache_path,
+            )
     logger.info(f"Found {len(homes)} new homes that satisfy the search query.")
+    homes_per_recipient: dict[str, list[Home]] = dict()
+    for recipient, recipient_homes in new_homes_per_recipient.items():
+        new_to_recipient = set(recipient_homes)
+        homes_per_recipient[recipient] = [
+            home for home in homes if home in new_to_recipient
+        ]
 
-    if homes:
-        if email:
-            subject, contents = compose_email(homes=homes)
-            send_emails(
-                from_email=os.environ["GMAIL_EMAIL"],
-                password=os.environ["GMAIL_PASSWORD"],
-                to_emails=email,
-                subject=subject,
-                contents=contents,
-            )
-            logger.info(f"Sent the homes to {email}.")
-        else:
+    # Only notify about changes to homes that satisfy the search query and which are
+    # not already being notified about as new homes
+    if changes:
+        new_homes = set(homes)
+        changes = [change for change in changes if change.home not in new_homes]
+        changed_homes = set(
+            client.iter_filter(
+                homes=[change.home for change in changes],
+                search_query=search_query,
+                deadline=deadline,
+            )
+        )
+        changes = [change for change in changes if change.home in changed_homes]
+        logger.info(
+            f"Found {len(changes)} price reductions and relistings of homes that have "
+            "been seen before."
+        )
+
+    # A failing webhook must not keep the homes from the email recipients, so its
+    # errors are only logged. Without email recipients the webhooks are the only way
+    # the homes are delivered, so we release the homes to retry them in the next run
+    is_delivered = True
+    if webhooks is not None and (homes or changes):
+        try:
+            webhooks.send(homes=homes, changes=changes)
+        except requests.RequestException as e:
+            logger.error(f"Could not send the homes to the webhooks: {e}")
+            if not emails:
+                is_delivered = False
+                if cache:
+                    release_homes(
+                        homes=homes, emails=recipients, cache_path=client.cache_path
+                    )
+
+    if emails and digest_hours > 0:
+        for recipient in emails:
+            add_to_digest(
+                homes=homes_per_recipient[recipient],
+                changes=changes,
+                emails=[recipient],
+                cache_path=client.cache_path,
+            )
+
+        # The changes are kept in the digests until they are sent, so they can no
+        # longer be lost, and the snapshots can be updated
+        store_snapshots()
+
+        # The digests are popped and sent one recipient at a time, so that a failed
+        # email only puts the digest of that recipient back, and leaves the digests of
+        # the remaining recipients in the cache
+        num_sent = 0
+        for recipient in emails:
+            digest = pop_due_digest(
+                email=recipient,
+                window=dt.timedelta(hours=digest_hours),
+                cache_path=client.cache_path,
+            )
+            if digest is None:
+                continue
+            digest_homes, digest_changes = digest
+            subject, contents = compose_email(
+                homes=digest_homes, changes=digest_changes
+            )
+            try:
+                send_emails(
+                    from_email=os.environ["GMAIL_EMAIL"],
+                    password=os.environ["GMAIL_PASSWORD"],
+                    to_emails=[recipient],
+                    subject=subject,
+                    contents=contents,
+                )
+            except Exception:
+                add_to_digest(
+                    homes=digest_homes,
+                    changes=digest_changes,
+                    emails=[recipient],
+                    cache_path=client.cache_path,
+                )
+                raise
+            mark_digest_sent(email=recipient, cache_path=client.cache_path)
+            num_sent += 1
+            logger.info(
+                f"Sent a digest of {len(digest_homes) + len(digest_changes)} homes to "
+                f"{recipient}."
+            )
+        if (homes or changes) and num_sent < len(emails):
+            logger.info("Added the homes to the digest, to be sent later.")
+    elif homes or changes:
+        if emails:
+            # Recipients with the same new homes get the same email, sent together
+            recipients_per_homes: dict[tuple[Home, ...], list[str]] = dict()
+            for recipient in emails:
+                group_homes = tuple(homes_per_recipient[recipient])
+                recipients_per_homes.setdefault(group_homes, list()).append(recipient)
+            groups = [
+                (group_homes, to_emails)
+                for group_homes, to_emails in recipients_per_homes.items()
+                if group_homes or changes
+            ]
+            for idx, (group_homes, to_emails) in enumerate(groups):
+                subject, contents = compose_email(
+                    homes=list(group_homes), changes=changes
+                )
+                try:
+                    send_emails(
+                        from_email=os.environ["GMAIL_EMAIL"],
+                        password=os.environ["GMAIL_PASSWORD"],
+                        to_emails=to_emails,
+                        subject=subject,
+                        contents=contents,
+                    )
+                except Exception:
+                    # Release the homes of the recipients who were not emailed, so
+                    # that they get them in the next run
+                    if cache:
+                        for unsent_homes, unsent_emails in groups[idx:]:
+                            release_homes(
+                                homes=list(unsent_homes),
+                                emails=unsent_emails,
+                                cache_path=client.cache_path,
+                            )
+                    raise
+                logger.info(f"Sent {len(group_homes)} new homes to {to_emails}.")
+        elif writer is None and webhooks is None:
             logger.info(
                 "No email provided, so printing the homes here:\n\n"
-                + "\n\n".join(home.to_text() for home in homes)
+                + "\n\n".join(
+                    [home.to_text() for home in homes]
+                    + [change.to_text() for change in changes]
+                )
+            )
+
+    # The snapshots are only updated once the changes have been delivered, so that
+    # changes which failed to be delivered are reported again in the next run
+    if is_delivered and not (emails and digest_hours > 0):
+        store_snapshots()
+
+    return scraped_homes
+
+
+def watch_for_homes(
+    poll: Callable[..., list[Home]], schedule: PollingSchedule, deadline: float | None
+) -> None:
+    """Search for homes in a loop, adapting the interval to the arrival of new homes.
+
+    A home counts as new if its case ID was not found by the previous search. Failed
+    searches are logged and retried after the current interval. The loop runs until it
+    is interrupted.
+
+    Args:
+        poll:
+            The function running a single search, given its deadline, and returning the
+            homes it found.
+        schedule:
+            The schedule deciding the interval between searches.
+        deadline:
+            The maximum number of seconds to spend on every search, or None for no
+            deadline.
+    """
+    previous_ids: set[str] | None = None
+    previous_start: float | None = None
+    try:
+        while True:
+            start = time.monotonic()
+            try:
+                homes = poll(deadline=Deadline(seconds=deadline))
+            except requests.RequestException as e:
+                logger.warning(f"The search failed, so trying again later: {e}")
+            else:
+                case_ids = {home.url.split("/")[-1] for home in homes}
+                if previous_ids is not None and previous_start is not None:
+                    schedule.record_poll(
+                        num_new=len(case_ids - previous_ids),
+                        elapsed=dt.timedelta(seconds=start - previous_start),
+                    )
+                previous_ids, previous_start = case_ids, start
+            logger.info(
+                f"Searching again in {schedule.interval.total_seconds() / 60:.1f} "
+                "minutes."
             )
+            time.sleep(
+                max(schedule.interval.total_seconds() - (time.monotonic() - start), 0)
+            )
+    except KeyboardInterrupt:
+        logger.info("Stopped watching for new homes.")
+
+
+@click.command("bolig_ping_worker")
+@click.option(
+    "--workers",
+    "-n",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="The number of worker processes to run the saved searches with.",
+)
+@click.option(
+    "--visibility-timeout",
+    type=float,
+    default=15,
+    show_default=True,
+    help="The number of minutes a claimed saved search is hidden from other workers. "
+    "If a worker crashes, its saved search is run by another worker after this time.",
+)
+@click.option(
+    "--deadline",
+    type=float,
+    default=None,
+    help="The maximum number of seconds to spend fetching homes for every saved "
+    "search that was saved without its own `--deadline`. Default is no deadline.",
+)
+@click.option(
+    "--archive/--no-archive",
+    default=True,
+    show_default=True,
+    help="Whether to archive the descriptions of the homes.",
+)
+@click.option(
+    "--cache-max-age",
+    type=int,
+    default=365,
+    show_default=True,
+    help="The number of days after which cached homes that have not been seen in a "
+    "search expire. Use 0 to never expire cached homes.",
+)
+@click.option(
+    "--cache-max-entries",
+    type=int,
+    default=0,
+    show_default=True,
+    help="The maximum number of entries to keep in the cache, where the entries whose "
+    "homes were seen the longest ago are removed first. Use 0 for no limit.",
+)
+@click.option(
+    "--once/--forever",
+    default=False,
+    show_default=True,
+    help="Whether to stop when no saved search is due, rather than waiting for the "
+    "next one.",
+)
+def worker(
+    workers: int,
+    visibility_timeout: float,
+    deadline: float | None,
+    archive: bool,
+    cache_max_age: int,
+    cache_max_entries: int,
+    once: bool,
+) -> None:
+    """Run the saved searches, using several worker processes."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s ⋅ %(processName)s ⋅ %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    load_dotenv(dotenv_path=".env")
+    run_worker_process = functools.partial(
+        work,
+        visibility_timeout=dt.timedelta(minutes=visibility_timeout),
+        deadline=deadline,
+        archive=archive,
+        cache_max_age=cache_max_age,
+        cache_max_entries=cache_max_entries,
+        once=once,
+    )
+    processes = [
+        multiprocessing.Process(
+            target=run_worker_process, name=f"worker-{idx}", daemon=True
+        )
+        for idx in range(1, workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        run_worker_process()
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopped the workers.")
+
+
+def work(
+    visibility_timeout: dt.timedelta,
+    deadline: float | None,
+    archive: bool,
+    cache_max_age: int,
+    cache_max_entries: int,
+    once: bool,
+) -> None:
+    """Run saved searches from the queue in the current process.
+
+    Args:
+        visibility_timeout:
+            How long a claimed saved search is hidden from other workers.
+        deadline:
+            The maximum number of seconds to spend on every saved search without its
+            own deadline, or None for no deadline.
+        archive:
+            Whether to archive the descriptions of the homes.
+        cache_max_age:
+            The number of days after which cached homes expire, or 0 to never expire.
+        cache_max_entries:
+            The maximum number of entries in the cache, or 0 for no limit.
+        once:
+            Whether to stop when no saved search is due.
+    """
+    with BoligPing(
+        archive_path=Path(".bolig_ping_cache") if archive else None
+    ) as client:
+
+        def run_search(saved_search: SavedSearch) -> list[Home]:
+            logger.info(f"Running the saved search {saved_search.name!r}.")
+            with (
+                WebhookNotifier(
+                    urls=saved_search.webhooks,
+                    webhook_format=saved_search.webhook_format,
+                    batch_size=saved_search.webhook_batch_size,
+                    session=client.session,
+                )
+                if saved_search.webhooks
+                else contextlib.nullcontext()
+            ) as webhooks:
+                return notify(
+                    client=client,
+                    search_query=saved_search.search_query,
+                    emails=saved_search.emails,
+                    writer=None,
+                    deadline=Deadline(
+                        seconds=deadline
+                        if saved_search.deadline is None
+                        else saved_search.deadline
+                    ),
+                    cache=saved_search.cache,
+                    notify_changes=saved_search.notify_changes,
+                    cache_max_age=cache_max_age,
+                    cache_max_entries=cache_max_entries,
+                    digest_hours=saved_search.digest_hours,
+                    webhooks=webhooks,
+                    max_results=saved_search.max_results,
+                    max_description_fetches=saved_search.max_description_fetches,
+                )
+
+        try:
+            num_succeeded = run_worker(
+                run_search=run_search,
+                visibility_timeout=visibility_timeout,
+                stop_when_idle=once,
+            )
+        except KeyboardInterrupt:
+            return
+    logger.info(f"Ran {num_succeeded:,} saved searches.")
+
+
+def parse_circle(value: str) -> Circle:
+    """Parse a circle from the command line.
+
+    Args:
+        value:
+            The circle, given as `<latitude>,<longitude>,<radius-in-km>`.
+
+    Returns:
+        The parsed circle.
+
+    Raises:
+        BadParameter:
+            If the circle could not be parsed.
+    """
+    try:
+        latitude, longitude, radius_km = map(float, value.split(","))
+        return Circle(latitude=latitude, longitude=longitude, radius_km=radius_km)
+    except ValueError:
+        raise click.BadParameter(
+            f"Invalid circle {value!r}. It should be of the form "
+            "`<latitude>,<longitude>,<radius-in-km>`, e.g., `55.68,12.57,2`."
+        )
+
+
+def parse_polygon(value: str) -> Polygon:
+    """Parse a polygon from the command line.
+
+    Args:
+        value:
+            The polygon, given as `<latitude>,<longitude>;<latitude>,<longitude>;...`.
+
+    Returns:
+        The parsed polygon.
+
+    Raises:
+        BadParameter:
+            If the polygon could not be parsed.
+    """
+    try:
+        vertices = [
+            (float(latitude), float(longitude))
+            for latitude, longitude in (
+                vertex.split(",") for vertex in value.split(";") if vertex.strip()
+            )
+        ]
+        return Polygon(vertices=vertices)
+    except ValueError:
+        raise click.BadParameter(
+            f"Invalid polygon {value!r}. It should be at least three vertices of the "
+            "form `<latitude>,<longitude>`, separated by semicolons."
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,315 @@
+"""Reusable client for searching for homes from a long-lived process."""
+
+import datetime as dt
+import logging
+from collections.abc import Generator
+from pathlib import Path
+from types import TracebackType
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .data_models import Home, SearchQuery
+from .deadline import Deadline
+from .deduplication import deduplicate_homes
+from .filtering import iter_filter_results
+from .http_cache import PageCache
+from .rate_limiting import RateLimiter
+from .scraper import ScrapeStatus, scrape_results
+from .sharding import scrape_sharded_results
+
+logger = logging.getLogger(__package__)
+
+
+class BoligPing:
+    """A client for searching for homes, reusing its resources across searches.
+
+    The client owns a pool of HTTP connections, a rate limiter shared by all its
+    searches, a cache of result pages, and the paths of the cache, the archive and the
+    checkpoints. Creating a single client and running many searches with it thus avoids
+    reconnecting to the API, re-learning the rate limit and re-parsing unchanged pages
+    on every search. The client can be used as a context manager, which closes its
+    connections on exit.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file storing the homes that have been sent, along with
+            the snapshots and the digests of the homes. Defaults to ".bolig_ping_cache".
+        archive_path (optional):
+            The path to the cache file storing the archive of descriptions, or None to
+            not use an archive. Defaults to ".bolig_ping_cache".
+        page_cache_path (optional):
+            The path to the cache file storing the result pages, or None to only cache
+            the pages in memory. Defaults to ".bolig_ping_cache".
+        page_cache_ttl (optional):
+            How long a cached result page is used without being revalidated. Defaults
+            to 1 minute.
+        checkpoint_dir (optional):
+            The directory to store the scraping checkpoints in, or None to not
+            checkpoint. Defaults to None.
+        checkpoint_max_age (optional):
+            The maximum age of a checkpoint for it to be resumed. Defaults to 1 hour.
+        max_shard_size (optional):
+            Searches with more results than this are split into smaller searches,
+            which are scraped in parallel. Can be 0 to never split searches. Defaults
+            to 1,000.
+        max_concurrency (optional):
+            The maximum number of concurrent requests, which is also the size of the
+            connection pool. Defaults to 8.
+
+    Attributes:
+        cache_path:
+            The path to the cache file storing the homes that have been sent.
+        archive_path:
+            The path to the cache file storing the archive of descriptions, or None.
+        checkpoint_dir:
+            The directory to store the scraping checkpoints in, or None.
+        checkpoint_max_age:
+            The maximum age of a checkpoint for it to be resumed.
+        max_shard_size:
+            The maximum number of results of a search before it is split.
+        page_cache:
+            The cache of result pages, revalidated with conditional requests.
+        rate_limiter:
+            The rate limiter shared by all searches of the client.
+        session:
+            The session holding the pool of HTTP connections.
+    """
+
+    def __init__(
+        self,
+        cache_path: Path = Path(".bolig_ping_cache"),
+        archive_path: Path | None = Path(".bolig_ping_cache"),
+        page_cache_path: Path | None = Path(".bolig_ping_cache"),
+        page_cache_ttl: dt.timedelta = dt.timedelta(minutes=1),
+        checkpoint_dir: Path | None = None,
+        checkpoint_max_age: dt.timedelta = dt.timedelta(hours=1),
+        max_shard_size: int = 1_000,
+        max_concurrency: int = 8,
+    ) -> None:
+        """Initialise the client.
+
+        Args:
+            cache_path (optional):
+                The path to the cache file storing the homes that have been sent, along
+                with the snapshots and the digests of the homes. Defaults to
+                ".bolig_ping_cache".
+            archive_path (optional):
+                The path to the cache file storing the archive of descriptions, or None
+                to not use an archive. Defaults to ".bolig_ping_cache".
+            page_cache_path (optional):
+                The path to the cache file storing the result pages, or None to only
+                cache the pages in memory. Defaults to ".bolig_ping_cache".
+            page_cache_ttl (optional):
+                How long a cached result page is used without being revalidated.
+                Defaults to 1 minute.
+            checkpoint_dir (optional):
+                The directory to store the scraping checkpoints in, or None to not
+                checkpoint. Defaults to None.
+            checkpoint_max_age (optional):
+                The maximum age of a checkpoint for it to be resumed. Defaults to 1
+                hour.
+            max_shard_size (optional):
+                Searches with more results than this are split into smaller searches.
+                Can be 0 to never split searches. Defaults to 1,000.
+            max_concurrency (optional):
+                The maximum number of concurrent requests. Defaults to 8.
+        """
+        self.cache_path = cache_path
+        self.archive_path = archive_path
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_max_age = checkpoint_max_age
+        self.max_shard_size = max_shard_size
+        self.page_cache = PageCache(cache_path=page_cache_path, ttl=page_cache_ttl)
+        self.rate_limiter = RateLimiter(max_concurrency=max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        self.session.mount(prefix="https://", adapter=adapter)
+        self.session.mount(prefix="http://", adapter=adapter)
+
+    def scrape(
+        self,
+        search_query: SearchQuery,
+        deadline: Deadline | None = None,
+        status: ScrapeStatus | None = None,
+    ) -> list[Home]:
+        """Scrape the homes matching the search query on the API.
+
+        Args:
+            search_query:
+                The search query to scrape homes for.
+            deadline (optional):
+                The deadline for the scraping, or None for no deadline. Defaults to
+                None.
+            status (optional):
+                The status to record pages that could not be scraped in, or None to
+                not record them. Defaults to None.
+
+        Returns:
+            The scraped homes, which are not yet filtered on the criteria that the API
+            does not support, such as keywords. Duplicate listings of the same property
+            are collapsed into a single home, see `deduplicate_homes`.
+        """
+        if self.max_shard_size > 0:
+            homes = scrape_sharded_results(
+                search_query=search_query,
+                max_hits_per_shard=self.max_shard_size,
+                deadline=deadline,
+                rate_limiter=self.rate_limiter,
+                session=self.session,
+                page_cache=self.page_cache,
+                checkpoint_dir=self.checkpoint_dir,
+                checkpoint_max_age=self.checkpoint_max_age,
+                status=status,
+            )
+        else:
+            homes = scrape_results(
+                search_query=search_query,
+                deadline=deadline,
+                rate_limiter=self.rate_limiter,
+                session=self.session,
+                page_cache=self.page_cache,
+                checkpoint_dir=self.checkpoint_dir,
+                checkpoint_max_age=self.checkpoint_max_age,
+                status=status,
+            )
+        return deduplicate_homes(homes=homes or list())
+
+    def iter_filter(
+        self,
+        homes: list[Home],
+        search_query: SearchQuery,
+        deadline: Deadline | None = None,
+        max_results: int | None = None,
+        max_description_fetches: int | None = None,
+    ) -> Generator[Home, None, None]:
+        """Filter scraped homes on the remaining criteria of the search query.
+
+        Descriptions are checked in order of priority, newest listings first, see
+        `get_priority`.
+
+        Args:
+            homes:
+                The scraped homes to filter.
+            search_query:
+                The search query to filter the homes by.
+            deadline (optional):
+                The deadline for the filtering, or None for no deadline. Defaults to
+                None.
+            max_results (optional):
+                The maximum number of homes to yield, or None for no limit. Defaults to
+                None.
+            max_description_fetches (optional):
+                The maximum number of descriptions to fetch, or None for no limit.
+                Defaults to None.
+
+        Yields:
+            The homes satisfying the search query, as soon as they have been checked.
+        """
+        yield from iter_filter_results(
+            homes=homes,
+            search_query=search_query,
+            deadline=deadline,
+            archive_path=self.archive_path,
+            session=self.session,
+            rate_limiter=self.rate_limiter,
+            max_workers=self.rate_limiter.max_concurrency,
+            max_results=max_results,
+            max_description_fetches=max_description_fetches,
+        )
+
+    def search(
+        self,
+        search_query: SearchQuery,
+        deadline: Deadline | None = None,
+        max_results: int | None = None,
+        max_description_fetches: int | None = None,
+    ) -> list[Home]:
+        """Search for homes satisfying the search query.
+
+        Args:
+            search_query:
+                The search query.
+            deadline (optional):
+                The deadline for the search, or None for no deadline. Defaults to None.
+            max_results (optional):
+                The maximum number of homes to yield, or None for no limit. Defaults to
+                None.
+            max_description_fetches (optional):
+                The maximum number of descriptions to fetch, or None for no limit.
+                Defaults to None.
+
+        Returns:
+            The homes satisfying the search query.
+        """
+        return list(
+            self.iter_search(
+                search_query=search_query,
+                deadline=deadline,
+                max_results=max_results,
+                max_description_fetches=max_description_fetches,
+            )
+        )
+
+    def iter_search(
+        self,
+        search_query: SearchQuery,
+        deadline: Deadline | None = None,
+        max_results: int | None = None,
+        max_description_fetches: int | None = None,
+    ) -> Generator[Home, None, None]:
+        """Search for homes satisfying the search query, yielding them as they match.
+
+        Args:
+            search_query:
+                The search query.
+            deadline (optional):
+                The deadline for the search, or None for no deadline. Defaults to None.
+            max_results (optional):
+                The maximum number of homes to yield, or None for no limit. Defaults to
+                None.
+            max_description_fetches (optional):
+                The maximum number of descriptions to fetch, or None for no limit.
+                Defaults to None.
+
+        Yields:
+            The homes satisfying the search query.
+        """
+        homes = self.scrape(search_query=search_query, deadline=deadline)
+        yield from self.iter_filter(
+            homes=homes,
+            search_query=search_query,
+            deadline=deadline,
+            max_results=max_results,
+            max_description_fetches=max_description_fetches,
+        )
+
+    def close(self) -> None:
+        """Close the connections of the client."""
+        self.session.close()
+
+    def __enter__(self) -> "BoligPing":
+        """Enter the context of the client.
+
+        Returns:
+            The client.
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Exit the context of the client, closing its connections.
+
+        Args:
+            exc_type:
+                The type of the exception raised in the context, if any.
+            exc_value:
+                The exception raised in the context, if any.
+            traceback:
+                The traceback of the exception raised in the context, if any.
+        """
+        self.close()
@@ -1,15 +1,41 @@
 """Data models used in the project."""
 
 import logging
-from functools import cached_property
-from typing import Any
+from typing import Any, Literal
 
 import requests
 from bs4 import BeautifulSoup
 from pydantic import BaseModel, Field
 
+from .deadline import Deadline
+from .rate_limiting import RateLimiter, get_with_retry
+
 logger = logging.getLogger(__package__)
 
+# The prefix of the URLs of the listings, which is followed by the case ID
+LISTING_URL_PREFIX = "https://boligsiden.dk/viderestilling/"
+
+# The URL of the structured data of a listing, given its case ID
+CASE_URL = "https://api.boligsiden.dk/cases/{case_id}"
+
+# The fields of a home holding its description, which are stored along with the home in
+# the caches, but are not part of the output
+DESCRIPTION_FIELDS = {"known_description", "description_fetched"}
+
+
+class Circle(BaseModel):
+    """A circular area on the map."""
+
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    radius_km: float = Field(gt=0)
+
+
+class Polygon(BaseModel):
+    """A polygonal area on the map, given by its (latitude, longitude) vertices."""
+
+    vertices: list[tuple[float, float]] = Field(min_length=3)
+
 
 class SearchQuery(BaseModel):
     """A search query."""
@@ -25,6 +51,8 @@ class SearchQuery(BaseModel):
     max_size: int | None = Field(default=None, ge=1)
     queries: list[str] = Field(default_factory=list)
     property_type: list[str] | None = Field(default=None)
+    circles: list[Circle] = Field(default_factory=list)
+    polygons: list[Polygon] = Field(default_factory=list)
 
     def is_empty(self) -> bool:
         """Check if the search query is empty.
@@ -99,28 +127,118 @@ class Home(BaseModel):
     size: int | None = Field(default=None, ge=1)
     monthly_fee: int | None = Field(default=None, ge=0)
     year: int | None = Field(default=None, ge=0)
+    latitude: float | None = Field(default=None, ge=-90, le=90)
+    longitude: float | None = Field(default=None, ge=-180, le=180)
+    days_on_market: int | None = Field(default=None, ge=0)
+    known_description: str | None = Field(default=None, repr=False)
+    description_fetched: bool = Field(default=False, repr=False)
 
-    @cached_property
+    @property
     def description(self) -> str | None:
-        """Get the description of the home.
+        """Get the description of the home, fetching it if it is not yet known.
 
         Returns:
             The description of the home, or None if not available.
         """
-        response = requests.get(url=self.url)
-        if response.ok:
-            soup = BeautifulSoup(response.content, "html.parser")
-            lines = soup.text.split("\n")
-            long_lines = [line.strip() for line in lines if len(line.strip()) > 200]
-            if long_lines:
-                return "\n".join(long_lines)
-            else:
-                logger.warning(
-                    f"Could not find description for property {self.url}. The longest "
-                    f"line was {max(len(line) for line in lines)} characters long."
+        if not self.description_fetched:
+            self.set_description(description=self.fetch_description())
+        return self.known_description
+
+    def fetch_description(
+        self,
+        session: requests.Session | None = None,
+        rate_limiter: RateLimiter | None = None,
+        deadline: Deadline | None = None,
+    ) -> str | None:
+        """Fetch the description of the home, without storing it.
+
+        The description is taken from the structured data of the listing, which is
+        fetched from the API through the rate limiter, retrying transient errors. If
+        that is not available, the description is guessed from the HTML page of the
+        listing, which is fetched in the same way.
+
+        Args:
+            session (optional):
+                The session to make the requests with, reusing its connections, or None
+                to make the requests without a session. Defaults to None.
+            rate_limiter (optional):
+                The rate limiter to make the API request through, or None to create a
+                new one. Defaults to None.
+            deadline (optional):
+                The deadline for the requests, or None for no deadline. Defaults to
+                None.
+
+        Returns:
+            The description of the home, or None if not available or if the deadline
+            has been reached.
+        """
+        if deadline is not None and deadline.expired():
+            return None
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+
+        if self.url.startswith(LISTING_URL_PREFIX):
+            case_id = self.url.removeprefix(LISTING_URL_PREFIX)
+            try:
+                response = get_with_retry(
+                    url=CASE_URL.format(case_id=case_id),
+                    rate_limiter=rate_limiter,
+                    deadline=deadline,
+                    session=session,
                 )
+                description = get_case_description(case=response.json())
+                if description is not None:
+                    return description
+            except (requests.RequestException, ValueError) as e:
+                logger.debug(f"Could not fetch the case data of {self.url}: {e}")
+
+        try:
+            response = get_with_retry(
+                url=self.url,
+                rate_limiter=rate_limiter,
+                deadline=deadline,
+                session=session,
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Could not fetch description for property {self.url}: {e}")
+            return None
+        soup = BeautifulSoup(response.content, "html.parser")
+        lines = soup.text.split("\n")
+        long_lines = [line.strip() for line in lines if len(line.strip()) > 200]
+        if long_lines:
+            return "\n".join(long_lines)
+        logger.warning(
+            f"Could not find description for property {self.url}. The longest line "
+            f"was {max(len(line) for line in lines)} characters long."
+        )
         return None
 
+    def set_description(self, description: str | None) -> None:
+        """Set the description of the home, so that it does not have to be fetched.
+
+        Args:
+            description:
+                The description of the home, or None if not available.
+        """
+        self.known_description = description
+        self.description_fetched = True
+
+    def description_is_fetched(self) -> bool:
+        """Check if the description of the home has already been fetched.
+
+        Returns:
+            True if the description has been fetched, False otherwise.
+        """
+        return self.description_fetched
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the home as a dictionary of its output fields.
+
+        Returns:
+            The fields of the home, without its description.
+        """
+        return self.model_dump(exclude=DESCRIPTION_FIELDS)
+
     def __hash__(self) -> int:
         """Get the hash of the home.
 
@@ -166,3 +284,67 @@ class Home(BaseModel):
         if self.year is not None:
             components.append(f"Year built: {self.year}")
         return "\n".join(components)
+
+
+class HomeChange(BaseModel):
+    """A change to a property listing that has been seen before."""
+
+    home: Home
+    kind: Literal["price_reduced", "relisted"]
+    previous_price: int | None = Field(default=None, ge=0)
+
+    def describe(self) -> str:
+        """Describe the change.
+
+        Returns:
+            A description of the change.
+        """
+        match self.kind:
+            case "price_reduced":
+                return (
+                    f"Price reduced from {self.previous_price:,} kr. to "
+                    f"{self.home.price:,} kr."
+                )
+            case "relisted":
+                return "Back on the market"
+
+    def to_html(self) -> str:
+        """Get the change as an HTML string.
+
+        Returns:
+            The change as an HTML string.
+        """
+        return f"<b>{self.describe()}</b>\n{self.home.to_html()}"
+
+    def to_text(self) -> str:
+        """Get the change as a text string.
+
+        Returns:
+            The change as a text string.
+        """
+        return f"Change: {self.describe()}\n{self.home.to_text()}"
+
+
+def get_case_description(case: dict) -> str | None:
+    """Get the description of a listing from its structured data.
+
+    Args:
+        case:
+            The structured data of the listing, from the API.
+
+    Returns:
+        The title and body of the description, or None if the listing has no
+        description.
+
+    Example:
+        >>> case = dict(descriptionTitle="Lys lejlighed", descriptionBody="Med altan.")
+        >>> print(get_case_description(case=case))
+        Lys lejlighed
+        Med altan.
+        >>> get_case_description(case=dict(descriptionTitle=None)) is None
+        True
+    """
+    parts = [
+        (case.get(key) or "").strip() for key in ("descriptionTitle", "descriptionBody")
+    ]
+    return "\n".join(part for part in parts if part) or None
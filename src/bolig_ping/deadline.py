@@ -0,0 +1,63 @@
+"""Time budget for a run."""
+
+import time
+
+
+class Deadline:
+    """A deadline for a run, after which no further requests should be made.
+
+    Args:
+        seconds:
+            The number of seconds until the deadline, or None for no deadline.
+
+    Attributes:
+        end:
+            The monotonic time of the deadline, or None for no deadline.
+    """
+
+    def __init__(self, seconds: float | None) -> None:
+        """Initialise the deadline.
+
+        Args:
+            seconds:
+                The number of seconds until the deadline, or None for no deadline.
+        """
+        self.end = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> float | None:
+        """Get the number of seconds remaining until the deadline.
+
+        Returns:
+            The number of seconds remaining, which is never negative, or None if there
+            is no deadline.
+        """
+        if self.end is None:
+            return None
+        return max(self.end - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Check if the deadline has passed.
+
+        Returns:
+            True if the deadline has passed, False otherwise.
+        """
+        return self.remaining() == 0.0
+
+    def clamp(self, timeout: tuple[float, float]) -> tuple[float, float]:
+        """Clamp a (connect, read) timeout to the time remaining until the deadline.
+
+        The clamped timeouts are always positive, as required by `requests`.
+
+        Args:
+            timeout:
+                The (connect, read) timeout, in seconds.
+
+        Returns:
+            The clamped (connect, read) timeout, in seconds.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(remaining, 0.01)
+        connect_timeout, read_timeout = timeout
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
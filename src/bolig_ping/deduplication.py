@@ -0,0 +1,84 @@
+"""Collapsing duplicate listings of the same property into a single home."""
+
+import logging
+
+from .archive import normalise_text
+from .data_models import Home
+
+logger = logging.getLogger(__package__)
+
+
+def get_address_key(address: str) -> str:
+    """Get the normalised form of an address, identifying the property.
+
+    Args:
+        address:
+            The address, as assembled from the search results.
+
+    Returns:
+        The normalised address.
+
+    Example:
+        >>> get_address_key("Aaboulevarden 2, 1. th. 8000 Aarhus C")
+        'åboulevarden 2 1 th 8000 århus c'
+    """
+    return normalise_text(address).strip()
+
+
+def deduplicate_homes(homes: list[Home]) -> list[Home]:
+    """Collapse homes listed several times under different cases into one home.
+
+    The oldest listing of a property is kept, so that the same listing is kept when new
+    duplicates appear, and the home is not notified about again. If the kept listing
+    has no known description, then a known description of a duplicate is used, saving
+    a request.
+
+    Args:
+        homes:
+            The homes.
+
+    Returns:
+        The homes with one home per address, in the order the addresses first appear.
+
+    Example:
+        >>> homes = deduplicate_homes(
+        ...     [
+        ...         Home(
+        ...             url="https://some.url/1",
+        ...             address="Vej 2, st. tv",
+        ...             days_on_market=1,
+        ...         ),
+        ...         Home(
+        ...             url="https://some.url/2",
+        ...             address="Vej 2 st tv",
+        ...             days_on_market=9,
+        ...         ),
+        ...     ]
+        ... )
+        >>> [home.url for home in homes]
+        ['https://some.url/2']
+    """
+    groups: dict[str, list[Home]] = dict()
+    for home in homes:
+        groups.setdefault(get_address_key(address=home.address), list()).append(home)
+    if len(groups) == len(homes):
+        return homes
+
+    canonical_homes: list[Home] = list()
+    for duplicates in groups.values():
+        canonical_home = max(
+            duplicates,
+            key=lambda home: -1 if home.days_on_market is None else home.days_on_market,
+        )
+        if not canonical_home.description_is_fetched():
+            for duplicate in duplicates:
+                if duplicate.description_is_fetched():
+                    canonical_home.set_description(description=duplicate.description)
+                    break
+        canonical_homes.append(canonical_home)
+
+    logger.info(
+        f"Collapsed {len(homes) - len(canonical_homes):,} duplicate listings of the "
+        "same properties."
+    )
+    return canonical_homes
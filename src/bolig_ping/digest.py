@@ -0,0 +1,148 @@
+"""Batching of notifications into digests, sent at most once per time window.
+
+New homes and changes are buffered per recipient in the cache database, and flushed as
+a single digest once the digest window of the recipient has passed since their last
+digest.
+"""
+
+import datetime as dt
+import sqlite3
+import time
+from pathlib import Path
+
+from .cache import connect_to_cache
+from .data_models import Home, HomeChange
+
+
+def add_to_digest(
+    homes: list[Home],
+    changes: list[HomeChange],
+    emails: list[str],
+    cache_path: Path = Path(".bolig_ping_cache"),
+) -> None:
+    """Add homes and changes to the digests of the given recipients.
+
+    Args:
+        homes:
+            The new homes to add.
+        changes:
+            The changes to homes seen before to add.
+        emails:
+            The recipients of the digests.
+        cache_path (optional):
+            The path to the cache file storing the digests. Defaults to
+            ".bolig_ping_cache".
+    """
+    now = int(time.time())
+    items = [
+        ("home", home.url.split("/")[-1], home.model_dump_json()) for home in homes
+    ] + [
+        ("change", change.home.url.split("/")[-1], change.model_dump_json())
+        for change in changes
+    ]
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_digest_tables(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany(
+            "INSERT OR REPLACE INTO digest_items VALUES (?, ?, ?, ?, ?)",
+            (
+                (email, kind, home_id, item_json, now)
+                for email in emails
+                for kind, home_id, item_json in items
+            ),
+        )
+        connection.execute("COMMIT")
+
+
+def pop_due_digest(
+    email: str, window: dt.timedelta, cache_path: Path = Path(".bolig_ping_cache")
+) -> tuple[list[Home], list[HomeChange]] | None:
+    """Remove and return the digest of a recipient, if it is due to be sent.
+
+    A digest is due if it is non-empty and the recipient has not been sent a digest
+    within the window. The digest is removed in a single transaction, so that
+    concurrent processes never send the same digest twice. The digest must be marked as
+    sent with `mark_digest_sent` once it has been sent, or added back with
+    `add_to_digest` if sending it failed.
+
+    Args:
+        email:
+            The recipient of the digest.
+        window:
+            The minimum time between two digests to the same recipient.
+        cache_path (optional):
+            The path to the cache file storing the digests. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        The (homes, changes) of the digest, or None if the digest is not due.
+    """
+    now = int(time.time())
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_digest_tables(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            last_sent = connection.execute(
+                "SELECT last_sent FROM digest_recipients WHERE email = ?", (email,)
+            ).fetchone()
+            if last_sent is not None and now - last_sent[0] < window.total_seconds():
+                return None
+            items = connection.execute(
+                "SELECT kind, item_json FROM digest_items WHERE email = ? "
+                "ORDER BY added",
+                (email,),
+            ).fetchall()
+            if not items:
+                return None
+            connection.execute("DELETE FROM digest_items WHERE email = ?", (email,))
+        finally:
+            connection.execute("COMMIT")
+    return (
+        [Home.model_validate_json(item) for kind, item in items if kind == "home"],
+        [
+            HomeChange.model_validate_json(item)
+            for kind, item in items
+            if kind == "change"
+        ],
+    )
+
+
+def mark_digest_sent(email: str, cache_path: Path = Path(".bolig_ping_cache")) -> None:
+    """Mark that a digest has been sent to a recipient, starting a new window.
+
+    Args:
+        email:
+            The recipient of the digest.
+        cache_path (optional):
+            The path to the cache file storing the digests. Defaults to
+            ".bolig_ping_cache".
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_digest_tables(connection=connection)
+        connection.execute(
+            "INSERT OR REPLACE INTO digest_recipients VALUES (?, ?)",
+            (email, int(time.time())),
+        )
+
+
+def create_digest_tables(connection: sqlite3.Connection) -> None:
+    """Create the tables storing the digests, if they do not exist.
+
+    Args:
+        connection:
+            The connection to the cache.
+    """
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS digest_items ("
+        "email TEXT NOT NULL, "
+        "kind TEXT NOT NULL, "
+        "home_id TEXT NOT NULL, "
+        "item_json TEXT NOT NULL, "
+        "added INTEGER NOT NULL, "
+        "PRIMARY KEY (email, kind, home_id))"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS digest_recipients ("
+        "email TEXT PRIMARY KEY, "
+        "last_sent INTEGER NOT NULL)"
+    )
@@ -2,22 +2,35 @@
 
 import yagmail
 
-from .data_models import Home
+from .data_models import Home, HomeChange
 
 
-def compose_email(homes: list[Home]) -> tuple[str, str]:
+def compose_email(
+    homes: list[Home], changes: list[HomeChange] | None = None
+) -> tuple[str, str]:
     """Compose an email with the given homes.
 
     Args:
         homes:
             The homes to compose the email with.
+        changes (optional):
+            Changes to homes that have been seen before, such as price reductions, to
+            include in the email. Defaults to None.
 
     Returns:
         A pair (subject, contents) for the email.
     """
+    changes = changes or list()
     match len(homes):
-        case 0:
+        case 0 if not changes:
             raise ValueError("Cannot compose an email with no homes.")
+        case 0:
+            subject = (
+                "[BoligPing] A home you have seen has changed!"
+                if len(changes) == 1
+                else f"[BoligPing] {len(changes)} homes you have seen have changed!"
+            )
+            contents = "Hi,\n\n"
         case 1:
             subject = "[BoligPing] Found a new home!"
             contents = "Hi,\n\nI found a new home that you might be interested in:\n\n"
@@ -27,6 +40,11 @@ def compose_email(homes: list[Home]) -> tuple[str, str]:
                 "Hi,\n\nI found some new homes that you might be interested in:\n\n"
             )
     contents += "\n\n".join(home.to_html() for home in homes)
+    if changes:
+        if homes:
+            contents += "\n\n"
+        contents += "These homes that you have seen before have changed:\n\n"
+        contents += "\n\n".join(change.to_html() for change in changes)
     contents += "\n\nHave a splendid day!\n\nBest regards,\nBoligPing"
     return subject, contents
 
@@ -48,7 +66,6 @@ def send_emails(
         contents:
             The contents of the email.
     """
-    for to_email in to_emails:
-        yagmail.SMTP(user=from_email, password=password).send(
-            to=to_email, subject=subject, contents=contents
-        )
+    with yagmail.SMTP(user=from_email, password=password) as smtp:
+        for to_email in to_emails:
+            smtp.send(to=to_email, subject=subject, contents=contents)
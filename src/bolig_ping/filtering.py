@@ -1,22 +1,260 @@
 """Filtering of scraped results."""
 
+import logging
+import math
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
 from tqdm.auto import tqdm
 
+from .archive import (
+    archive_homes,
+    load_archived_descriptions,
+    matches_queries,
+    search_archive,
+)
 from .data_models import Home, SearchQuery
+from .deadline import Deadline
+from .geo import filter_by_area
+from .rate_limiting import RateLimiter
+
+logger = logging.getLogger(__package__)
 
 
-def filter_results(homes: list[Home], search_query: SearchQuery) -> list[Home]:
+def filter_results(
+    homes: list[Home],
+    search_query: SearchQuery,
+    deadline: Deadline | None = None,
+    archive_path: Path | None = None,
+    session: requests.Session | None = None,
+    rate_limiter: RateLimiter | None = None,
+    max_workers: int = 8,
+    max_results: int | None = None,
+    max_description_fetches: int | None = None,
+) -> list[Home]:
     """Filter the homes based on the given criteria.
 
+    If the deadline passes while filtering based on keywords, the descriptions of the
+    remaining homes are not fetched, and these homes are discarded.
+
+    If an archive is given, then keyword queries are answered from the archive for the
+    homes that are in it, and only the descriptions of the remaining homes are fetched,
+    after which they are added to the archive.
+
+    The descriptions are checked in order of priority, as given by `get_priority`, and
+    checking stops as soon as `max_results` homes match. At most
+    `max_description_fetches` descriptions are fetched, after which only the homes
+    whose descriptions are already known are checked. The homes that were not checked
+    are discarded.
+
     Args:
         homes:
             The homes to filter.
         search_query:
             The search query to filter the homes by.
+        deadline (optional):
+            The deadline for the filtering, or None for no deadline. Defaults to None.
+        archive_path (optional):
+            The path to the cache file storing the archive, or None to not use an
+            archive. Defaults to None.
+        session (optional):
+            The session to fetch the descriptions with, reusing its connections, or None
+            to fetch them without a session. Defaults to None.
+        rate_limiter (optional):
+            The rate limiter to fetch the descriptions through, or None to create a new
+            one. Defaults to None.
+        max_workers (optional):
+            The maximum number of descriptions to fetch concurrently. Defaults to 8.
+        max_results (optional):
+            The maximum number of homes to return, or None for no limit. Defaults to
+            None.
+        max_description_fetches (optional):
+            The maximum number of descriptions to fetch, or None for no limit. Defaults
+            to None.
 
     Returns:
         The filtered homes.
     """
+    return list(
+        iter_filter_results(
+            homes=homes,
+            search_query=search_query,
+            deadline=deadline,
+            archive_path=archive_path,
+            session=session,
+            rate_limiter=rate_limiter,
+            max_workers=max_workers,
+            max_results=max_results,
+            max_description_fetches=max_description_fetches,
+        )
+    )
+
+
+def iter_filter_results(
+    homes: list[Home],
+    search_query: SearchQuery,
+    deadline: Deadline | None = None,
+    archive_path: Path | None = None,
+    session: requests.Session | None = None,
+    rate_limiter: RateLimiter | None = None,
+    max_workers: int = 8,
+    max_results: int | None = None,
+    max_description_fetches: int | None = None,
+) -> Generator[Home, None, None]:
+    """Filter the homes based on the given criteria, yielding them as they match.
+
+    This behaves like `filter_results`, but yields every matching home as soon as its
+    description has been checked, rather than after all descriptions have been fetched.
+
+    Args:
+        homes:
+            The homes to filter.
+        search_query:
+            The search query to filter the homes by.
+        deadline (optional):
+            The deadline for the filtering, or None for no deadline. Defaults to None.
+        archive_path (optional):
+            The path to the cache file storing the archive, or None to not use an
+            archive. Defaults to None.
+        session (optional):
+            The session to fetch the descriptions with, reusing its connections, or None
+            to fetch them without a session. Defaults to None.
+        rate_limiter (optional):
+            The rate limiter to fetch the descriptions through, or None to create a new
+            one. Defaults to None.
+        max_workers (optional):
+            The maximum number of descriptions to fetch concurrently. Defaults to 8.
+        max_results (optional):
+            The maximum number of homes to return, or None for no limit. Defaults to
+            None.
+        max_description_fetches (optional):
+            The maximum number of descriptions to fetch, or None for no limit. Defaults
+            to None.
+
+    Yields:
+        The homes matching the criteria. If keyword queries or a maximum number of
+        results are given, then the homes are yielded in order of priority, and
+        otherwise in their original order.
+    """
+    homes = filter_by_listing(homes=homes, search_query=search_query)
+    if not search_query.queries:
+        if max_results is not None:
+            homes = sorted(
+                homes,
+                key=lambda home: get_priority(home=home, search_query=search_query),
+            )[:max_results]
+        yield from homes
+        return
+
+    # Filter the homes based on the keyword queries, most relevant homes first
+    if deadline is None:
+        deadline = Deadline(seconds=None)
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+    homes = sorted(
+        homes, key=lambda home: get_priority(home=home, search_query=search_query)
+    )
+
+    # Answer the queries from the archive for the homes that are in it
+    archived_homes: set[Home] = set()
+    archived_matches: set[str] = set()
+    if archive_path is not None:
+        archived_homes = set(
+            load_archived_descriptions(homes=homes, cache_path=archive_path)
+        )
+        if archived_homes:
+            archived_matches = search_archive(
+                queries=search_query.queries, cache_path=archive_path
+            )
+
+    # Fetch the missing descriptions concurrently, in batches so that the deadline and
+    # the limits are respected, and the matches of a batch are yielded as soon as it is
+    # done
+    fetched_homes: list[Home] = list()
+    num_results = 0
+    num_fetches = 0
+    num_skipped = 0
+    try:
+        with (
+            tqdm(total=len(homes), desc="Filtering homes based on keywords") as pbar,
+            ThreadPoolExecutor(max_workers=max_workers) as executor,
+        ):
+            for start in range(0, len(homes), max_workers):
+                batch = homes[start : start + max_workers]
+                missing = [
+                    home
+                    for home in batch
+                    if home not in archived_homes and not home.description_is_fetched()
+                ]
+                # Skip the homes of the batch whose descriptions exceed the budget,
+                # while still checking those whose descriptions are already known
+                if max_description_fetches is not None:
+                    budget = max(max_description_fetches - num_fetches, 0)
+                    skipped = set(missing[budget:])
+                    num_skipped += len(skipped)
+                    batch = [home for home in batch if home not in skipped]
+                    missing = missing[:budget]
+
+                if missing and deadline.expired():
+                    logger.warning(
+                        f"The deadline was reached, so skipping the descriptions of "
+                        f"the remaining {len(homes) - start:,} homes."
+                    )
+                    break
+
+                descriptions = executor.map(
+                    lambda home: home.fetch_description(
+                        session=session, rate_limiter=rate_limiter, deadline=deadline
+                    ),
+                    missing,
+                )
+                for home, description in zip(missing, descriptions):
+                    home.set_description(description=description)
+                num_fetches += len(missing)
+                pbar.update(min(max_workers, len(homes) - start))
+
+                for home in batch:
+                    if home in archived_homes:
+                        is_match = home.url.split("/")[-1] in archived_matches
+                    else:
+                        fetched_homes.append(home)
+                        is_match = home.description is not None and matches_queries(
+                            description=home.description, queries=search_query.queries
+                        )
+                    if is_match:
+                        yield home
+                        num_results += 1
+                        if max_results is not None and num_results >= max_results:
+                            return
+
+        if num_skipped:
+            logger.warning(
+                f"Fetched the maximum of {max_description_fetches:,} descriptions, so "
+                f"skipped the descriptions of the remaining {num_skipped:,} homes."
+            )
+    finally:
+        # Archive the fetched descriptions, even if the caller stopped early
+        if archive_path is not None and fetched_homes:
+            archive_homes(homes=fetched_homes, cache_path=archive_path)
+
+
+def filter_by_listing(homes: list[Home], search_query: SearchQuery) -> list[Home]:
+    """Filter the homes on the criteria that can be checked from their listings alone.
+
+    These are the criteria that the API does not filter on, but which do not need the
+    descriptions of the homes, namely the monthly fee and the areas.
+
+    Args:
+        homes:
+            The homes to filter.
+        search_query:
+            The search query to filter the homes by.
+
+    Returns:
+        The homes satisfying the criteria, in their original order.
+    """
     # Filter the homes based on the monthly fee
     homes = [
         home
@@ -34,16 +272,60 @@ def filter_results(homes: list[Home], search_query: SearchQuery) -> list[Home]:
         )
     ]
 
-    # Filter the homes if any keyword queries were given
-    if search_query.queries:
-        homes = [
-            home
-            for home in tqdm(iterable=homes, desc="Filtering homes based on keywords")
-            if home.description is not None
-            and any(
-                query.lower() in home.description.lower()
-                for query in search_query.queries
-            )
-        ]
-
+    # Filter the homes if any areas were given
+    if search_query.circles or search_query.polygons:
+        homes = filter_by_area(
+            homes=homes, circles=search_query.circles, polygons=search_query.polygons
+        )
     return homes
+
+
+def get_priority(home: Home, search_query: SearchQuery) -> tuple[float, float]:
+    """Get the priority of a home when checking its description, where lower is better.
+
+    The newest listings come first. Ties are broken by how close the home is to the
+    numeric bounds of the search query, being the middle of a range with both bounds,
+    or the bound itself if only one bound is given, relative to the size of the range
+    or the bound.
+
+    Args:
+        home:
+            The home.
+        search_query:
+            The search query.
+
+    Returns:
+        A pair (days on market, distance to the bounds), where unknown values are
+        infinite.
+
+    Example:
+        >>> search_query = SearchQuery(max_price=3_000_000)
+        >>> get_priority(
+        ...     home=Home(url="", address="", price=2_400_000, days_on_market=2),
+        ...     search_query=search_query,
+        ... )
+        (2, 0.2)
+    """
+    bounded_values = [
+        (home.price, search_query.min_price, search_query.max_price),
+        (home.num_rooms, search_query.min_rooms, search_query.max_rooms),
+        (home.size, search_query.min_size, search_query.max_size),
+        (home.monthly_fee, search_query.min_monthly_fee, search_query.max_monthly_fee),
+    ]
+    distances: list[float] = list()
+    for value, lower, upper in bounded_values:
+        if value is None:
+            continue
+        if lower is not None and upper is not None:
+            target, scale = (lower + upper) / 2, (upper - lower) / 2
+        elif lower is not None:
+            target = scale = lower
+        elif upper is not None:
+            target = scale = upper
+        else:
+            continue
+        distances.append(abs(value - target) / max(scale, 1))
+
+    days_on_market = math.inf if home.days_on_market is None else home.days_on_market
+    distance = sum(distances) / len(distances) if distances else math.inf
+    return days_on_market, distance
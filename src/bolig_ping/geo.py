@@ -0,0 +1,261 @@
+"""Geographic filtering of homes, backed by a spatial grid index."""
+
+import math
+from collections import defaultdict
+
+from .data_models import Circle, Home, Polygon
+
+# The mean radius of the Earth, in kilometres
+EARTH_RADIUS_KM = 6371.0
+
+# The number of kilometres per degree of latitude
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class GridIndex:
+    """A spatial index of homes, bucketing them into a grid of latitude/longitude cells.
+
+    Looking up the homes in an area only inspects the cells overlapping the bounding box
+    of the area, so the cost depends on the size of the area rather than on the total
+    number of homes. Homes without coordinates are not indexed.
+
+    Args:
+        homes:
+            The homes to index.
+        cell_size (optional):
+            The side length of the grid cells, in degrees. Defaults to 0.01, which is
+            roughly 1 km in Denmark.
+
+    Attributes:
+        cell_size:
+            The side length of the grid cells, in degrees.
+        cells:
+            The homes in every grid cell, keyed by the (row, column) of the cell.
+    """
+
+    def __init__(self, homes: list[Home], cell_size: float = 0.01) -> None:
+        """Initialise the grid index.
+
+        Args:
+            homes:
+                The homes to index.
+            cell_size (optional):
+                The side length of the grid cells, in degrees. Defaults to 0.01.
+        """
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[Home]] = defaultdict(list)
+        for home in homes:
+            if home.latitude is not None and home.longitude is not None:
+                self.cells[self._cell(home.latitude, home.longitude)].append(home)
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        """Get the grid cell containing a point.
+
+        Args:
+            latitude:
+                The latitude of the point.
+            longitude:
+                The longitude of the point.
+
+        Returns:
+            The (row, column) of the grid cell.
+        """
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def query_box(
+        self,
+        min_latitude: float,
+        max_latitude: float,
+        min_longitude: float,
+        max_longitude: float,
+    ) -> list[Home]:
+        """Get the homes in the grid cells overlapping a bounding box.
+
+        Args:
+            min_latitude:
+                The minimum latitude of the bounding box.
+            max_latitude:
+                The maximum latitude of the bounding box.
+            min_longitude:
+                The minimum longitude of the bounding box.
+            max_longitude:
+                The maximum longitude of the bounding box.
+
+        Returns:
+            The candidate homes, which might lie slightly outside the bounding box.
+        """
+        min_row, min_col = self._cell(min_latitude, min_longitude)
+        max_row, max_col = self._cell(max_latitude, max_longitude)
+
+        # If the box covers more cells than are populated, scanning the populated cells
+        # is cheaper
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            return [
+                home
+                for (row, col), homes in self.cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+                for home in homes
+            ]
+
+        return [
+            home
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+            for home in self.cells.get((row, col), [])
+        ]
+
+    def query_circle(self, circle: Circle) -> list[Home]:
+        """Get the homes inside a circle.
+
+        Args:
+            circle:
+                The circle to get the homes inside.
+
+        Returns:
+            The homes inside the circle.
+        """
+        latitude_delta = circle.radius_km / KM_PER_DEGREE
+        longitude_delta = circle.radius_km / (
+            KM_PER_DEGREE * max(math.cos(math.radians(circle.latitude)), 1e-6)
+        )
+        candidates = self.query_box(
+            min_latitude=circle.latitude - latitude_delta,
+            max_latitude=circle.latitude + latitude_delta,
+            min_longitude=circle.longitude - longitude_delta,
+            max_longitude=circle.longitude + longitude_delta,
+        )
+        return [
+            home
+            for home in candidates
+            if haversine_distance(
+                circle.latitude, circle.longitude, home.latitude, home.longitude
+            )
+            <= circle.radius_km
+        ]
+
+    def query_polygon(self, polygon: Polygon) -> list[Home]:
+        """Get the homes inside a polygon.
+
+        Args:
+            polygon:
+                The polygon to get the homes inside.
+
+        Returns:
+            The homes inside the polygon.
+        """
+        latitudes = [latitude for latitude, _ in polygon.vertices]
+        longitudes = [longitude for _, longitude in polygon.vertices]
+        candidates = self.query_box(
+            min_latitude=min(latitudes),
+            max_latitude=max(latitudes),
+            min_longitude=min(longitudes),
+            max_longitude=max(longitudes),
+        )
+        return [
+            home
+            for home in candidates
+            if is_inside_polygon(
+                latitude=home.latitude, longitude=home.longitude, polygon=polygon
+            )
+        ]
+
+
+def filter_by_area(
+    homes: list[Home], circles: list[Circle], polygons: list[Polygon]
+) -> list[Home]:
+    """Keep the homes lying inside at least one of the given areas.
+
+    Args:
+        homes:
+            The homes to filter.
+        circles:
+            The circular areas.
+        polygons:
+            The polygonal areas.
+
+    Returns:
+        The homes inside at least one of the areas, in their original order.
+    """
+    index = GridIndex(homes=homes)
+    inside_urls = {
+        home.url for circle in circles for home in index.query_circle(circle)
+    }
+    inside_urls |= {
+        home.url for polygon in polygons for home in index.query_polygon(polygon)
+    }
+    return [home for home in homes if home.url in inside_urls]
+
+
+def haversine_distance(
+    latitude1: float,
+    longitude1: float,
+    latitude2: float | None,
+    longitude2: float | None,
+) -> float:
+    """Get the great-circle distance between two points.
+
+    Args:
+        latitude1:
+            The latitude of the first point.
+        longitude1:
+            The longitude of the first point.
+        latitude2:
+            The latitude of the second point. If None then the distance is infinite.
+        longitude2:
+            The longitude of the second point. If None then the distance is infinite.
+
+    Returns:
+        The distance between the points, in kilometres.
+
+    Example:
+        >>> round(haversine_distance(55.6761, 12.5683, 56.1629, 10.2039))
+        157
+    """
+    if latitude2 is None or longitude2 is None:
+        return math.inf
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    delta_phi = phi2 - phi1
+    delta_lambda = math.radians(longitude2 - longitude1)
+    a = (
+        math.sin(delta_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def is_inside_polygon(
+    latitude: float | None, longitude: float | None, polygon: Polygon
+) -> bool:
+    """Check if a point lies inside a polygon, using ray casting.
+
+    Args:
+        latitude:
+            The latitude of the point. If None then the point is not inside.
+        longitude:
+            The longitude of the point. If None then the point is not inside.
+        polygon:
+            The polygon.
+
+    Returns:
+        True if the point is inside the polygon, False otherwise.
+
+    Example:
+        >>> square = Polygon(vertices=[(0, 0), (0, 1), (1, 1), (1, 0)])
+        >>> is_inside_polygon(latitude=0.5, longitude=0.5, polygon=square)
+        True
+        >>> is_inside_polygon(latitude=1.5, longitude=0.5, polygon=square)
+        False
+    """
+    if latitude is None or longitude is None:
+        return False
+    inside = False
+    vertices = polygon.vertices
+    for (lat1, lon1), (lat2, lon2) in zip(vertices, vertices[1:] + vertices[:1]):
+        if (lat1 > latitude) != (lat2 > latitude):
+            crossing = lon1 + (latitude - lat1) * (lon2 - lon1) / (lat2 - lat1)
+            if longitude < crossing:
+                inside = not inside
+    return inside
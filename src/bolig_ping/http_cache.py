@@ -0,0 +1,291 @@
+"""HTTP cache of search result pages, revalidated with conditional requests.
+
+Every page is stored in parsed form, along with its `ETag` and `Last-Modified`
+validators. A page fetched within the freshness TTL is used without contacting the API
+at all. Otherwise the page is revalidated with a conditional request, where a
+`304 Not Modified` response skips both the transfer and the parsing of the page. Pages
+stored by an earlier run are only loaded when they are used, so a page that has changed
+is never loaded from the cache.
+"""
+
+import datetime as dt
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from .cache import connect_to_cache
+from .data_models import Home
+
+
+class SearchPage(BaseModel):
+    """A parsed page of search results."""
+
+    total_hits: int = Field(ge=0)
+    homes: list[Home]
+
+
+class CachedPage(BaseModel):
+    """A cached page of search results, along with its validators.
+
+    The page is stored as JSON, which is only parsed when the page is used.
+    """
+
+    page_json: str
+    etag: str | None = None
+    last_modified: str | None = None
+    fetched: float
+    _page: SearchPage | None = PrivateAttr(default=None)
+
+    @classmethod
+    def from_page(
+        cls, page: SearchPage, etag: str | None = None, last_modified: str | None = None
+    ) -> "CachedPage":
+        """Create a cached page from a freshly fetched page.
+
+        Args:
+            page:
+                The parsed page.
+            etag (optional):
+                The `ETag` header of the response, if any. Defaults to None.
+            last_modified (optional):
+                The `Last-Modified` header of the response, if any. Defaults to None.
+
+        Returns:
+            The cached page, which is already parsed.
+        """
+        cached_page = cls(
+            page_json=page.model_dump_json(),
+            etag=etag,
+            last_modified=last_modified,
+            fetched=time.time(),
+        )
+        cached_page._page = page
+        return cached_page
+
+    def get_page(self) -> SearchPage:
+        """Get the parsed page, parsing it the first time it is used.
+
+        Returns:
+            The parsed page.
+        """
+        if self._page is None:
+            self._page = SearchPage.model_validate_json(self.page_json)
+        return self._page
+
+    def get_conditional_headers(self) -> dict[str, str]:
+        """Get the headers revalidating the page with a conditional request.
+
+        Returns:
+            The conditional request headers.
+        """
+        headers: dict[str, str] = dict()
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """A cache of search result pages, keyed by their URL.
+
+    Pages are kept in memory, for long-lived processes, and in the cache database, so
+    that they can be revalidated by the next run. The cache is thread-safe.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file storing the pages, or None to only keep them in
+            memory. Defaults to ".bolig_ping_cache".
+        ttl (optional):
+            How long a page is used without being revalidated. Defaults to 1 minute.
+        max_age (optional):
+            Pages that have not been fetched or revalidated for this long are removed.
+            Defaults to 1 day.
+        max_memory_entries (optional):
+            The maximum number of pages kept in memory, where the least recently used
+            pages are evicted first. Defaults to 1,024.
+
+    Attributes:
+        cache_path:
+            The path to the cache file storing the pages, or None.
+        ttl:
+            How long a page is used without being revalidated.
+        max_age:
+            Pages that have not been fetched or revalidated for this long are removed.
+        max_memory_entries:
+            The maximum number of pages kept in memory.
+    """
+
+    def __init__(
+        self,
+        cache_path: Path | None = Path(".bolig_ping_cache"),
+        ttl: dt.timedelta = dt.timedelta(minutes=1),
+        max_age: dt.timedelta = dt.timedelta(days=1),
+        max_memory_entries: int = 1_024,
+    ) -> None:
+        """Initialise the page cache, removing pages older than the maximum age.
+
+        Args:
+            cache_path (optional):
+                The path to the cache file storing the pages, or None to only keep them
+                in memory. Defaults to ".bolig_ping_cache".
+            ttl (optional):
+                How long a page is used without being revalidated. Defaults to 1
+                minute.
+            max_age (optional):
+                Pages that have not been fetched or revalidated for this long are
+                removed. Defaults to 1 day.
+            max_memory_entries (optional):
+                The maximum number of pages kept in memory. Defaults to 1,024.
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.max_memory_entries = max_memory_entries
+        self._pages: OrderedDict[str, CachedPage] = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_path is not None:
+            with connect_to_cache(cache_path=cache_path) as connection:
+                create_http_cache_table(connection=connection)
+                connection.execute(
+                    "DELETE FROM http_cache WHERE fetched < ?",
+                    (time.time() - max_age.total_seconds(),),
+                )
+
+    def lookup(self, url: str) -> CachedPage | None:
+        """Look up a cached page, without parsing it.
+
+        Args:
+            url:
+                The URL of the page.
+
+        Returns:
+            The cached page, or None if the page is not cached.
+        """
+        with self._lock:
+            cached_page = self._pages.get(url)
+            if cached_page is not None:
+                self._pages.move_to_end(url)
+                return cached_page
+        if self.cache_path is None:
+            return None
+
+        with connect_to_cache(cache_path=self.cache_path) as connection:
+            create_http_cache_table(connection=connection)
+            row = connection.execute(
+                "SELECT page_json, etag, last_modified, fetched FROM http_cache "
+                "WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        page_json, etag, last_modified, fetched = row
+        cached_page = CachedPage(
+            page_json=page_json, etag=etag, last_modified=last_modified, fetched=fetched
+        )
+        self._remember(url=url, cached_page=cached_page)
+        return cached_page
+
+    def is_fresh(self, cached_page: CachedPage) -> bool:
+        """Check if a cached page can be used without revalidating it.
+
+        Args:
+            cached_page:
+                The cached page.
+
+        Returns:
+            True if the page was fetched or revalidated within the TTL.
+        """
+        return time.time() - cached_page.fetched < self.ttl.total_seconds()
+
+    def store(
+        self,
+        url: str,
+        page: SearchPage,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        """Store a freshly fetched page.
+
+        Args:
+            url:
+                The URL of the page.
+            page:
+                The parsed page.
+            etag (optional):
+                The `ETag` header of the response, if any. Defaults to None.
+            last_modified (optional):
+                The `Last-Modified` header of the response, if any. Defaults to None.
+        """
+        cached_page = CachedPage.from_page(
+            page=page, etag=etag, last_modified=last_modified
+        )
+        self._remember(url=url, cached_page=cached_page)
+        if self.cache_path is not None:
+            with connect_to_cache(cache_path=self.cache_path) as connection:
+                create_http_cache_table(connection=connection)
+                connection.execute(
+                    "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?)",
+                    (
+                        url,
+                        cached_page.page_json,
+                        etag,
+                        last_modified,
+                        cached_page.fetched,
+                    ),
+                )
+
+    def touch(self, url: str) -> None:
+        """Mark a cached page as revalidated, restarting its TTL.
+
+        Args:
+            url:
+                The URL of the page.
+        """
+        now = time.time()
+        with self._lock:
+            cached_page = self._pages.get(url)
+            if cached_page is not None:
+                cached_page.fetched = now
+        if self.cache_path is not None:
+            with connect_to_cache(cache_path=self.cache_path) as connection:
+                create_http_cache_table(connection=connection)
+                connection.execute(
+                    "UPDATE http_cache SET fetched = ? WHERE url = ?", (now, url)
+                )
+
+    def _remember(self, url: str, cached_page: CachedPage) -> None:
+        """Keep a page in memory, evicting the least recently used pages.
+
+        Args:
+            url:
+                The URL of the page.
+            cached_page:
+                The cached page.
+        """
+        with self._lock:
+            self._pages[url] = cached_page
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_memory_entries:
+                self._pages.popitem(last=False)
+
+
+def create_http_cache_table(connection: sqlite3.Connection) -> None:
+    """Create the table storing the cached pages, if it does not exist.
+
+    Args:
+        connection:
+            The connection to the cache.
+    """
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS http_cache ("
+        "url TEXT PRIMARY KEY, "
+        "page_json TEXT NOT NULL, "
+        "etag TEXT, "
+        "last_modified TEXT, "
+        "fetched REAL NOT NULL)"
+    )
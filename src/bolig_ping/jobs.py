@@ -0,0 +1,298 @@
+"""Durable queue of saved searches, which are run by any number of worker processes.
+
+Every saved search is a job in the cache database, which is due again a fixed interval
+after it was last run. A worker claims a due job by leasing it for a visibility
+timeout, during which no other worker can claim it. When the job has been run, the
+worker acknowledges it, scheduling the next run. If the worker crashes, the lease
+expires and the job is claimed by another worker.
+"""
+
+import datetime as dt
+import logging
+import sqlite3
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from .cache import connect_to_cache
+from .data_models import SearchQuery
+from .webhook import WebhookFormat
+
+logger = logging.getLogger(__package__)
+
+
+class SavedSearch(BaseModel):
+    """A search that is run periodically by the workers.
+
+    The deadline is in seconds, where None uses the deadline of the worker.
+    """
+
+    name: str
+    search_query: SearchQuery
+    emails: list[str] = Field(default_factory=list)
+    webhooks: list[str] = Field(default_factory=list)
+    webhook_format: WebhookFormat = "json"
+    webhook_batch_size: int = Field(default=50, ge=1)
+    interval: dt.timedelta = dt.timedelta(minutes=10)
+    digest_hours: float = Field(default=0, ge=0)
+    notify_changes: bool = True
+    cache: bool = True
+    deadline: float | None = Field(default=None, ge=0)
+    max_results: int | None = Field(default=None, ge=0)
+    max_description_fetches: int | None = Field(default=None, ge=0)
+
+
+class Job(BaseModel):
+    """A saved search that has been claimed by a worker."""
+
+    saved_search: SavedSearch
+    lease: str
+    attempts: int = Field(ge=1)
+
+
+def add_saved_search(
+    saved_search: SavedSearch, cache_path: Path = Path(".bolig_ping_cache")
+) -> None:
+    """Add a saved search to the queue, replacing any saved search with the same name.
+
+    The saved search is due immediately.
+
+    Args:
+        saved_search:
+            The saved search.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        connection.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, 0, NULL, 0)",
+            (saved_search.name, saved_search.model_dump_json(), time.time()),
+        )
+
+
+def remove_saved_search(
+    name: str, cache_path: Path = Path(".bolig_ping_cache")
+) -> bool:
+    """Remove a saved search from the queue.
+
+    Args:
+        name:
+            The name of the saved search.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        Whether the saved search existed.
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        cursor = connection.execute("DELETE FROM jobs WHERE name = ?", (name,))
+        return cursor.rowcount > 0
+
+
+def list_saved_searches(
+    cache_path: Path = Path(".bolig_ping_cache"),
+) -> list[SavedSearch]:
+    """List the saved searches in the queue.
+
+    Args:
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        The saved searches, sorted by name.
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        rows = connection.execute(
+            "SELECT search_json FROM jobs ORDER BY name"
+        ).fetchall()
+    return [SavedSearch.model_validate_json(search_json) for (search_json,) in rows]
+
+
+def claim_job(
+    visibility_timeout: dt.timedelta, cache_path: Path = Path(".bolig_ping_cache")
+) -> Job | None:
+    """Claim the saved search that has been due for the longest, if any.
+
+    Args:
+        visibility_timeout:
+            How long the job is hidden from other workers. If it has not been
+            acknowledged or released by then, it is assumed that the worker crashed.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        The claimed job, or None if no saved search is due.
+    """
+    now = time.time()
+    lease = uuid.uuid4().hex
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute(
+            "SELECT name, search_json, attempts FROM jobs "
+            "WHERE run_after <= ? AND visible_after <= ? "
+            "ORDER BY run_after LIMIT 1",
+            (now, now),
+        ).fetchone()
+        if row is not None:
+            connection.execute(
+                "UPDATE jobs SET visible_after = ?, lease = ?, attempts = attempts + 1 "
+                "WHERE name = ?",
+                (now + visibility_timeout.total_seconds(), lease, row[0]),
+            )
+        connection.execute("COMMIT")
+    if row is None:
+        return None
+    name, search_json, attempts = row
+    return Job(
+        saved_search=SavedSearch.model_validate_json(search_json),
+        lease=lease,
+        attempts=attempts + 1,
+    )
+
+
+def acknowledge_job(job: Job, cache_path: Path = Path(".bolig_ping_cache")) -> bool:
+    """Acknowledge that a job has been run, scheduling its next run.
+
+    Args:
+        job:
+            The job.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        Whether the job was still leased by the worker. If not, the lease had expired
+        and the job may have been claimed by another worker.
+    """
+    next_run = time.time() + job.saved_search.interval.total_seconds()
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        cursor = connection.execute(
+            "UPDATE jobs SET run_after = ?, visible_after = 0, lease = NULL, "
+            "attempts = 0 WHERE name = ? AND lease = ?",
+            (next_run, job.saved_search.name, job.lease),
+        )
+        return cursor.rowcount > 0
+
+
+def release_job(
+    job: Job, retry_after: dt.timedelta, cache_path: Path = Path(".bolig_ping_cache")
+) -> bool:
+    """Release a job that failed, so that it is retried later.
+
+    Args:
+        job:
+            The job.
+        retry_after:
+            How long to wait before the job is due again.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+
+    Returns:
+        Whether the job was still leased by the worker.
+    """
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_job_tables(connection=connection)
+        cursor = connection.execute(
+            "UPDATE jobs SET run_after = ?, visible_after = 0, lease = NULL "
+            "WHERE name = ? AND lease = ?",
+            (
+                time.time() + retry_after.total_seconds(),
+                job.saved_search.name,
+                job.lease,
+            ),
+        )
+        return cursor.rowcount > 0
+
+
+def run_worker(
+    run_search: Callable[[SavedSearch], object],
+    visibility_timeout: dt.timedelta = dt.timedelta(minutes=15),
+    cache_path: Path = Path(".bolig_ping_cache"),
+    poll_interval: dt.timedelta = dt.timedelta(seconds=5),
+    stop_when_idle: bool = False,
+) -> int:
+    """Claim, run and acknowledge saved searches until interrupted.
+
+    Failed searches are retried with exponential backoff, but never later than their
+    regular interval.
+
+    Args:
+        run_search:
+            The function running a saved search.
+        visibility_timeout (optional):
+            How long a claimed job is hidden from other workers, which should exceed
+            the time it takes to run a search. Defaults to 15 minutes.
+        cache_path (optional):
+            The path to the cache file storing the queue. Defaults to
+            ".bolig_ping_cache".
+        poll_interval (optional):
+            How long to wait before checking the queue again when no saved search is
+            due. Defaults to 5 seconds.
+        stop_when_idle (optional):
+            Whether to stop when no saved search is due, rather than waiting for the
+            next one. Defaults to False.
+
+    Returns:
+        The number of saved searches that were run successfully.
+    """
+    num_succeeded = 0
+    while True:
+        job = claim_job(visibility_timeout=visibility_timeout, cache_path=cache_path)
+        if job is None:
+            if stop_when_idle:
+                return num_succeeded
+            time.sleep(poll_interval.total_seconds())
+            continue
+
+        name = job.saved_search.name
+        try:
+            run_search(job.saved_search)
+        except Exception as e:
+            retry_after = min(
+                dt.timedelta(minutes=2 ** (job.attempts - 1)), job.saved_search.interval
+            )
+            logger.exception(
+                f"The saved search {name!r} failed, so retrying it in "
+                f"{retry_after}: {e}"
+            )
+            release_job(job=job, retry_after=retry_after, cache_path=cache_path)
+            continue
+
+        num_succeeded += 1
+        if not acknowledge_job(job=job, cache_path=cache_path):
+            logger.warning(
+                f"The saved search {name!r} took longer than the visibility timeout of "
+                f"{visibility_timeout}, so it might have been run twice."
+            )
+
+
+def create_job_tables(connection: sqlite3.Connection) -> None:
+    """Create the table storing the saved searches, if it does not exist.
+
+    Args:
+        connection:
+            The connection to the cache.
+    """
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "name TEXT PRIMARY KEY, "
+        "search_json TEXT NOT NULL, "
+        "run_after REAL NOT NULL, "
+        "visible_after REAL NOT NULL, "
+        "lease TEXT, "
+        "attempts INTEGER NOT NULL)"
+    )
+    connection.execute("CREATE INDEX IF NOT EXISTS jobs_run_after ON jobs (run_after)")
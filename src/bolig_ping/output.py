@@ -0,0 +1,308 @@
+"""Machine-readable output of homes, written incrementally as they are found."""
+
+import csv
+import json
+import sys
+import typing
+from abc import ABC, abstractmethod
+from pathlib import Path
+from types import NoneType, TracebackType
+from typing import IO, Literal
+
+from .data_models import DESCRIPTION_FIELDS, Home
+
+# The columns of the output, which are the fields of a home except its description
+COLUMNS = [field for field in Home.model_fields if field not in DESCRIPTION_FIELDS]
+
+OutputFormat = Literal["jsonl", "csv", "parquet"]
+
+
+def get_column_type(column: str) -> type:
+    """Get the type of the values of a column, ignoring that they can be missing.
+
+    Args:
+        column:
+            The column, which is a field of a home.
+
+    Returns:
+        The type of the values of the column.
+
+    Example:
+        >>> get_column_type("price")
+        <class 'int'>
+    """
+    annotation = Home.model_fields[column].annotation
+    return next(
+        arg
+        for arg in typing.get_args(annotation) or (annotation,)
+        if arg is not NoneType
+    )
+
+
+class HomeWriter(ABC):
+    """Base class for writers of homes, which can be used as context managers.
+
+    Args:
+        path (optional):
+            The path to write the homes to, or None to write to standard output.
+            Defaults to None.
+
+    Attributes:
+        path:
+            The path to write the homes to, or None to write to standard output.
+        num_written:
+            The number of homes written so far.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        """Initialise the writer.
+
+        Args:
+            path (optional):
+                The path to write the homes to, or None to write to standard output.
+                Defaults to None.
+        """
+        self.path = path
+        self.num_written = 0
+
+    @abstractmethod
+    def write(self, home: Home) -> None:
+        """Write a home.
+
+        Args:
+            home:
+                The home to write.
+        """
+
+    @abstractmethod
+    def close(self) -> None:
+        """Flush the remaining output and close the writer."""
+
+    def __enter__(self) -> "HomeWriter":
+        """Enter the context of the writer.
+
+        Returns:
+            The writer.
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Exit the context of the writer, closing it.
+
+        Args:
+            exc_type:
+                The type of the exception raised in the context, if any.
+            exc_value:
+                The exception raised in the context, if any.
+            traceback:
+                The traceback of the exception raised in the context, if any.
+        """
+        self.close()
+
+    def _open_text(self, newline: str | None = None) -> IO[str]:
+        """Open the text stream to write to.
+
+        Args:
+            newline (optional):
+                The newline mode of the stream. Defaults to None.
+
+        Returns:
+            The text stream.
+        """
+        if self.path is None:
+            return sys.stdout
+        return self.path.open("w", encoding="utf-8", newline=newline)
+
+    def _close_text(self, stream: IO[str]) -> None:
+        """Flush a text stream, closing it unless it is standard output.
+
+        Args:
+            stream:
+                The text stream.
+        """
+        stream.flush()
+        if self.path is not None:
+            stream.close()
+
+
+class JsonlWriter(HomeWriter):
+    """Writer of homes as JSON Lines, with one JSON object per home.
+
+    Args:
+        path (optional):
+            The path to write the homes to, or None to write to standard output.
+            Defaults to None.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        """Initialise the writer.
+
+        Args:
+            path (optional):
+                The path to write the homes to, or None to write to standard output.
+                Defaults to None.
+        """
+        super().__init__(path=path)
+        self._stream = self._open_text()
+
+    def write(self, home: Home) -> None:
+        """Write a home.
+
+        Args:
+            home:
+                The home to write.
+        """
+        self._stream.write(json.dumps(home.to_dict(), ensure_ascii=False) + "\n")
+        self.num_written += 1
+
+    def close(self) -> None:
+        """Flush the remaining output and close the writer."""
+        self._close_text(stream=self._stream)
+
+
+class CsvWriter(HomeWriter):
+    """Writer of homes as CSV, with a header row and one row per home.
+
+    Args:
+        path (optional):
+            The path to write the homes to, or None to write to standard output.
+            Defaults to None.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        """Initialise the writer.
+
+        Args:
+            path (optional):
+                The path to write the homes to, or None to write to standard output.
+                Defaults to None.
+        """
+        super().__init__(path=path)
+        self._stream = self._open_text(newline="")
+        self._writer = csv.DictWriter(self._stream, fieldnames=COLUMNS)
+        self._writer.writeheader()
+
+    def write(self, home: Home) -> None:
+        """Write a home.
+
+        Args:
+            home:
+                The home to write.
+        """
+        self._writer.writerow(home.to_dict())
+        self.num_written += 1
+
+    def close(self) -> None:
+        """Flush the remaining output and close the writer."""
+        self._close_text(stream=self._stream)
+
+
+class ParquetWriter(HomeWriter):
+    """Writer of homes as Parquet, buffering the homes into columnar row groups.
+
+    This requires the `pyarrow` package, which can be installed with
+    `pip install bolig_ping[parquet]`.
+
+    Args:
+        path (optional):
+            The path to write the homes to, or None to write to standard output.
+            Defaults to None.
+        batch_size (optional):
+            The number of homes in every row group. Defaults to 10,000.
+
+    Raises:
+        ImportError:
+            If `pyarrow` is not installed.
+    """
+
+    def __init__(self, path: Path | None = None, batch_size: int = 10_000) -> None:
+        """Initialise the writer.
+
+        Args:
+            path (optional):
+                The path to write the homes to, or None to write to standard output.
+                Defaults to None.
+            batch_size (optional):
+                The number of homes in every row group. Defaults to 10,000.
+
+        Raises:
+            ImportError:
+                If `pyarrow` is not installed.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                "Parquet output requires the `pyarrow` package. Install it with "
+                "`pip install bolig_ping[parquet]`."
+            )
+        super().__init__(path=path)
+        self.batch_size = batch_size
+        self._pa = pa
+        arrow_types = {str: pa.string(), int: pa.int64(), float: pa.float64()}
+        self._schema = pa.schema(
+            [(column, arrow_types[get_column_type(column)]) for column in COLUMNS]
+        )
+        sink = sys.stdout.buffer if path is None else str(path)
+        self._writer = pq.ParquetWriter(where=sink, schema=self._schema)
+        self._columns: dict[str, list] = {column: list() for column in COLUMNS}
+
+    def write(self, home: Home) -> None:
+        """Write a home.
+
+        Args:
+            home:
+                The home to write.
+        """
+        for column, value in home.to_dict().items():
+            self._columns[column].append(value)
+        self.num_written += 1
+        if len(self._columns["url"]) >= self.batch_size:
+            self._flush()
+
+    def close(self) -> None:
+        """Flush the remaining output and close the writer."""
+        self._flush()
+        self._writer.close()
+
+    def _flush(self) -> None:
+        """Write the buffered homes as a row group."""
+        if not self._columns["url"]:
+            return
+        table = self._pa.Table.from_pydict(self._columns, schema=self._schema)
+        self._writer.write_table(table)
+        self._columns = {column: list() for column in COLUMNS}
+
+
+def get_writer(output_format: OutputFormat, path: Path | None = None) -> HomeWriter:
+    """Get a writer of homes in the given format.
+
+    Args:
+        output_format:
+            The format to write the homes in.
+        path (optional):
+            The path to write the homes to, or None to write to standard output.
+            Defaults to None.
+
+    Returns:
+        The writer.
+
+    Raises:
+        ValueError:
+            If the format is not supported.
+    """
+    match output_format:
+        case "jsonl":
+            return JsonlWriter(path=path)
+        case "csv":
+            return CsvWriter(path=path)
+        case "parquet":
+            return ParquetWriter(path=path)
+        case _:
+            raise ValueError(f"Unsupported output format {output_format!r}.")
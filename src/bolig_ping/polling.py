@@ -0,0 +1,124 @@
+"""Adaptive polling intervals, following the arrival rate of new homes."""
+
+import datetime as dt
+
+
+class PollingSchedule:
+    """A polling interval that adapts to the arrival rate of new homes.
+
+    The arrival rate is estimated as an exponentially weighted moving average of the
+    number of new homes per second between polls. The interval is then the expected time
+    until `target_arrivals` new homes have arrived, clamped to the given bounds. Every
+    poll without new homes thus lengthens the interval by a factor of
+    `1 / (1 - smoothing)`, while a burst of new homes shortens it right away.
+
+    Args:
+        min_interval:
+            The minimum interval between polls.
+        max_interval:
+            The maximum interval between polls.
+        smoothing (optional):
+            The weight of the latest poll in the arrival rate estimate, between 0 and 1.
+            Defaults to 0.3.
+        target_arrivals (optional):
+            The number of new homes to expect between polls. Defaults to 1.
+
+    Attributes:
+        min_interval:
+            The minimum interval between polls.
+        max_interval:
+            The maximum interval between polls.
+        smoothing:
+            The weight of the latest poll in the arrival rate estimate.
+        target_arrivals:
+            The number of new homes to expect between polls.
+        rate:
+            The estimated number of new homes per second, or None before the first
+            estimate.
+        interval:
+            The current interval between polls.
+
+    Raises:
+        ValueError:
+            If the bounds or the smoothing are invalid.
+    """
+
+    def __init__(
+        self,
+        min_interval: dt.timedelta,
+        max_interval: dt.timedelta,
+        smoothing: float = 0.3,
+        target_arrivals: float = 1.0,
+    ) -> None:
+        """Initialise the polling schedule.
+
+        Args:
+            min_interval:
+                The minimum interval between polls.
+            max_interval:
+                The maximum interval between polls.
+            smoothing (optional):
+                The weight of the latest poll in the arrival rate estimate, between 0
+                and 1. Defaults to 0.3.
+            target_arrivals (optional):
+                The number of new homes to expect between polls. Defaults to 1.
+
+        Raises:
+            ValueError:
+                If the bounds or the smoothing are invalid.
+        """
+        if min_interval.total_seconds() <= 0 or max_interval < min_interval:
+            raise ValueError(
+                "The minimum interval must be positive and at most the maximum "
+                f"interval, but got {min_interval} and {max_interval}."
+            )
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"The smoothing must be in (0, 1], but got {smoothing}.")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.target_arrivals = target_arrivals
+        self.rate: float | None = None
+        self.interval = min_interval
+
+    def record_poll(self, num_new: int, elapsed: dt.timedelta) -> dt.timedelta:
+        """Record the number of new homes found by a poll, and update the interval.
+
+        Args:
+            num_new:
+                The number of new homes found since the previous poll.
+            elapsed:
+                The time since the previous poll.
+
+        Returns:
+            The updated interval until the next poll.
+
+        Example:
+            >>> schedule = PollingSchedule(
+            ...     min_interval=dt.timedelta(minutes=1),
+            ...     max_interval=dt.timedelta(hours=1),
+            ...     smoothing=0.5,
+            ... )
+            >>> schedule.record_poll(num_new=1, elapsed=dt.timedelta(minutes=10))
+            datetime.timedelta(seconds=600)
+            >>> schedule.record_poll(num_new=0, elapsed=dt.timedelta(minutes=10))
+            datetime.timedelta(seconds=1200)
+            >>> schedule.record_poll(num_new=30, elapsed=dt.timedelta(minutes=10))
+            datetime.timedelta(seconds=60)
+        """
+        seconds = elapsed.total_seconds()
+        if seconds <= 0:
+            return self.interval
+        observed_rate = num_new / seconds
+        if self.rate is None:
+            self.rate = observed_rate
+        else:
+            self.rate = (
+                self.smoothing * observed_rate + (1 - self.smoothing) * self.rate
+            )
+        if self.rate > 0:
+            interval = dt.timedelta(seconds=self.target_arrivals / self.rate)
+        else:
+            interval = self.max_interval
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        return self.interval
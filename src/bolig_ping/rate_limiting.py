@@ -0,0 +1,291 @@
+"""Client-side rate limiting of requests, with retries and adaptive concurrency."""
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from .deadline import Deadline
+
+logger = logging.getLogger(__package__)
+
+# The (connect, read) timeout of every request, in seconds
+REQUEST_TIMEOUT = (10.0, 30.0)
+
+# The HTTP status codes that signal that we should back off and retry
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """A rate limiter that adapts the number of concurrent requests.
+
+    The concurrency limit follows an additive-increase/multiplicative-decrease (AIMD)
+    scheme: every successful request increases the limit by roughly one per round of
+    requests, and every throttled or failed request halves it. Retry-After headers pause
+    all requests sharing the rate limiter.
+
+    Args:
+        min_concurrency (optional):
+            The minimum number of concurrent requests. Defaults to 1.
+        max_concurrency (optional):
+            The maximum number of concurrent requests. Defaults to 8.
+        initial_concurrency (optional):
+            The initial number of concurrent requests. Defaults to 2.
+
+    Attributes:
+        min_concurrency:
+            The minimum number of concurrent requests.
+        max_concurrency:
+            The maximum number of concurrent requests.
+        concurrency:
+            The current limit on the number of concurrent requests.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        initial_concurrency: int = 2,
+    ) -> None:
+        """Initialise the rate limiter.
+
+        Args:
+            min_concurrency (optional):
+                The minimum number of concurrent requests. Defaults to 1.
+            max_concurrency (optional):
+                The maximum number of concurrent requests. Defaults to 8.
+            initial_concurrency (optional):
+                The initial number of concurrent requests. Defaults to 2.
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(
+            min(max(initial_concurrency, min_concurrency), max_concurrency)
+        )
+        self._num_active = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Generator[None, None, None]:
+        """Wait for a free request slot, and hold it while making a request.
+
+        Yields:
+            Nothing, as this only blocks until a slot is free.
+        """
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(timeout=pause)
+                elif self._num_active >= int(self.concurrency):
+                    self._condition.wait()
+                else:
+                    break
+            self._num_active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._num_active -= 1
+                self._condition.notify_all()
+
+    def record_success(self) -> None:
+        """Record a successful request, increasing the concurrency limit additively."""
+        with self._condition:
+            self.concurrency = min(
+                self.concurrency + 1 / self.concurrency, self.max_concurrency
+            )
+            self._condition.notify_all()
+
+    def record_throttle(self, retry_after: float | None = None) -> None:
+        """Record a throttled or failed request, halving the concurrency limit.
+
+        Args:
+            retry_after (optional):
+                The number of seconds to pause all requests for, as requested by the
+                server, or None to not pause. Defaults to None.
+        """
+        with self._condition:
+            self.concurrency = max(self.concurrency / 2, self.min_concurrency)
+            if retry_after is not None:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+
+
+def get_with_retry(
+    url: str,
+    rate_limiter: RateLimiter,
+    deadline: Deadline | None = None,
+    session: requests.Session | None = None,
+    headers: dict[str, str] | None = None,
+    max_retries: int = 5,
+    backoff_base: float = 0.5,
+    backoff_max: float = 30.0,
+) -> requests.Response:
+    """Get a URL, retrying with exponential backoff and jitter on transient errors.
+
+    Args:
+        url:
+            The URL to get.
+        rate_limiter:
+            The rate limiter to make the request through.
+        deadline (optional):
+            The deadline for the request, including all retries, or None for no
+            deadline. Defaults to None.
+        session (optional):
+            The session to make the request with, reusing its connections, or None to
+            make the request without a session. Defaults to None.
+        headers (optional):
+            Extra headers to send with the request, or None to send no extra headers.
+            Defaults to None.
+        max_retries (optional):
+            The maximum number of retries. Defaults to 5.
+        backoff_base (optional):
+            The base backoff in seconds, which is doubled for every retry. Defaults to
+            0.5.
+        backoff_max (optional):
+            The maximum backoff in seconds. Defaults to 30.
+
+    Returns:
+        The successful response, which might be a `304 Not Modified` response to a
+        conditional request.
+
+    Raises:
+        RequestException:
+            If the request still failed after all retries, or the deadline was reached.
+    """
+    return request_with_retry(
+        method="GET",
+        url=url,
+        rate_limiter=rate_limiter,
+        deadline=deadline,
+        session=session,
+        headers=headers,
+        max_retries=max_retries,
+        backoff_base=backoff_base,
+        backoff_max=backoff_max,
+    )
+
+
+def request_with_retry(
+    method: str,
+    url: str,
+    rate_limiter: RateLimiter,
+    deadline: Deadline | None = None,
+    session: requests.Session | None = None,
+    headers: dict[str, str] | None = None,
+    data: bytes | None = None,
+    max_retries: int = 5,
+    backoff_base: float = 0.5,
+    backoff_max: float = 30.0,
+) -> requests.Response:
+    """Make a request, retrying with exponential backoff and jitter on transient errors.
+
+    Note that requests which are not idempotent, such as POST requests, might be
+    delivered more than once, if the connection fails after the server received them.
+
+    Args:
+        method:
+            The HTTP method of the request.
+        url:
+            The URL to request.
+        rate_limiter:
+            The rate limiter to make the request through.
+        deadline (optional):
+            The deadline for the request, including all retries, or None for no
+            deadline. Defaults to None.
+        session (optional):
+            The session to make the request with, reusing its connections, or None to
+            make the request without a session. Defaults to None.
+        headers (optional):
+            Extra headers to send with the request, or None to send no extra headers.
+            Defaults to None.
+        data (optional):
+            The body of the request, or None to send no body. Defaults to None.
+        max_retries (optional):
+            The maximum number of retries. Defaults to 5.
+        backoff_base (optional):
+            The base backoff in seconds, which is doubled for every retry. Defaults to
+            0.5.
+        backoff_max (optional):
+            The maximum backoff in seconds. Defaults to 30.
+
+    Returns:
+        The successful response, which might be a `304 Not Modified` response to a
+        conditional request.
+
+    Raises:
+        RequestException:
+            If the request still failed after all retries, or the deadline was reached.
+    """
+    if deadline is None:
+        deadline = Deadline(seconds=None)
+    request = requests.request if session is None else session.request
+
+    for attempt in range(max_retries + 1):
+        retry_after: float | None = None
+        try:
+            with rate_limiter.slot():
+                response = request(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    data=data,
+                    timeout=deadline.clamp(timeout=REQUEST_TIMEOUT),
+                )
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                rate_limiter.record_success()
+                return response
+            retry_after = parse_retry_after(response=response)
+            error: requests.RequestException = requests.HTTPError(
+                f"{response.status_code} error for url {url}", response=response
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        rate_limiter.record_throttle(retry_after=retry_after)
+        if attempt == max_retries or deadline.expired():
+            raise error
+
+        backoff = random.uniform(0, min(backoff_base * 2**attempt, backoff_max))
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        remaining = deadline.remaining()
+        if remaining is not None and backoff >= remaining:
+            raise error
+        logger.debug(f"Retrying {url} in {backoff:.1f} seconds after error: {error}")
+        time.sleep(backoff)
+
+    raise AssertionError("Unreachable")  # pragma: no cover
+
+
+def parse_retry_after(response: requests.Response) -> float | None:
+    """Parse the Retry-After header of a response.
+
+    Args:
+        response:
+            The response to parse the header of.
+
+    Returns:
+        The number of seconds to wait, or None if the header is missing or invalid.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_time = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_time.timestamp() - time.time(), 0.0)
@@ -1,71 +1,332 @@
 """Scraping homes available satisfying the given criteria."""
 
+import datetime as dt
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 
 import requests
 from tqdm.auto import tqdm
 
-from .data_models import Home, SearchQuery
+from .checkpoint import (
+    ScrapeCheckpoint,
+    delete_checkpoint,
+    get_fingerprint,
+    load_checkpoint,
+    save_checkpoint,
+)
+from .data_models import LISTING_URL_PREFIX, Home, SearchQuery, get_case_description
+from .deadline import Deadline
+from .http_cache import PageCache, SearchPage
+from .rate_limiting import RateLimiter, get_with_retry
 
 logger = logging.getLogger(__package__)
 
 
-def scrape_results(search_query: SearchQuery) -> list[Home] | None:
+class ScrapeStatus:
+    """The completeness of a scrape, which can be shared by the shards of a scrape.
+
+    Attributes:
+        num_missing_pages:
+            The number of result pages that could not be scraped, due to failed
+            requests or the deadline passing.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the status of a scrape."""
+        self.num_missing_pages = 0
+        self._lock = threading.Lock()
+
+    def add_missing_pages(self, num_pages: int) -> None:
+        """Record result pages that could not be scraped.
+
+        Args:
+            num_pages:
+                The number of pages that could not be scraped.
+        """
+        with self._lock:
+            self.num_missing_pages += num_pages
+
+    def is_complete(self) -> bool:
+        """Check if every result page was scraped.
+
+        Returns:
+            True if no result pages are missing, False otherwise.
+        """
+        return self.num_missing_pages == 0
+
+
+def scrape_results(
+    search_query: SearchQuery,
+    deadline: Deadline | None = None,
+    rate_limiter: RateLimiter | None = None,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+    checkpoint_dir: Path | None = None,
+    checkpoint_max_age: dt.timedelta = dt.timedelta(hours=1),
+    status: ScrapeStatus | None = None,
+) -> list[Home] | None:
     """Scrape the results of a home search query.
 
+    The pages are fetched concurrently through the rate limiter. If a page cannot be
+    fetched, even after retrying, or the deadline passes while scraping, the homes
+    scraped so far are returned.
+
+    If a checkpoint directory is given, then the progress is checkpointed while
+    scraping, and an interrupted scrape of the same search query is resumed from its
+    checkpoint, if the checkpoint is fresh enough.
+
     Args:
         search_query:
             The search query to scrape results for.
+        deadline (optional):
+            The deadline for the scraping, or None for no deadline. Defaults to None.
+        rate_limiter (optional):
+            The rate limiter to make the requests through, or None to create a new one.
+            Defaults to None.
+        session (optional):
+            The session to make the requests with, reusing its connections, or None to
+            make the requests without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the pages against, or None to
+            always fetch the pages in full. Defaults to None.
+        checkpoint_dir (optional):
+            The directory to store checkpoints in, or None to not use checkpoints.
+            Defaults to None.
+        checkpoint_max_age (optional):
+            Checkpoints older than this are not resumed from. Defaults to 1 hour.
+        status (optional):
+            The status to record pages that could not be scraped in, or None to not
+            record them. Defaults to None.
 
     Returns:
         A list of homes that satisfy the search query, or None if no results were found.
 
     Raises:
         HTTPError:
-            If there was an error in the HTTP request.
+            If there was an error in the HTTP request for the first page.
     """
     logger.info("Fetching results...")
+    if deadline is None:
+        deadline = Deadline(seconds=None)
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
 
-    # Get the results from the search query
-    url = search_query.get_url()
-    response = requests.get(url=url)
-    response.raise_for_status()
-
-    # Parse the response
-    result_dict = json.loads(response.text)
-    results = result_dict["cases"]
-    if results is None:
+    # Get the first page of results from the search query
+    first_page = fetch_search_page(
+        url=search_query.get_url(),
+        rate_limiter=rate_limiter,
+        deadline=deadline,
+        session=session,
+        page_cache=page_cache,
+    )
+    if not first_page.homes:
         return None
 
     # Get the number of pages
-    num_results = result_dict["totalHits"]
-    num_pages = num_results // len(results)
-    if num_results % len(results) != 0:
+    num_results = first_page.total_hits
+    num_pages = num_results // len(first_page.homes)
+    if num_results % len(first_page.homes) != 0:
         num_pages += 1
 
-    # Get the first page of results
-    homes = [get_home_from_result(result=result) for result in results]
+    # Get the first page of results, along with the pages of an interrupted scrape
+    checkpoint = ScrapeCheckpoint(
+        fingerprint=get_fingerprint(search_query=search_query),
+        total_hits=num_results,
+        num_pages=num_pages,
+    )
+    if checkpoint_dir is not None:
+        previous_checkpoint = load_checkpoint(
+            search_query=search_query,
+            checkpoint_dir=checkpoint_dir,
+            max_age=checkpoint_max_age,
+        )
+        if (
+            previous_checkpoint is not None
+            and previous_checkpoint.num_pages == num_pages
+        ):
+            logger.info(
+                f"Resuming from a checkpoint with {len(previous_checkpoint.pages):,} "
+                f"of {num_pages:,} pages scraped."
+            )
+            checkpoint.pages = previous_checkpoint.pages
+    pages = checkpoint.pages
+    pages[1] = first_page.homes
+
+    # Scrape the remaining pages, checkpointing every 10 pages and when interrupted
+    remaining_pages = [
+        page_idx for page_idx in range(2, num_pages + 1) if page_idx not in pages
+    ]
+    try:
+        if remaining_pages:
+            with (
+                tqdm(
+                    desc="Scraping homes from boligsiden.dk", total=num_results
+                ) as pbar,
+                ThreadPoolExecutor(
+                    max_workers=rate_limiter.max_concurrency
+                ) as executor,
+            ):
+                pbar.update(sum(len(page_homes) for page_homes in pages.values()))
+                futures = {
+                    executor.submit(
+                        scrape_page,
+                        search_query=search_query,
+                        page=page_idx,
+                        rate_limiter=rate_limiter,
+                        deadline=deadline,
+                        session=session,
+                        page_cache=page_cache,
+                    ): page_idx
+                    for page_idx in remaining_pages
+                }
+                for idx, future in enumerate(as_completed(futures)):
+                    new_homes = future.result()
+                    if new_homes is not None:
+                        pages[futures[future]] = new_homes
+                        pbar.update(len(new_homes))
+                    if checkpoint_dir is not None and (idx + 1) % 10 == 0:
+                        save_checkpoint(
+                            checkpoint=checkpoint, checkpoint_dir=checkpoint_dir
+                        )
+
+                # Ensure that the progress bar is at 100% at the end
+                pbar.n = pbar.total
+
+            if len(pages) < num_pages:
+                if status is not None:
+                    status.add_missing_pages(num_pages=num_pages - len(pages))
+                logger.warning(
+                    f"Only {len(pages):,} of {num_pages:,} pages could be scraped, so "
+                    "continuing with the homes scraped so far."
+                )
+    finally:
+        if checkpoint_dir is not None:
+            if len(pages) < num_pages:
+                save_checkpoint(checkpoint=checkpoint, checkpoint_dir=checkpoint_dir)
+            else:
+                delete_checkpoint(
+                    search_query=search_query, checkpoint_dir=checkpoint_dir
+                )
+
+    homes = [home for page_idx in sorted(pages) for home in pages[page_idx]]
+    return list(dict.fromkeys(homes))
+
+
+def scrape_page(
+    search_query: SearchQuery,
+    page: int,
+    rate_limiter: RateLimiter,
+    deadline: Deadline,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+) -> list[Home] | None:
+    """Scrape a single page of results of a home search query.
+
+    Args:
+        search_query:
+            The search query to scrape results for.
+        page:
+            The page number to scrape.
+        rate_limiter:
+            The rate limiter to make the request through.
+        deadline:
+            The deadline for the scraping.
+        session (optional):
+            The session to make the request with, reusing its connections, or None to
+            make the request without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the page against, or None to always
+            fetch the page in full. Defaults to None.
+
+    Returns:
+        The homes on the page, or None if the page could not be scraped before the
+        deadline or failed after all retries.
+    """
+    if deadline.expired():
+        return None
+    try:
+        search_page = fetch_search_page(
+            url=search_query.get_url(page=page),
+            rate_limiter=rate_limiter,
+            deadline=deadline,
+            session=session,
+            page_cache=page_cache,
+        )
+    except requests.RequestException as e:
+        if not deadline.expired():
+            logger.warning(f"Could not scrape page {page}: {e}")
+        return None
+    return search_page.homes
+
+
+def fetch_search_page(
+    url: str,
+    rate_limiter: RateLimiter,
+    deadline: Deadline,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+) -> SearchPage:
+    """Fetch and parse a page of search results.
+
+    If a page cache is given, then a cached page fetched within the TTL of the cache is
+    used as-is, and any other cached page is revalidated with a conditional request.
+    The page is only transferred and parsed if it has changed, and the cached page is
+    only parsed if it is used.
 
-    # Scrape the remaining pages
-    if num_pages > 1:
-        with tqdm(desc="Scraping homes from boligsiden.dk", total=num_results) as pbar:
-            pbar.update(len(homes))
-            for page_idx in range(2, num_pages + 1):
-                url = search_query.get_url(page=page_idx)
-                response = requests.get(url=url)
-                response.raise_for_status()
-                result_dict = json.loads(response.text)
-                results = result_dict["cases"]
-                new_homes = [get_home_from_result(result=result) for result in results]
-                homes.extend(new_homes)
-                homes = list(set(homes))
-                pbar.update(len(new_homes))
+    Args:
+        url:
+            The URL of the page.
+        rate_limiter:
+            The rate limiter to make the request through.
+        deadline:
+            The deadline for the request.
+        session (optional):
+            The session to make the request with, reusing its connections, or None to
+            make the request without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the page against, or None to always
+            fetch the page in full. Defaults to None.
 
-        # Ensure that the progress bar is at 100% at the end
-        pbar.n = pbar.total
+    Returns:
+        The parsed page, which has no homes and no hits if there are no results.
 
-    return homes
+    Raises:
+        RequestException:
+            If the page could not be fetched.
+    """
+    cached_page = page_cache.lookup(url=url) if page_cache is not None else None
+    if cached_page is not None and page_cache is not None:
+        if page_cache.is_fresh(cached_page=cached_page):
+            return cached_page.get_page()
+    response = get_with_retry(
+        url=url,
+        rate_limiter=rate_limiter,
+        deadline=deadline,
+        session=session,
+        headers=cached_page.get_conditional_headers() if cached_page else None,
+    )
+    if response.status_code == 304 and cached_page is not None:
+        if page_cache is not None:
+            page_cache.touch(url=url)
+        return cached_page.get_page()
+
+    result_dict = json.loads(response.text)
+    results = result_dict["cases"] or []
+    search_page = SearchPage(
+        total_hits=result_dict["totalHits"] if results else 0,
+        homes=[get_home_from_result(result=result) for result in results],
+    )
+    if page_cache is not None:
+        page_cache.store(
+            url=url,
+            page=search_page,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return search_page
 
 
 def get_home_from_result(result: dict) -> Home:
@@ -78,7 +339,7 @@ def get_home_from_result(result: dict) -> Home:
     Returns:
         The home from the result.
     """
-    url = f"https://boligsiden.dk/viderestilling/{result['caseID']}"
+    url = f"{LISTING_URL_PREFIX}{result['caseID']}"
     road_name = result["address"]["roadName"]
     road_number = result["address"].get("houseNumber")
     floor = result["address"].get("floor")
@@ -99,7 +360,9 @@ def get_home_from_result(result: dict) -> Home:
     if city:
         address += f" {city}"
 
-    return Home(
+    coordinates = result.get("coordinates") or dict()
+
+    home = Home(
         url=url,
         address=address,
         price=result.get("priceCash"),
@@ -107,4 +370,13 @@ def get_home_from_result(result: dict) -> Home:
         size=result.get("housingArea"),
         monthly_fee=result.get("monthlyExpense"),
         year=result.get("yearBuilt"),
+        latitude=coordinates.get("lat"),
+        longitude=coordinates.get("lon"),
+        days_on_market=result.get("daysOnMarket"),
     )
+
+    # Use the description if it is embedded in the result, saving a request
+    description = get_case_description(case=result)
+    if description is not None:
+        home.set_description(description=description)
+    return home
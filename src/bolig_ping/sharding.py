@@ -0,0 +1,354 @@
+"""Sharding of search queries with many results into smaller disjoint queries."""
+
+import datetime as dt
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from .data_models import Home, SearchQuery
+from .deadline import Deadline
+from .http_cache import PageCache
+from .rate_limiting import RateLimiter
+from .scraper import ScrapeStatus, fetch_search_page, scrape_results
+
+logger = logging.getLogger(__package__)
+
+# The price at which an unbounded price range is first split, in DKK
+PRICE_SPLIT_START = 4_000_000
+
+
+def scrape_sharded_results(
+    search_query: SearchQuery,
+    max_hits_per_shard: int = 1_000,
+    deadline: Deadline | None = None,
+    rate_limiter: RateLimiter | None = None,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+    checkpoint_dir: Path | None = None,
+    checkpoint_max_age: dt.timedelta = dt.timedelta(hours=1),
+    max_parallel_shards: int = 4,
+    status: ScrapeStatus | None = None,
+) -> list[Home] | None:
+    """Scrape the results of a home search query, sharding it if it is too large.
+
+    The search query is split into disjoint shards with at most `max_hits_per_shard`
+    results each, which are scraped in parallel and merged. Deep pages are thus avoided.
+    A shard that fails to be scraped, even after retrying, is recorded as missing in the
+    status, and the homes of the other shards are returned.
+
+    Args:
+        search_query:
+            The search query to scrape results for.
+        max_hits_per_shard (optional):
+            The maximum number of results of a shard. Defaults to 1,000.
+        deadline (optional):
+            The deadline for the scraping, or None for no deadline. Defaults to None.
+        rate_limiter (optional):
+            The rate limiter to make the requests through, or None to create a new one.
+            Defaults to None.
+        session (optional):
+            The session to make the requests with, reusing its connections, or None to
+            make the requests without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the pages against, or None to
+            always fetch the pages in full. Defaults to None.
+        checkpoint_dir (optional):
+            The directory to store checkpoints in, or None to not use checkpoints.
+            Defaults to None.
+        checkpoint_max_age (optional):
+            Checkpoints older than this are not resumed from. Defaults to 1 hour.
+        max_parallel_shards (optional):
+            The maximum number of shards to scrape in parallel. Defaults to 4.
+        status (optional):
+            The status to record pages that could not be scraped in, or None to not
+            record them. Defaults to None.
+
+    Returns:
+        A list of homes that satisfy the search query, or None if no results were found.
+
+    Raises:
+        RequestException:
+            If every shard failed to be scraped.
+    """
+    if deadline is None:
+        deadline = Deadline(seconds=None)
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+
+    shards = plan_shards(
+        search_query=search_query,
+        max_hits_per_shard=max_hits_per_shard,
+        rate_limiter=rate_limiter,
+        deadline=deadline,
+        session=session,
+        page_cache=page_cache,
+    )
+    if not shards:
+        return None
+    if len(shards) > 1:
+        logger.info(f"Split the search query into {len(shards):,} shards.")
+
+    homes: list[Home] = list()
+    errors: list[requests.RequestException] = list()
+    with ThreadPoolExecutor(max_workers=max_parallel_shards) as executor:
+        futures = [
+            executor.submit(
+                scrape_results,
+                search_query=shard,
+                deadline=deadline,
+                rate_limiter=rate_limiter,
+                session=session,
+                page_cache=page_cache,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_max_age=checkpoint_max_age,
+                status=status,
+            )
+            for shard in shards
+        ]
+        for future in futures:
+            try:
+                homes.extend(future.result() or list())
+            except requests.RequestException as e:
+                errors.append(e)
+
+    # The homes of a failed shard are unknown, so we record its first page as missing,
+    # which keeps the homes of the shard from being taken as gone from the market
+    if errors:
+        if status is not None:
+            status.add_missing_pages(num_pages=len(errors))
+        if len(errors) == len(shards):
+            raise errors[0]
+        logger.warning(
+            f"Could not scrape {len(errors):,} of {len(shards):,} shards, so "
+            f"continuing with the homes of the other shards. The first error was: "
+            f"{errors[0]}"
+        )
+
+    if not homes:
+        return None
+    return list(dict.fromkeys(homes))
+
+
+def plan_shards(
+    search_query: SearchQuery,
+    max_hits_per_shard: int,
+    rate_limiter: RateLimiter,
+    deadline: Deadline,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+) -> list[SearchQuery]:
+    """Split a search query into disjoint shards with a bounded number of results.
+
+    The number of results of every candidate shard is looked up from the API, and a
+    shard with too many results is split further. Shards are split by city, then by
+    property type and finally by price band. A shard without a price bound is only
+    split into price bands if the bands have as many results as the shard together, as
+    price bands leave out the homes without a price. Shards without results are left
+    out, and a shard whose number of results cannot be looked up is not split further.
+
+    Args:
+        search_query:
+            The search query to split.
+        max_hits_per_shard:
+            The maximum number of results of a shard.
+        rate_limiter:
+            The rate limiter to make the requests through.
+        deadline:
+            The deadline for the planning, after which shards are no longer split.
+        session (optional):
+            The session to make the requests with, reusing its connections, or None to
+            make the requests without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the pages against, or None to
+            always fetch the pages in full. Defaults to None.
+
+    Returns:
+        The shards, which together cover the search query.
+    """
+    shards: list[SearchQuery] = list()
+    with ThreadPoolExecutor(max_workers=rate_limiter.max_concurrency) as executor:
+
+        def count_hits(queries: list[SearchQuery]) -> list[int | None]:
+            """Count the results of the queries, with None for failed counts."""
+            futures = [
+                executor.submit(
+                    get_total_hits,
+                    search_query=query,
+                    rate_limiter=rate_limiter,
+                    deadline=deadline,
+                    session=session,
+                    page_cache=page_cache,
+                )
+                for query in queries
+            ]
+            num_hits: list[int | None] = list()
+            for future in futures:
+                try:
+                    num_hits.append(future.result())
+                except requests.RequestException as e:
+                    logger.warning(f"Could not count the results of a shard: {e}")
+                    num_hits.append(None)
+            return num_hits
+
+        # A shard that cannot be counted is scraped as it is, where a failure is
+        # recorded as missing pages
+        candidates = list(zip([search_query], count_hits(queries=[search_query])))
+        while candidates:
+            splits: list[tuple[SearchQuery, int, list[SearchQuery]]] = list()
+            for candidate, candidate_hits in candidates:
+                if candidate_hits == 0:
+                    continue
+                sub_queries: list[SearchQuery] = list()
+                if (
+                    candidate_hits is not None
+                    and candidate_hits > max_hits_per_shard
+                    and not deadline.expired()
+                ):
+                    sub_queries = split_search_query(search_query=candidate)
+                    if not sub_queries:
+                        logger.warning(
+                            f"A shard with {candidate_hits:,} results cannot be split "
+                            "further, so it is scraped as it is."
+                        )
+                if candidate_hits is not None and sub_queries:
+                    splits.append((candidate, candidate_hits, sub_queries))
+                else:
+                    shards.append(candidate)
+
+            # The sub-queries of all the splits are counted together
+            sub_hits = iter(
+                count_hits(
+                    queries=[query for _, _, queries in splits for query in queries]
+                )
+            )
+            candidates = list()
+            for candidate, candidate_hits, sub_queries in splits:
+                split_hits = [next(sub_hits) for _ in sub_queries]
+
+                # Price bands leave out the homes without a price, so a search without
+                # a price bound is only split into price bands if the bands have as
+                # many results as the search
+                is_price_split = (
+                    candidate.min_price is None
+                    and candidate.max_price is None
+                    and sub_queries[0].min_price is not None
+                )
+                known_hits = [hits for hits in split_hits if hits is not None]
+                if is_price_split and (
+                    len(known_hits) < len(split_hits)
+                    or sum(known_hits) < candidate_hits
+                ):
+                    logger.warning(
+                        f"Splitting a shard with {candidate_hits:,} results into price "
+                        "bands could leave out homes without a price, so it is scraped "
+                        "as it is."
+                    )
+                    shards.append(candidate)
+                else:
+                    candidates.extend(zip(sub_queries, split_hits))
+    return shards
+
+
+def split_search_query(search_query: SearchQuery) -> list[SearchQuery]:
+    """Split a search query into disjoint sub-queries.
+
+    The sub-queries are disjoint, and together cover all the results of the search
+    query with a price. A search query without a price bound is split into price bands
+    starting at 0, where the top band has no upper bound, but homes without a price are
+    left out of every price band.
+
+    Args:
+        search_query:
+            The search query to split.
+
+    Returns:
+        The sub-queries, or an empty list if the search query cannot be split further.
+
+    Example:
+        >>> query = SearchQuery(cities=["aarhus", "odense"])
+        >>> [sub_query.cities for sub_query in split_search_query(query)]
+        [['aarhus'], ['odense']]
+        >>> query = SearchQuery(min_price=1_000_000, max_price=2_000_000)
+        >>> [
+        ...     (sub_query.min_price, sub_query.max_price)
+        ...     for sub_query in split_search_query(query)
+        ... ]
+        [(1000000, 1500000), (1500001, 2000000)]
+        >>> split_search_query(SearchQuery(min_price=100, max_price=100))
+        []
+        >>> [
+        ...     (sub_query.min_price, sub_query.max_price)
+        ...     for sub_query in split_search_query(SearchQuery())
+        ... ]
+        [(0, 4000000), (4000001, None)]
+    """
+    if len(search_query.cities) > 1:
+        return [
+            search_query.model_copy(update=dict(cities=[city]))
+            for city in search_query.cities
+        ]
+
+    if search_query.property_type is not None and len(search_query.property_type) > 1:
+        return [
+            search_query.model_copy(update=dict(property_type=[property_type]))
+            for property_type in search_query.property_type
+        ]
+
+    min_price = search_query.min_price or 0
+    max_price = search_query.max_price
+    if max_price is None:
+        split_price = max(2 * min_price, PRICE_SPLIT_START)
+    elif min_price < max_price:
+        split_price = (min_price + max_price) // 2
+    else:
+        return []
+    return [
+        search_query.model_copy(
+            update=dict(min_price=min_price, max_price=split_price)
+        ),
+        search_query.model_copy(
+            update=dict(min_price=split_price + 1, max_price=max_price)
+        ),
+    ]
+
+
+def get_total_hits(
+    search_query: SearchQuery,
+    rate_limiter: RateLimiter,
+    deadline: Deadline,
+    session: requests.Session | None = None,
+    page_cache: PageCache | None = None,
+) -> int:
+    """Get the number of results of a search query.
+
+    Args:
+        search_query:
+            The search query to get the number of results of.
+        rate_limiter:
+            The rate limiter to make the request through.
+        deadline:
+            The deadline for the request.
+        session (optional):
+            The session to make the request with, reusing its connections, or None to
+            make the request without a session. Defaults to None.
+        page_cache (optional):
+            The cache of result pages to revalidate the page against, or None to always
+            fetch the page in full. Defaults to None.
+
+    Returns:
+        The number of results.
+
+    Raises:
+        HTTPError:
+            If there was an error in the HTTP request.
+    """
+    search_page = fetch_search_page(
+        url=search_query.get_url(),
+        rate_limiter=rate_limiter,
+        deadline=deadline,
+        session=session,
+        page_cache=page_cache,
+    )
+    return search_page.total_hits
@@ -0,0 +1,206 @@
+"""Compact snapshots of listings, used to detect price reductions and relistings.
+
+For every subscription, being a search query along with its recipients, only a short
+digest of the price, monthly fee and size of every listing is stored, along with the
+price and when the listing was last seen. Comparing a new scrape against the snapshots
+is a single pass over the snapshots of the subscription.
+"""
+
+import datetime as dt
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from .cache import connect_to_cache
+from .data_models import Home, HomeChange, SearchQuery
+
+
+def get_digest(home: Home) -> str:
+    """Get a digest of the fields of a home that are tracked for changes.
+
+    Args:
+        home:
+            The home to get the digest of.
+
+    Returns:
+        The digest of the home.
+    """
+    fields = f"{home.price}|{home.monthly_fee}|{home.size}"
+    return hashlib.blake2b(fields.encode(), digest_size=8).hexdigest()
+
+
+def get_subscription_id(search_query: SearchQuery, recipients: list[str]) -> str:
+    """Get the identifier of the snapshots of a search query and its recipients.
+
+    Unlike the fingerprint of the API parameters, this covers the whole search query,
+    including the keyword queries and areas, along with the recipients. Every
+    subscription thus has its own snapshots, so that a change is reported to every
+    subscription, and not only to the first one that sees it.
+
+    Args:
+        search_query:
+            The search query.
+        recipients:
+            The recipients of the changes.
+
+    Returns:
+        The identifier of the subscription.
+    """
+    subscription = f"{search_query.model_dump_json()}|{','.join(sorted(recipients))}"
+    return hashlib.sha256(subscription.encode()).hexdigest()[:16]
+
+
+def find_changes(
+    homes: list[Home],
+    search_query: SearchQuery,
+    recipients: list[str],
+    cache_path: Path = Path(".bolig_ping_cache"),
+    relist_after: dt.timedelta = dt.timedelta(days=7),
+) -> list[HomeChange]:
+    """Find the changes of a new scrape since the snapshots, without updating them.
+
+    Homes that have not been seen before are not reported as changes, as they are new
+    homes. A home that was missing from a complete scrape and which is seen again after
+    being gone for at least `relist_after` is reported as being back on the market. The
+    snapshots are only updated with `update_snapshots`, once the changes have been
+    delivered, so that changes that failed to be delivered are found again in the next
+    run.
+
+    Args:
+        homes:
+            The homes in the new scrape.
+        search_query:
+            The search query used in the scrape.
+        recipients:
+            The recipients of the changes, which together with the search query
+            identify the snapshots.
+        cache_path (optional):
+            The path to the cache file storing the snapshots. Defaults to
+            ".bolig_ping_cache".
+        relist_after (optional):
+            How long a missing home must have been gone to count as being back on the
+            market. Defaults to 7 days.
+
+    Returns:
+        The changes to homes that have been seen before.
+    """
+    query_id = get_subscription_id(search_query=search_query, recipients=recipients)
+    now = int(time.time())
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_snapshots_table(connection=connection)
+        snapshots = {
+            home_id: (digest, price, last_seen, bool(missing))
+            for home_id, digest, price, last_seen, missing in connection.execute(
+                "SELECT home_id, digest, price, last_seen, missing FROM snapshots "
+                "WHERE query_id = ?",
+                (query_id,),
+            )
+        }
+
+    changes: list[HomeChange] = list()
+    for home in dict.fromkeys(homes):
+        home_id = home.url.split("/")[-1]
+        if home_id not in snapshots:
+            continue
+        old_digest, old_price, last_seen, missing = snapshots[home_id]
+        if missing and now - last_seen >= relist_after.total_seconds():
+            changes.append(
+                HomeChange(home=home, kind="relisted", previous_price=old_price)
+            )
+        elif (
+            get_digest(home=home) != old_digest
+            and home.price is not None
+            and old_price is not None
+            and home.price < old_price
+        ):
+            changes.append(
+                HomeChange(home=home, kind="price_reduced", previous_price=old_price)
+            )
+    return changes
+
+
+def update_snapshots(
+    homes: list[Home],
+    search_query: SearchQuery,
+    recipients: list[str],
+    cache_path: Path = Path(".bolig_ping_cache"),
+    is_complete: bool = True,
+    max_age: dt.timedelta | None = dt.timedelta(days=365),
+) -> None:
+    """Update the snapshots with a new scrape.
+
+    Homes missing from a complete scrape are marked as missing. Partial scrapes, such
+    as scrapes cut short by the deadline, do not mark any homes as missing, so they do
+    not cause spurious relistings.
+
+    Args:
+        homes:
+            The homes in the new scrape.
+        search_query:
+            The search query used in the scrape.
+        recipients:
+            The recipients of the changes, which together with the search query
+            identify the snapshots.
+        cache_path (optional):
+            The path to the cache file storing the snapshots. Defaults to
+            ".bolig_ping_cache".
+        is_complete (optional):
+            Whether the scrape found all the homes matching the search query. Defaults
+            to True.
+        max_age (optional):
+            Snapshots of homes not seen for this long are removed. Can be None to keep
+            all snapshots. Defaults to 365 days.
+    """
+    query_id = get_subscription_id(search_query=search_query, recipients=recipients)
+    now = int(time.time())
+    rows = [
+        (query_id, home.url.split("/")[-1], get_digest(home=home), home.price, now)
+        for home in dict.fromkeys(homes)
+    ]
+    with connect_to_cache(cache_path=cache_path) as connection:
+        create_snapshots_table(connection=connection)
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany(
+            "INSERT OR REPLACE INTO snapshots "
+            "(query_id, home_id, digest, price, last_seen, missing) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            rows,
+        )
+        if is_complete:
+            seen_home_ids = {home_id for _, home_id, _, _, _ in rows}
+            connection.executemany(
+                "UPDATE snapshots SET missing = 1 WHERE query_id = ? AND home_id = ?",
+                [
+                    (query_id, home_id)
+                    for (home_id,) in connection.execute(
+                        "SELECT home_id FROM snapshots WHERE query_id = ?", (query_id,)
+                    ).fetchall()
+                    if home_id not in seen_home_ids
+                ],
+            )
+        if max_age is not None:
+            connection.execute(
+                "DELETE FROM snapshots WHERE query_id = ? AND last_seen < ?",
+                (query_id, now - max_age.total_seconds()),
+            )
+        connection.execute("COMMIT")
+
+
+def create_snapshots_table(connection: sqlite3.Connection) -> None:
+    """Create the table storing the snapshots, if it does not exist.
+
+    Args:
+        connection:
+            The connection to the cache.
+    """
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        "query_id TEXT NOT NULL, "
+        "home_id TEXT NOT NULL, "
+        "digest TEXT NOT NULL, "
+        "price INTEGER, "
+        "last_seen INTEGER NOT NULL, "
+        "missing INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (query_id, home_id))"
+    )
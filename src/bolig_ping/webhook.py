@@ -0,0 +1,283 @@
+"""Sending home listings to webhooks, such as dashboards, chat bots or ntfy topics."""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from types import TracebackType
+from typing import Literal
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .data_models import Home, HomeChange
+from .rate_limiting import RateLimiter, request_with_retry
+
+logger = logging.getLogger(__package__)
+
+WebhookFormat = Literal["json", "ntfy"]
+
+
+class WebhookNotifier:
+    """A notifier posting homes to webhooks in batches.
+
+    The batches are posted concurrently over a pool of keep-alive connections, where
+    throttled and failed requests are retried with exponential backoff. The notifier can
+    be used as a context manager, which closes its connections on exit.
+
+    The `json` format posts a JSON object with the lists `homes` and `changes`, with the
+    same fields as the `--output` formats. The `ntfy` format posts the homes as a plain
+    text message with a `Title` header, as expected by ntfy topics.
+
+    Args:
+        urls:
+            The URLs of the webhooks.
+        webhook_format (optional):
+            The format of the requests. Defaults to "json".
+        batch_size (optional):
+            The maximum number of homes and changes in every request. Defaults to 50.
+        max_concurrency (optional):
+            The maximum number of concurrent requests, which is also the size of the
+            connection pool. Defaults to 4.
+        max_retries (optional):
+            The maximum number of retries of every request. Defaults to 5.
+        session (optional):
+            The session to post with, or None to create one, which is closed along with
+            the notifier. Defaults to None.
+
+    Attributes:
+        urls:
+            The URLs of the webhooks.
+        webhook_format:
+            The format of the requests.
+        batch_size:
+            The maximum number of homes and changes in every request.
+        max_retries:
+            The maximum number of retries of every request.
+        rate_limiter:
+            The rate limiter shared by all requests of the notifier.
+        session:
+            The session holding the pool of HTTP connections.
+
+    Raises:
+        ValueError:
+            If the batch size is not positive.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        webhook_format: WebhookFormat = "json",
+        batch_size: int = 50,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        session: requests.Session | None = None,
+    ) -> None:
+        """Initialise the notifier.
+
+        Args:
+            urls:
+                The URLs of the webhooks.
+            webhook_format (optional):
+                The format of the requests. Defaults to "json".
+            batch_size (optional):
+                The maximum number of homes and changes in every request. Defaults to
+                50.
+            max_concurrency (optional):
+                The maximum number of concurrent requests. Defaults to 4.
+            max_retries (optional):
+                The maximum number of retries of every request. Defaults to 5.
+            session (optional):
+                The session to post with, or None to create one. Defaults to None.
+
+        Raises:
+            ValueError:
+                If the batch size is not positive.
+        """
+        if batch_size <= 0:
+            raise ValueError(f"The batch size must be positive, but got {batch_size}.")
+        self.urls = urls
+        self.webhook_format = webhook_format
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.rate_limiter = RateLimiter(
+            max_concurrency=max_concurrency, initial_concurrency=max_concurrency
+        )
+        self._owns_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=max(len(urls), 1), pool_maxsize=max_concurrency
+            )
+            session.mount(prefix="http://", adapter=adapter)
+            session.mount(prefix="https://", adapter=adapter)
+        self.session = session
+
+    def send(self, homes: list[Home], changes: list[HomeChange] | None = None) -> int:
+        """Send homes and changes to homes to all the webhooks.
+
+        Args:
+            homes:
+                The new homes.
+            changes (optional):
+                Changes to homes that have been seen before. Defaults to None.
+
+        Returns:
+            The number of requests made, not counting retries.
+
+        Raises:
+            RequestException:
+                If a request still failed after all retries. The remaining batches are
+                still sent.
+        """
+        items: list[Home | HomeChange] = [*homes, *(changes or list())]
+        requests_to_send = [
+            (url, self.build_request(items=items[start : start + self.batch_size]))
+            for start in range(0, len(items), self.batch_size)
+            for url in self.urls
+        ]
+        if not requests_to_send:
+            return 0
+
+        max_workers = min(self.rate_limiter.max_concurrency, len(requests_to_send))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self._post, url=url, headers=headers, data=data)
+                for url, (headers, data) in requests_to_send
+            ]
+            errors = [
+                error
+                for error in (future.exception() for future in futures)
+                if error is not None
+            ]
+        if errors:
+            raise errors[0]
+        logger.info(
+            f"Sent {len(items)} homes and changes to {len(self.urls)} webhooks in "
+            f"{len(requests_to_send)} requests."
+        )
+        return len(requests_to_send)
+
+    def build_request(
+        self, items: list[Home | HomeChange]
+    ) -> tuple[dict[str, str], bytes]:
+        """Build the headers and the body of a request with a batch of homes.
+
+        Args:
+            items:
+                The homes and changes to homes in the batch.
+
+        Returns:
+            A pair (headers, body) of the request.
+
+        Raises:
+            ValueError:
+                If the format is not supported.
+        """
+        homes = [item for item in items if isinstance(item, Home)]
+        changes = [item for item in items if isinstance(item, HomeChange)]
+        match self.webhook_format:
+            case "json":
+                payload = dict(
+                    homes=[home.to_dict() for home in homes],
+                    changes=[
+                        dict(
+                            kind=change.kind,
+                            description=change.describe(),
+                            previous_price=change.previous_price,
+                            home=change.home.to_dict(),
+                        )
+                        for change in changes
+                    ],
+                )
+                headers = {"Content-Type": "application/json"}
+                body = json.dumps(payload, ensure_ascii=False).encode()
+            case "ntfy":
+                headers = {"Title": get_title(homes=homes, changes=changes)}
+                if len(items) == 1:
+                    home = homes[0] if homes else changes[0].home
+                    headers["Click"] = home.url
+                body = "\n\n".join(
+                    [home.to_text() for home in homes]
+                    + [change.to_text() for change in changes]
+                ).encode()
+            case _:
+                raise ValueError(f"Unsupported webhook format {self.webhook_format!r}.")
+        return headers, body
+
+    def close(self) -> None:
+        """Close the connections of the notifier, if it created its own session."""
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self) -> "WebhookNotifier":
+        """Enter the context of the notifier.
+
+        Returns:
+            The notifier.
+        """
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Exit the context of the notifier, closing its connections.
+
+        Args:
+            exc_type:
+                The type of the exception raised in the context, if any.
+            exc_value:
+                The exception raised in the context, if any.
+            traceback:
+                The traceback of the exception raised in the context, if any.
+        """
+        self.close()
+
+    def _post(self, url: str, headers: dict[str, str], data: bytes) -> None:
+        """Post a batch to a webhook.
+
+        Args:
+            url:
+                The URL of the webhook.
+            headers:
+                The headers of the request.
+            data:
+                The body of the request.
+        """
+        request_with_retry(
+            method="POST",
+            url=url,
+            rate_limiter=self.rate_limiter,
+            session=self.session,
+            headers=headers,
+            data=data,
+            max_retries=self.max_retries,
+        )
+
+
+def get_title(homes: list[Home], changes: list[HomeChange]) -> str:
+    """Get the title of a notification about homes.
+
+    Args:
+        homes:
+            The new homes.
+        changes:
+            The changes to homes that have been seen before.
+
+    Returns:
+        The title.
+
+    Example:
+        >>> get_title(homes=[Home(url="", address="")] * 2, changes=[])
+        '[BoligPing] Found 2 new homes!'
+    """
+    parts: list[str] = list()
+    if homes:
+        parts.append("a new home" if len(homes) == 1 else f"{len(homes)} new homes")
+    if changes:
+        parts.append(
+            "a changed home" if len(changes) == 1 else f"{len(changes)} changed homes"
+        )
+    return f"[BoligPing] Found {' and '.join(parts)}!"
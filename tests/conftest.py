@@ -1 +1,33 @@
 """Global fixtures for pytest."""
+
+import threading
+from collections.abc import Callable, Generator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def serve_http() -> Generator[
+    Callable[[type[BaseHTTPRequestHandler]], str], None, None
+]:
+    """Yield a function serving a request handler from a local server.
+
+    The function starts a server on a free port, silencing its request logging, and
+    returns the URL of the server. The servers are shut down at the end of the module.
+    """
+    servers: list[ThreadingHTTPServer] = list()
+
+    def serve(handler: type[BaseHTTPRequestHandler]) -> str:
+        quiet_handler = type(
+            handler.__name__, (handler,), dict(log_message=lambda *_: None)
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), quiet_handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
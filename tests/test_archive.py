@@ -0,0 +1,101 @@
+"""Tests for the `archive` module."""
+
+import datetime as dt
+import sqlite3
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.archive import (
+    archive_homes,
+    load_archived_descriptions,
+    matches_queries,
+    prune_archive,
+    search_archive,
+)
+from bolig_ping.data_models import Home
+
+DESCRIPTIONS = [
+    "Lys lejlighed med stor altan og hjørnebadekar.",
+    "Rækkehus i Aabenraa med have og carport.",
+    "Villa med BADEKAR, brændeovn og udsigt over vandet.",
+]
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> Generator[Path, None, None]:
+    """Yield the path to a cache with an archive of homes."""
+    cache_path = tmp_path / "cache"
+    homes = make_homes()
+    for home, description in zip(homes, DESCRIPTIONS):
+        home.set_description(description=description)
+    archive_homes(homes=homes, cache_path=cache_path)
+    yield cache_path
+
+
+def make_homes() -> list[Home]:
+    """Make homes with the same URLs as the archived homes."""
+    return [
+        Home(url=f"https://some.url/{idx}", address=f"Address {idx}")
+        for idx in range(len(DESCRIPTIONS))
+    ]
+
+
+@pytest.mark.parametrize(
+    argnames=["queries", "expected"],
+    argvalues=[
+        (["badekar"], {"0", "2"}),
+        (["altan", "carport"], {"0", "1"}),
+        (["åbenrå"], {"1"}),
+        (["stor altan"], {"0"}),
+        (["ø"], {"0"}),
+        (["swimmingpool"], set()),
+    ],
+    ids=["substring", "any-query", "aa-spelling", "phrase", "short", "no-match"],
+)
+def test_search_archive(
+    queries: list[str], expected: set[str], cache_path: Path
+) -> None:
+    """Test that the archive finds the homes matching the keyword queries."""
+    assert search_archive(queries=queries, cache_path=cache_path) == expected
+
+
+def test_search_archive_agrees_with_matching(cache_path: Path) -> None:
+    """Test that searching the archive agrees with matching the descriptions."""
+    for query in ["med", "og ", "lejl", "vandet", "kar, b", "x"]:
+        expected = {
+            str(idx)
+            for idx, description in enumerate(DESCRIPTIONS)
+            if matches_queries(description=description, queries=[query])
+        }
+        assert search_archive(queries=[query], cache_path=cache_path) == expected
+
+
+def test_load_archived_descriptions(cache_path: Path) -> None:
+    """Test that archived descriptions are loaded without fetching them."""
+    homes = make_homes() + [Home(url="https://some.url/new", address="New address")]
+    archived_homes = load_archived_descriptions(homes=homes, cache_path=cache_path)
+    assert {home.url for home in archived_homes} == {home.url for home in homes[:3]}
+    assert [home.description for home in homes[:3]] == DESCRIPTIONS
+    assert not homes[3].description_is_fetched()
+
+
+def test_unfetched_homes_are_not_archived(tmp_path: Path) -> None:
+    """Test that homes without fetched descriptions are not archived."""
+    cache_path = tmp_path / "cache"
+    archive_homes(homes=make_homes(), cache_path=cache_path)
+    assert load_archived_descriptions(homes=make_homes(), cache_path=cache_path) == []
+
+
+def test_prune_archive(cache_path: Path) -> None:
+    """Test that expired homes are removed from the archive, with their trigrams."""
+    assert prune_archive(cache_path=cache_path) == 0
+    assert search_archive(queries=["badekar"], cache_path=cache_path) == {"0", "2"}
+    assert prune_archive(cache_path=cache_path, max_age=dt.timedelta(seconds=-1)) == 3
+    assert search_archive(queries=["badekar"], cache_path=cache_path) == set()
+    with sqlite3.connect(cache_path) as connection:
+        (num_trigrams,) = connection.execute(
+            "SELECT count(*) FROM archive_trigrams"
+        ).fetchone()
+    assert num_trigrams == 0
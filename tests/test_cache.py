@@ -1,72 +1,215 @@
 """Tests for the `cache` module."""
 
+import datetime as dt
+import json
+import sqlite3
+import time
 from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
 
 import pytest
 
-from bolig_ping.cache import store_to_cache
+from bolig_ping.cache import claim_homes_per_recipient, compact_cache, release_homes
 from bolig_ping.data_models import Home
 
 
-class TestStoreToCache:
-    """Tests for the store_to_cache function."""
-
-    @pytest.fixture(scope="class")
-    def home(self) -> Generator[Home, None, None]:
-        """Return a Home object."""
-        yield Home(
-            url="https://some.url",
-            address="Some address",
-            price=1000,
-            num_rooms=3,
-            size=100,
-            monthly_fee=100,
-            year=2000,
+def read_cache(cache_path: Path) -> list[tuple[str, str]]:
+    """Read the (id, email) pairs stored in a cache file."""
+    with closing(sqlite3.connect(cache_path)) as connection:
+        return connection.execute(
+            "SELECT home_id, email FROM sent_homes ORDER BY rowid"
+        ).fetchall()
+
+
+class TestClaimHomesPerRecipient:
+    """Tests for the claim_homes_per_recipient function."""
+
+    @pytest.fixture
+    def homes(self) -> Generator[list[Home], None, None]:
+        """Return a list of homes."""
+        yield [
+            Home(url=f"https://some.url/{idx}", address=f"Address {idx}")
+            for idx in range(50)
+        ]
+
+    def test_homes_are_stored(self, homes: list[Home]) -> None:
+        """Test that the homes are stored, without duplicates."""
+        cache_path = Path(".test_cache")
+        claim_homes_per_recipient(
+            homes=[homes[0], homes[1], homes[0]],
+            emails=["no-email"],
+            cache_path=cache_path,
+        )
+        claim_homes_per_recipient(
+            homes=homes[:1], emails=["no-email"], cache_path=cache_path
         )
+        assert read_cache(cache_path=cache_path) == [
+            ("0", "no-email"),
+            ("1", "no-email"),
+        ]
+        cache_path.unlink()
 
-    @pytest.fixture(scope="class")
-    def another_home(self) -> Generator[Home, None, None]:
-        """Return another Home object."""
-        yield Home(
-            url="https://another.url",
-            address="Another address",
-            price=2000,
-            num_rooms=4,
-            size=200,
-            monthly_fee=200,
-            year=2001,
+    def test_entries_are_timestamped(self, homes: list[Home]) -> None:
+        """Test that stored entries are timestamped."""
+        cache_path = Path(".test_cache")
+        before = int(time.time())
+        claim_homes_per_recipient(
+            homes=homes[:1], emails=["no-email"], cache_path=cache_path
         )
+        with closing(sqlite3.connect(cache_path)) as connection:
+            (timestamp, last_seen) = connection.execute(
+                "SELECT timestamp, last_seen FROM sent_homes"
+            ).fetchone()
+        assert before <= timestamp == last_seen <= time.time()
+        cache_path.unlink()
 
-    def test_home_is_stored(self, home: Home) -> None:
-        """Test that a home is stored."""
+    def test_homes_are_only_claimed_once(self, homes: list[Home]) -> None:
+        """Test that homes are only claimed once per recipient."""
         cache_path = Path(".test_cache")
-        store_to_cache(homes=[home], emails=["no-email"], cache_path=cache_path)
-        with cache_path.open() as file:
-            assert file.read() == '{"id": "some.url", "email": "no-email"}\n'
+        assert claim_homes_per_recipient(
+            homes=homes, emails=["a", "b"], cache_path=cache_path
+        ) == {"a": homes, "b": homes}
+        assert claim_homes_per_recipient(
+            homes=homes, emails=["a", "b"], cache_path=cache_path
+        ) == {"a": [], "b": []}
+        assert claim_homes_per_recipient(
+            homes=homes, emails=["c"], cache_path=cache_path
+        ) == {"c": homes}
         cache_path.unlink()
 
-    def test_multiple_homes_are_stored(self, home: Home, another_home: Home) -> None:
-        """Test that multiple homes are stored."""
+    def test_claims_per_recipient(self, homes: list[Home]) -> None:
+        """Test that every recipient gets the homes that are new to them."""
         cache_path = Path(".test_cache")
-        store_to_cache(
-            homes=[home, another_home], emails=["no-email"], cache_path=cache_path
+        claim_homes_per_recipient(homes=homes[:10], emails=["a"], cache_path=cache_path)
+        claimed_homes = claim_homes_per_recipient(
+            homes=homes[:20], emails=["a", "b"], cache_path=cache_path
         )
-        with cache_path.open() as file:
-            assert (
-                file.read()
-                == '{"id": "some.url", "email": "no-email"}\n'
-                + '{"id": "another.url", "email": "no-email"}\n'
+        assert claimed_homes == {"a": homes[10:20], "b": homes[:20]}
+        cache_path.unlink()
+
+    def test_concurrent_claims(self, homes: list[Home]) -> None:
+        """Test that concurrent claims never claim the same home twice."""
+        cache_path = Path(".test_cache")
+        claim_homes_per_recipient(homes=[], emails=["no-email"], cache_path=cache_path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            claimed_homes = executor.map(
+                lambda _: claim_homes_per_recipient(
+                    homes=homes, emails=["no-email"], cache_path=cache_path
+                ),
+                range(8),
             )
+            num_claimed = sum(len(claimed["no-email"]) for claimed in claimed_homes)
+        assert num_claimed == len(homes)
         cache_path.unlink()
 
-    def test_no_duplicates_are_stored(self, home: Home) -> None:
-        """Test that no duplicates are stored."""
+    def test_released_homes_can_be_claimed(self, homes: list[Home]) -> None:
+        """Test that released homes can be claimed again."""
         cache_path = Path(".test_cache")
-        store_to_cache(homes=[home, home], emails=["no-email"], cache_path=cache_path)
-        with cache_path.open() as file:
-            assert file.read() == '{"id": "some.url", "email": "no-email"}\n'
-        store_to_cache(homes=[home], emails=["no-email"], cache_path=cache_path)
-        with cache_path.open() as file:
-            assert file.read() == '{"id": "some.url", "email": "no-email"}\n'
+        claim_homes_per_recipient(homes=homes, emails=["a"], cache_path=cache_path)
+        release_homes(homes=homes[:3], emails=["a"], cache_path=cache_path)
+        assert claim_homes_per_recipient(
+            homes=homes, emails=["a"], cache_path=cache_path
+        ) == {"a": homes[:3]}
         cache_path.unlink()
+
+
+class TestCompactCache:
+    """Tests for the compact_cache function."""
+
+    @pytest.fixture
+    def cache_path(self) -> Generator[Path, None, None]:
+        """Return the path to a legacy cache with duplicate and old entries."""
+        cache_path = Path(".test_cache")
+        now = int(time.time())
+        entries = [
+            dict(id="old", email="no-email", timestamp=now - 10 * 86_400),
+            dict(id="new", email="no-email", timestamp=now - 100),
+            dict(id="new", email="no-email", timestamp=now),
+            dict(id="legacy", email="no-email"),
+        ]
+        with cache_path.open("w") as file:
+            for entry in entries:
+                file.write(json.dumps(entry) + "\n")
+        yield cache_path
+        cache_path.unlink(missing_ok=True)
+
+    def test_legacy_cache_is_migrated(self, cache_path: Path) -> None:
+        """Test that a legacy cache is migrated, removing duplicate entries."""
+        assert compact_cache(cache_path=cache_path) == 0
+        assert set(read_cache(cache_path=cache_path)) == {
+            ("old", "no-email"),
+            ("new", "no-email"),
+            ("legacy", "no-email"),
+        }
+
+    def test_expired_entries_are_removed(self, cache_path: Path) -> None:
+        """Test that expired entries are removed, keeping legacy entries."""
+        assert compact_cache(cache_path=cache_path, max_age=dt.timedelta(days=1)) == 1
+        assert set(read_cache(cache_path=cache_path)) == {
+            ("new", "no-email"),
+            ("legacy", "no-email"),
+        }
+
+    def test_max_entries(self, cache_path: Path) -> None:
+        """Test that only the newest entries are kept."""
+        compact_cache(cache_path=cache_path, max_entries=1)
+        assert len(read_cache(cache_path=cache_path)) == 1
+        assert read_cache(cache_path=cache_path) != [("old", "no-email")]
+
+    def test_homes_on_the_market_are_kept(self) -> None:
+        """Test that entries are expired and evicted by when they were last seen."""
+        cache_path = Path(".test_cache")
+        homes = [
+            Home(url=f"https://some.url/{idx}", address=f"Address {idx}")
+            for idx in range(3)
+        ]
+        claim_homes_per_recipient(homes=homes, emails=["a"], cache_path=cache_path)
+        with closing(sqlite3.connect(cache_path)) as connection, connection:
+            connection.execute(
+                "UPDATE sent_homes SET timestamp = ?, last_seen = ?",
+                (0, int(time.time()) - 10 * 86_400),
+            )
+
+        # The first home is still on the market, and the others are not
+        claim_homes_per_recipient(homes=homes[:1], emails=["a"], cache_path=cache_path)
+        compact_cache(cache_path=cache_path, max_entries=2)
+        assert ("0", "a") in read_cache(cache_path=cache_path)
+        compact_cache(cache_path=cache_path, max_age=dt.timedelta(days=1))
+        assert read_cache(cache_path=cache_path) == [("0", "a")]
+        cache_path.unlink()
+
+    def test_legacy_entries_were_last_seen_when_sent(self, cache_path: Path) -> None:
+        """Test that migrated entries are taken to be last seen when they were sent."""
+        compact_cache(cache_path=cache_path)
+        with closing(sqlite3.connect(cache_path)) as connection:
+            assert connection.execute(
+                "SELECT COUNT(*) FROM sent_homes WHERE last_seen != timestamp"
+            ).fetchone() == (0,)
+
+    def test_cache_is_only_rebuilt_when_mostly_free(self) -> None:
+        """Test that the file is only rebuilt when many of its pages are free."""
+        cache_path = Path(".test_cache")
+        homes = [
+            Home(url=f"https://some.url/{idx}", address=f"Address {idx}")
+            for idx in range(2_000)
+        ]
+        claim_homes_per_recipient(homes=homes, emails=["a"], cache_path=cache_path)
+        with closing(sqlite3.connect(cache_path)) as connection, connection:
+            connection.execute("DELETE FROM sent_homes WHERE rowid <= 200")
+
+        def get_num_free_pages() -> int:
+            with closing(sqlite3.connect(cache_path)) as connection:
+                return connection.execute("PRAGMA freelist_count").fetchone()[0]
+
+        compact_cache(cache_path=cache_path, max_entries=1_700)
+        assert get_num_free_pages() > 0
+        compact_cache(cache_path=cache_path, max_entries=10)
+        assert get_num_free_pages() == 0
+        cache_path.unlink()
+
+    def test_missing_cache(self) -> None:
+        """Test that compacting a missing cache does nothing."""
+        assert compact_cache(cache_path=Path(".missing_test_cache")) == 0
+        assert not Path(".missing_test_cache").exists()
@@ -0,0 +1,97 @@
+"""Tests for the `checkpoint` module."""
+
+import datetime as dt
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.checkpoint import (
+    ScrapeCheckpoint,
+    delete_checkpoint,
+    get_fingerprint,
+    load_checkpoint,
+    save_checkpoint,
+)
+from bolig_ping.data_models import Home, SearchQuery
+
+
+@pytest.fixture
+def checkpoint_dir(tmp_path: Path) -> Generator[Path, None, None]:
+    """Yield a directory to store checkpoints in."""
+    yield tmp_path / "checkpoints"
+
+
+@pytest.fixture(scope="module")
+def search_query() -> Generator[SearchQuery, None, None]:
+    """Yield a search query."""
+    yield SearchQuery(cities=["københavn n"], max_price=3_000_000)
+
+
+@pytest.fixture(scope="module")
+def checkpoint(search_query: SearchQuery) -> Generator[ScrapeCheckpoint, None, None]:
+    """Yield a checkpoint of the search query."""
+    yield ScrapeCheckpoint(
+        fingerprint=get_fingerprint(search_query=search_query),
+        total_hits=100,
+        num_pages=4,
+        pages={
+            1: [Home(url="https://some.url/1", address="Some address", price=1000)],
+            3: [Home(url="https://some.url/3", address="Another address")],
+        },
+    )
+
+
+def test_fingerprint_ignores_keyword_queries(search_query: SearchQuery) -> None:
+    """Test that the fingerprint only depends on the parameters sent to the API."""
+    keyword_query = search_query.model_copy(update=dict(queries=["altan"]))
+    other_query = search_query.model_copy(update=dict(max_price=4_000_000))
+    fingerprint = get_fingerprint(search_query=search_query)
+    assert get_fingerprint(search_query=keyword_query) == fingerprint
+    assert get_fingerprint(search_query=other_query) != fingerprint
+
+
+def test_save_and_load(
+    search_query: SearchQuery, checkpoint: ScrapeCheckpoint, checkpoint_dir: Path
+) -> None:
+    """Test that a saved checkpoint can be loaded."""
+    save_checkpoint(checkpoint=checkpoint, checkpoint_dir=checkpoint_dir)
+    loaded = load_checkpoint(search_query=search_query, checkpoint_dir=checkpoint_dir)
+    assert loaded == checkpoint
+
+
+def test_stale_checkpoint_is_ignored(
+    search_query: SearchQuery, checkpoint: ScrapeCheckpoint, checkpoint_dir: Path
+) -> None:
+    """Test that a stale checkpoint is not loaded."""
+    save_checkpoint(checkpoint=checkpoint, checkpoint_dir=checkpoint_dir)
+    loaded = load_checkpoint(
+        search_query=search_query,
+        checkpoint_dir=checkpoint_dir,
+        max_age=dt.timedelta(seconds=-1),
+    )
+    assert loaded is None
+
+
+def test_invalid_checkpoint_is_ignored(
+    search_query: SearchQuery, checkpoint_dir: Path
+) -> None:
+    """Test that an invalid checkpoint is not loaded."""
+    checkpoint_dir.mkdir()
+    fingerprint = get_fingerprint(search_query=search_query)
+    (checkpoint_dir / f"{fingerprint}.json").write_text("{not json")
+    assert load_checkpoint(
+        search_query=search_query, checkpoint_dir=checkpoint_dir
+    ) is (None)
+
+
+def test_delete_checkpoint(
+    search_query: SearchQuery, checkpoint: ScrapeCheckpoint, checkpoint_dir: Path
+) -> None:
+    """Test that a checkpoint can be deleted."""
+    save_checkpoint(checkpoint=checkpoint, checkpoint_dir=checkpoint_dir)
+    delete_checkpoint(search_query=search_query, checkpoint_dir=checkpoint_dir)
+    assert load_checkpoint(
+        search_query=search_query, checkpoint_dir=checkpoint_dir
+    ) is (None)
+    delete_checkpoint(search_query=search_query, checkpoint_dir=checkpoint_dir)
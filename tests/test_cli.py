@@ -1,11 +1,19 @@
 """Tests for the `cli` module."""
 
 from collections.abc import Generator
+from pathlib import Path
+from typing import Any
 
 import pytest
 from click.testing import CliRunner
 
-from bolig_ping.cli import main
+from bolig_ping import cache, cli
+from bolig_ping.cli import main, notify
+from bolig_ping.client import BoligPing
+from bolig_ping.data_models import Home, SearchQuery
+from bolig_ping.deadline import Deadline
+from bolig_ping.jobs import list_saved_searches
+from bolig_ping.webhook import WebhookNotifier
 
 
 @pytest.fixture(scope="module")
@@ -14,6 +22,29 @@ def runner() -> Generator[CliRunner, None, None]:
     yield CliRunner()
 
 
+def run_notify(
+    client: BoligPing,
+    homes: list[Home],
+    monkeypatch: pytest.MonkeyPatch,
+    **kwargs: object,
+) -> list[Home]:
+    """Run `notify` on the given scraped homes, with the options of a plain search."""
+    monkeypatch.setattr(client, "scrape", lambda **_: homes)
+    options: dict[str, Any] = dict(
+        search_query=SearchQuery(),
+        emails=list(),
+        writer=None,
+        deadline=Deadline(seconds=None),
+        cache=True,
+        notify_changes=False,
+        cache_max_age=0,
+        cache_max_entries=0,
+        digest_hours=0,
+    )
+    options.update(kwargs)
+    return notify(client=client, **options)
+
+
 @pytest.mark.parametrize(
     argnames=["cli_args"],
     argvalues=[
@@ -35,3 +66,273 @@ def test_main(cli_args: str, runner: CliRunner) -> None:
     """Test the main function."""
     result = runner.invoke(cli=main, args=cli_args)
     assert result.exit_code == 0
+
+
+def test_saved_searches(
+    runner: CliRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that searches can be saved with their options, listed and removed."""
+    monkeypatch.chdir(tmp_path)
+    result = runner.invoke(
+        cli=main,
+        args="--city aarhus --save-search aarhus --no-cache --deadline 30 "
+        "--max-results 5 --max-description-fetches 20 --webhook https://some.url "
+        "--webhook-batch-size 10",
+    )
+    assert result.exit_code == 0
+    (saved_search,) = list_saved_searches()
+    assert not saved_search.cache
+    assert saved_search.deadline == 30
+    assert saved_search.max_results == 5
+    assert saved_search.max_description_fetches == 20
+    assert saved_search.webhook_batch_size == 10
+
+    result = runner.invoke(cli=main, args="--list-searches")
+    assert result.exit_code == 0
+    assert result.output.startswith("aarhus: every 10 minutes")
+
+    result = runner.invoke(cli=main, args="--remove-search aarhus")
+    assert result.exit_code == 0
+    assert list_saved_searches() == []
+    result = runner.invoke(cli=main, args="--remove-search aarhus")
+    assert result.exit_code != 0
+
+
+def test_saved_searches_reject_output(
+    runner: CliRunner, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that options a saved search cannot honour are rejected."""
+    monkeypatch.chdir(tmp_path)
+    result = runner.invoke(
+        cli=main, args="--city aarhus --save-search aarhus --output jsonl"
+    )
+    assert result.exit_code != 0
+    assert "--save-search" in result.output
+    assert list_saved_searches() == []
+
+
+def test_notify_per_recipient(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that every recipient is emailed the homes that are new to them."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GMAIL_EMAIL", "bolig@ping.dk")
+    monkeypatch.setenv("GMAIL_PASSWORD", "password")
+    sent_emails: list[tuple[list[str], str]] = list()
+    monkeypatch.setattr(
+        cli,
+        "send_emails",
+        lambda to_emails, subject, **_: sent_emails.append((to_emails, subject)),
+    )
+    homes = [
+        Home(url=f"https://some.url/{idx}", address=f"Vej {idx}") for idx in range(3)
+    ]
+
+    with BoligPing(archive_path=None, page_cache_path=None) as client:
+        run_notify(
+            client=client, homes=homes[:2], monkeypatch=monkeypatch, emails=["a"]
+        )
+        run_notify(
+            client=client, homes=homes, monkeypatch=monkeypatch, emails=["a", "b"]
+        )
+
+    assert sent_emails == [
+        (["a"], "[BoligPing] Found 2 new homes!"),
+        (["a"], "[BoligPing] Found a new home!"),
+        (["b"], "[BoligPing] Found 3 new homes!"),
+    ]
+
+
+def test_failed_digest_keeps_later_digests(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a failed digest email leaves the digests of all recipients intact."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GMAIL_EMAIL", "bolig@ping.dk")
+    monkeypatch.setenv("GMAIL_PASSWORD", "password")
+    sent_emails: list[list[str]] = list()
+
+    def send_emails(to_emails: list[str], **_) -> None:
+        if to_emails == ["a"] and not sent_emails:
+            sent_emails.append([])
+            raise ConnectionError("The mail server is down.")
+        sent_emails.append(to_emails)
+
+    monkeypatch.setattr(cli, "send_emails", send_emails)
+    homes = [
+        Home(url=f"https://some.url/{idx}", address=f"Vej {idx}") for idx in range(2)
+    ]
+
+    with BoligPing(archive_path=None, page_cache_path=None) as client:
+        for _ in range(2):
+            try:
+                run_notify(
+                    client=client,
+                    homes=homes,
+                    monkeypatch=monkeypatch,
+                    emails=["a", "b"],
+                    digest_hours=1,
+                )
+            except ConnectionError:
+                pass
+
+    assert sent_emails == [[], ["a"], ["b"]]
+
+
+def test_notify_uses_client_cache_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the sent homes are stored in the cache file of the client."""
+    monkeypatch.chdir(tmp_path)
+    homes = [Home(url="https://some.url/1", address="Vej 1")]
+    cache_path = tmp_path / "custom_cache"
+    with BoligPing(
+        cache_path=cache_path, archive_path=None, page_cache_path=None
+    ) as client:
+        run_notify(
+            client=client, homes=homes, monkeypatch=monkeypatch, notify_changes=True
+        )
+    assert cache_path.exists()
+    assert not (tmp_path / ".bolig_ping_cache").exists()
+
+
+def test_failing_webhooks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a failing webhook neither aborts the emails nor loses the homes."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GMAIL_EMAIL", "bolig@ping.dk")
+    monkeypatch.setenv("GMAIL_PASSWORD", "password")
+    sent_emails: list[list[str]] = list()
+    monkeypatch.setattr(
+        cli, "send_emails", lambda to_emails, **_: sent_emails.append(to_emails)
+    )
+    homes = [Home(url="https://some.url/1", address="Vej 1")]
+
+    with (
+        BoligPing(archive_path=None, page_cache_path=None) as client,
+        WebhookNotifier(urls=["http://127.0.0.1:1/hook"], max_retries=0) as webhooks,
+    ):
+
+        def search(emails: list[str]) -> list[Home]:
+            return run_notify(
+                client=client,
+                homes=homes,
+                monkeypatch=monkeypatch,
+                emails=emails,
+                webhooks=webhooks,
+            )
+
+        search(emails=["a"])
+        assert sent_emails == [["a"]]
+
+        # Without email recipients the homes are released, so they are sent next time
+        search(emails=[])
+        posted_homes: list[list[Home]] = list()
+        monkeypatch.setattr(
+            webhooks, "send", lambda homes, changes: posted_homes.append(homes)
+        )
+        search(emails=[])
+        assert posted_homes == [homes]
+
+
+def test_failed_email_releases_unsent_homes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the recipients who were not emailed get the homes in the next run."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GMAIL_EMAIL", "bolig@ping.dk")
+    monkeypatch.setenv("GMAIL_PASSWORD", "password")
+    sent_emails: list[tuple[list[str], str]] = list()
+    is_down = [True]
+
+    def send_emails(to_emails: list[str], subject: str, **_) -> None:
+        if is_down[0]:
+            raise ConnectionError("The mail server is down.")
+        sent_emails.append((to_emails, subject))
+
+    monkeypatch.setattr(cli, "send_emails", send_emails)
+    homes = [
+        Home(url=f"https://some.url/{idx}", address=f"Vej {idx}") for idx in range(2)
+    ]
+
+    with BoligPing(archive_path=None, page_cache_path=None) as client:
+        is_down[0] = False
+        run_notify(
+            client=client, homes=homes[:1], monkeypatch=monkeypatch, emails=["a"]
+        )
+        is_down[0] = True
+        with pytest.raises(ConnectionError):
+            run_notify(
+                client=client, homes=homes, monkeypatch=monkeypatch, emails=["a", "b"]
+            )
+        is_down[0] = False
+        run_notify(
+            client=client, homes=homes, monkeypatch=monkeypatch, emails=["a", "b"]
+        )
+
+    assert sent_emails == [
+        (["a"], "[BoligPing] Found a new home!"),
+        (["a"], "[BoligPing] Found a new home!"),
+        (["b"], "[BoligPing] Found 2 new homes!"),
+    ]
+
+
+def test_failed_email_keeps_changes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a change that failed to be emailed is reported in the next run."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GMAIL_EMAIL", "bolig@ping.dk")
+    monkeypatch.setenv("GMAIL_PASSWORD", "password")
+    sent_subjects: list[str] = list()
+    is_down = [False]
+
+    def send_emails(subject: str, **_) -> None:
+        if is_down[0]:
+            raise ConnectionError("The mail server is down.")
+        sent_subjects.append(subject)
+
+    monkeypatch.setattr(cli, "send_emails", send_emails)
+    with BoligPing(archive_path=None, page_cache_path=None) as client:
+        for price, is_down[0] in [(2_000, False), (1_000, True), (1_000, False)]:
+            home = Home(url="https://some.url/1", address="Vej 1", price=price)
+            try:
+                run_notify(
+                    client=client,
+                    homes=[home],
+                    monkeypatch=monkeypatch,
+                    emails=["a"],
+                    notify_changes=True,
+                )
+            except ConnectionError:
+                pass
+
+    assert sent_subjects == [
+        "[BoligPing] Found a new home!",
+        "[BoligPing] A home you have seen has changed!",
+    ]
+
+
+def test_filtered_homes_are_not_claimed(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that homes failing the monthly fee are never claimed and released."""
+    monkeypatch.chdir(tmp_path)
+    claimed_homes: list[Home] = list()
+
+    def claim_homes_per_recipient(homes: list[Home], **kwargs) -> dict:
+        claimed_homes.extend(homes)
+        return cache.claim_homes_per_recipient(homes=homes, **kwargs)
+
+    monkeypatch.setattr(cli, "claim_homes_per_recipient", claim_homes_per_recipient)
+    homes = [
+        Home(url=f"https://some.url/{idx}", address=f"Vej {idx}", monthly_fee=fee)
+        for idx, fee in enumerate([1_000, 5_000])
+    ]
+    with BoligPing(archive_path=None, page_cache_path=None) as client:
+        found_homes = run_notify(
+            client=client,
+            homes=homes,
+            monkeypatch=monkeypatch,
+            search_query=SearchQuery(max_monthly_fee=2_000),
+            max_results=5,
+        )
+    assert found_homes == homes
+    assert claimed_homes == homes[:1]
@@ -0,0 +1,101 @@
+"""Tests for the `client` module."""
+
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+from bolig_ping import BoligPing, Home, SearchQuery
+from bolig_ping.deadline import Deadline
+
+DESCRIPTION = "Lys lejlighed med altan og udsigt over søerne. " * 10
+
+
+class DescriptionHandler(BaseHTTPRequestHandler):
+    """Request handler serving a listing page with a long description."""
+
+    def do_GET(self) -> None:
+        """Respond with a listing page."""
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(f"<html><p>{DESCRIPTION}</p></html>".encode())
+
+
+@pytest.fixture(scope="module")
+def server_url(serve_http: Callable[[type[BaseHTTPRequestHandler]], str]) -> str:
+    """Get the URL of a local server serving listing pages."""
+    return serve_http(DescriptionHandler)
+
+
+@pytest.fixture
+def homes(server_url: str) -> list[Home]:
+    """Homes whose listing pages are served by the local server."""
+    return [
+        Home(url=f"{server_url}/{idx}", address=f"Vej {idx}", monthly_fee=1_000 * idx)
+        for idx in range(5)
+    ]
+
+
+class TestBoligPing:
+    """Tests for the `BoligPing` class."""
+
+    def test_filter_without_queries(self, homes: list[Home]) -> None:
+        """Test that homes are filtered on their monthly fee."""
+        with BoligPing(archive_path=None, page_cache_path=None) as client:
+            filtered = list(
+                client.iter_filter(
+                    homes=homes, search_query=SearchQuery(max_monthly_fee=2_000)
+                )
+            )
+        assert filtered == homes[:3]
+
+    def test_filter_with_queries(self, homes: list[Home], tmp_path: Path) -> None:
+        """Test that descriptions are fetched through the session and archived."""
+        cache_path = tmp_path / "cache"
+        with BoligPing(archive_path=cache_path, page_cache_path=None) as client:
+            filtered = list(
+                client.iter_filter(
+                    homes=homes, search_query=SearchQuery(queries=["altan"])
+                )
+            )
+            assert filtered == homes
+            assert all(home.description_is_fetched() for home in homes)
+
+            # The second search is answered from the archive
+            fresh_homes = [home.model_copy() for home in homes]
+            filtered = list(
+                client.iter_filter(
+                    homes=fresh_homes, search_query=SearchQuery(queries=["badekar"])
+                )
+            )
+            assert filtered == []
+
+    def test_search_streams_homes(
+        self, homes: list[Home], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that searching yields the scraped homes satisfying the query."""
+        with BoligPing(archive_path=None, page_cache_path=None) as client:
+            monkeypatch.setattr(client, "scrape", lambda search_query, deadline: homes)
+            search_query = SearchQuery(min_monthly_fee=3_000)
+            iterator = client.iter_search(search_query=search_query)
+            assert next(iterator) == homes[3]
+            assert client.search(search_query=search_query) == homes[3:]
+
+    def test_expired_deadline_skips_descriptions(self, homes: list[Home]) -> None:
+        """Test that no descriptions are fetched after the deadline."""
+        with BoligPing(archive_path=None, page_cache_path=None) as client:
+            filtered = client.iter_filter(
+                homes=homes,
+                search_query=SearchQuery(queries=["altan"]),
+                deadline=Deadline(seconds=0),
+            )
+            assert list(filtered) == []
+        assert not any(home.description_is_fetched() for home in homes)
+
+    def test_connection_pool_size(self) -> None:
+        """Test that the connection pool fits the maximum concurrency."""
+        with BoligPing(page_cache_path=None, max_concurrency=3) as client:
+            adapter = client.session.get_adapter(url="https://api.boligsiden.dk")
+            assert adapter._pool_maxsize == 3
+            assert client.rate_limiter.max_concurrency == 3
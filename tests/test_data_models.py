@@ -1,10 +1,55 @@
 """Tests for the `data_models` module."""
 
-from collections.abc import Generator
+import json
+from collections.abc import Callable, Generator
+from http.server import BaseHTTPRequestHandler
 
 import pytest
 
+from bolig_ping import data_models
 from bolig_ping.data_models import Home, SearchQuery
+from bolig_ping.deadline import Deadline
+
+LONG_LINE = "Lys lejlighed med altan og udsigt over søerne. " * 10
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    """Request handler serving case data and listing pages."""
+
+    requested_paths: list[str] = list()
+
+    def do_GET(self) -> None:
+        """Respond with case data for known cases, and with a listing page.
+
+        The first requests for the case data of `flaky` and for the listing page of
+        `flaky-page` are throttled.
+        """
+        self.requested_paths.append(self.path)
+        is_flaky = self.path in {"/cases/flaky", "/viderestilling/flaky-page"}
+        if is_flaky and self.requested_paths.count(self.path) == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if self.path in {"/cases/with-data", "/cases/flaky"}:
+            body = json.dumps(
+                dict(descriptionTitle="Lys lejlighed", descriptionBody="Med altan.")
+            )
+        elif self.path.startswith("/cases/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        else:
+            body = f"<html><p>{LONG_LINE}</p></html>"
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+
+@pytest.fixture(scope="module")
+def server_url(serve_http: Callable[[type[BaseHTTPRequestHandler]], str]) -> str:
+    """Get the URL of a local server serving case data and listing pages."""
+    return serve_http(ListingHandler)
 
 
 @pytest.mark.parametrize(
@@ -79,6 +124,18 @@ class TestHome:
         """Test the `__hash__` method."""
         assert hash(home) == hash(home.url)
 
+    def test_description_is_stored(self, home: Home) -> None:
+        """Test that a known description survives serialisation, but is not output."""
+        home = home.model_copy()
+        home.set_description(description="Lejlighed med altan.")
+        restored = Home.model_validate_json(home.model_dump_json())
+        assert restored.description_is_fetched()
+        assert restored.description == "Lejlighed med altan."
+        assert "known_description" not in home.to_dict()
+        assert not Home.model_validate_json(
+            Home(url="", address="").model_dump_json()
+        ).description_is_fetched()
+
     def test_to_html(self, home: Home) -> None:
         """Test the `to_html` method."""
         assert home.to_html() == (
@@ -101,3 +158,53 @@ class TestHome:
             "Monthly fee: 100 kr./md\n"
             "Year built: 2000"
         )
+
+
+class TestFetchDescription:
+    """Tests for the `Home.fetch_description` method."""
+
+    @pytest.fixture(autouse=True)
+    def local_api(self, server_url: str, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Point the listing and case URLs to the local server."""
+        monkeypatch.setattr(
+            data_models, "LISTING_URL_PREFIX", f"{server_url}/viderestilling/"
+        )
+        monkeypatch.setattr(data_models, "CASE_URL", f"{server_url}/cases/{{case_id}}")
+        ListingHandler.requested_paths.clear()
+
+    def test_structured_data(self, server_url: str) -> None:
+        """Test that the description is taken from the case data."""
+        home = Home(url=f"{server_url}/viderestilling/with-data", address="Vej 1")
+        assert home.fetch_description() == "Lys lejlighed\nMed altan."
+        assert ListingHandler.requested_paths == ["/cases/with-data"]
+
+    def test_html_fallback(self, server_url: str) -> None:
+        """Test that the description is taken from the page without case data."""
+        home = Home(url=f"{server_url}/viderestilling/without-data", address="Vej 1")
+        assert home.fetch_description() == LONG_LINE.strip()
+        assert ListingHandler.requested_paths == [
+            "/cases/without-data",
+            "/viderestilling/without-data",
+        ]
+
+    def test_transient_errors_are_retried(self, server_url: str) -> None:
+        """Test that a throttled request for the case data is retried."""
+        home = Home(url=f"{server_url}/viderestilling/flaky", address="Vej 1")
+        assert home.fetch_description() == "Lys lejlighed\nMed altan."
+        assert ListingHandler.requested_paths == ["/cases/flaky", "/cases/flaky"]
+
+    def test_html_fallback_is_retried(self, server_url: str) -> None:
+        """Test that a throttled request for the listing page is retried."""
+        home = Home(url=f"{server_url}/viderestilling/flaky-page", address="Vej 1")
+        assert home.fetch_description() == LONG_LINE.strip()
+        assert ListingHandler.requested_paths == [
+            "/cases/flaky-page",
+            "/viderestilling/flaky-page",
+            "/viderestilling/flaky-page",
+        ]
+
+    def test_expired_deadline(self, server_url: str) -> None:
+        """Test that nothing is fetched once the deadline has been reached."""
+        home = Home(url=f"{server_url}/viderestilling/with-data", address="Vej 1")
+        assert home.fetch_description(deadline=Deadline(seconds=0)) is None
+        assert ListingHandler.requested_paths == []
@@ -0,0 +1,30 @@
+"""Tests for the `deadline` module."""
+
+import pytest
+
+from bolig_ping.deadline import Deadline
+
+
+def test_no_deadline() -> None:
+    """Test that a missing deadline never expires."""
+    deadline = Deadline(seconds=None)
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+    assert deadline.clamp(timeout=(10.0, 30.0)) == (10.0, 30.0)
+
+
+def test_deadline_in_the_future() -> None:
+    """Test that a deadline in the future clamps the timeouts."""
+    deadline = Deadline(seconds=20)
+    assert not deadline.expired()
+    connect_timeout, read_timeout = deadline.clamp(timeout=(10.0, 30.0))
+    assert connect_timeout == 10.0
+    assert read_timeout == pytest.approx(20.0, abs=1.0)
+
+
+def test_expired_deadline() -> None:
+    """Test that an expired deadline gives small positive timeouts."""
+    deadline = Deadline(seconds=0)
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+    assert all(0 < timeout <= 0.01 for timeout in deadline.clamp(timeout=(10.0, 30.0)))
@@ -0,0 +1,58 @@
+"""Tests for the `deduplication` module."""
+
+import pytest
+
+from bolig_ping.data_models import Home
+from bolig_ping.deduplication import deduplicate_homes, get_address_key
+
+
+@pytest.mark.parametrize(
+    argnames=["address", "other_address", "is_same"],
+    argvalues=[
+        ("Vej 2 1. th 2100 København Ø", "Vej 2, 1. th. 2100 København Ø", True),
+        ("Aabyvej 2 8000 Aarhus C", "ÅBYVEJ 2 8000 ÅRHUS C", True),
+        ("Vej 2 1. th 2100 København Ø", "Vej 2 1. tv 2100 København Ø", False),
+        ("Vej 2 st. 2100 København Ø", "Vej 2 1. 2100 København Ø", False),
+    ],
+    ids=["punctuation", "spelling", "different-door", "different-floor"],
+)
+def test_get_address_key(address: str, other_address: str, is_same: bool) -> None:
+    """Test that only addresses that differ in their formatting are the same."""
+    is_equal = get_address_key(address=address) == get_address_key(
+        address=other_address
+    )
+    assert is_equal == is_same
+
+
+class TestDeduplicateHomes:
+    """Tests for the `deduplicate_homes` function."""
+
+    def test_unique_homes_are_kept(self) -> None:
+        """Test that homes at different addresses are all kept, in order."""
+        homes = [
+            Home(url=f"https://some.url/{idx}", address=f"Vej {idx}")
+            for idx in range(3)
+        ]
+        assert deduplicate_homes(homes=homes) == homes
+
+    def test_oldest_listing_is_kept(self) -> None:
+        """Test that the oldest listing of a property is kept, at its first position."""
+        homes = [
+            Home(url="https://some.url/1", address="Vej 1", days_on_market=3),
+            Home(url="https://some.url/2", address="Vej 2"),
+            Home(url="https://some.url/3", address="Vej 1", days_on_market=30),
+            Home(url="https://some.url/4", address="Vej 1"),
+        ]
+        assert deduplicate_homes(homes=homes) == [homes[2], homes[1]]
+
+    def test_description_of_duplicate_is_used(self) -> None:
+        """Test that a known description of a duplicate is reused."""
+        homes = [
+            Home(url="https://some.url/1", address="Vej 1", days_on_market=30),
+            Home(url="https://some.url/2", address="Vej 1", days_on_market=3),
+        ]
+        homes[1].set_description(description="Lejlighed med altan.")
+        (home,) = deduplicate_homes(homes=homes)
+        assert home.url == "https://some.url/1"
+        assert home.description_is_fetched()
+        assert home.description == "Lejlighed med altan."
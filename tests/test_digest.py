@@ -0,0 +1,85 @@
+"""Tests for the `digest` module."""
+
+import datetime as dt
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.data_models import Home, HomeChange
+from bolig_ping.digest import add_to_digest, mark_digest_sent, pop_due_digest
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> Generator[Path, None, None]:
+    """Yield the path to an empty cache."""
+    yield tmp_path / "cache"
+
+
+@pytest.fixture(scope="module")
+def homes() -> Generator[list[Home], None, None]:
+    """Yield a list of homes."""
+    yield [
+        Home(url=f"https://some.url/{idx}", address=f"Address {idx}", price=idx)
+        for idx in range(3)
+    ]
+
+
+def test_first_digest_is_sent_immediately(homes: list[Home], cache_path: Path) -> None:
+    """Test that the first digest of a recipient is due immediately."""
+    add_to_digest(homes=homes, changes=[], emails=["a", "b"], cache_path=cache_path)
+    for email in ["a", "b"]:
+        digest = pop_due_digest(
+            email=email, window=dt.timedelta(hours=6), cache_path=cache_path
+        )
+        assert digest == (homes, [])
+
+
+def test_digests_are_batched_within_window(homes: list[Home], cache_path: Path) -> None:
+    """Test that homes found within the window are batched into the next digest."""
+    window = dt.timedelta(hours=6)
+    add_to_digest(homes=homes[:1], changes=[], emails=["a"], cache_path=cache_path)
+    pop_due_digest(email="a", window=window, cache_path=cache_path)
+    mark_digest_sent(email="a", cache_path=cache_path)
+    add_to_digest(homes=homes[1:], changes=[], emails=["a"], cache_path=cache_path)
+    assert pop_due_digest(email="a", window=window, cache_path=cache_path) is None
+    digest = pop_due_digest(
+        email="a", window=dt.timedelta(seconds=0), cache_path=cache_path
+    )
+    assert digest == (homes[1:], [])
+
+
+def test_window_starts_when_digest_is_sent(homes: list[Home], cache_path: Path) -> None:
+    """Test that a digest that was popped but never sent does not start a window."""
+    window = dt.timedelta(hours=6)
+    add_to_digest(homes=homes[:1], changes=[], emails=["a"], cache_path=cache_path)
+    pop_due_digest(email="a", window=window, cache_path=cache_path)
+    add_to_digest(homes=homes[:1], changes=[], emails=["a"], cache_path=cache_path)
+    digest = pop_due_digest(email="a", window=window, cache_path=cache_path)
+    assert digest == (homes[:1], [])
+
+
+def test_digests_are_popped_once(homes: list[Home], cache_path: Path) -> None:
+    """Test that a popped digest is not popped again."""
+    add_to_digest(homes=homes, changes=[], emails=["a"], cache_path=cache_path)
+    pop_due_digest(email="a", window=dt.timedelta(0), cache_path=cache_path)
+    assert (
+        pop_due_digest(email="a", window=dt.timedelta(0), cache_path=cache_path) is None
+    )
+
+
+def test_empty_digests_are_not_due(homes: list[Home], cache_path: Path) -> None:
+    """Test that empty digests are never due."""
+    assert (
+        pop_due_digest(email="a", window=dt.timedelta(0), cache_path=cache_path) is None
+    )
+
+
+def test_changes_are_included(homes: list[Home], cache_path: Path) -> None:
+    """Test that changes are included in the digest, alongside the same home."""
+    change = HomeChange(home=homes[0], kind="relisted")
+    add_to_digest(
+        homes=homes[:1], changes=[change], emails=["a"], cache_path=cache_path
+    )
+    digest = pop_due_digest(email="a", window=dt.timedelta(0), cache_path=cache_path)
+    assert digest == (homes[:1], [change])
@@ -2,7 +2,7 @@
 
 import pytest
 
-from bolig_ping.data_models import Home
+from bolig_ping.data_models import Home, HomeChange
 from bolig_ping.email import compose_email
 
 
@@ -79,3 +79,24 @@ def test_compose_email(homes: list[Home], expected: str) -> None:
     """Test that an email is composed."""
     email = compose_email(homes=homes)
     assert email == expected
+
+
+def test_compose_email_with_changes() -> None:
+    """Test that an email is composed with changes to homes seen before."""
+    home = Home(url="https://some.url", address="Some address", price=1000)
+    change = HomeChange(home=home, kind="price_reduced", previous_price=2000)
+    subject, contents = compose_email(homes=[], changes=[change])
+    assert subject == "[BoligPing] A home you have seen has changed!"
+    assert contents == (
+        "Hi,\n\nThese homes that you have seen before have changed:\n\n"
+        "<b>Price reduced from 2,000 kr. to 1,000 kr.</b>\n"
+        "<a href='https://some.url'>Some address</a>\n"
+        "Price: 1,000 kr.\n\n"
+        "Have a splendid day!\n\nBest regards,\nBoligPing"
+    )
+
+
+def test_compose_email_without_homes() -> None:
+    """Test that an email cannot be composed without homes or changes."""
+    with pytest.raises(ValueError):
+        compose_email(homes=[])
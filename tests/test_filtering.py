@@ -0,0 +1,105 @@
+"""Tests for the `filtering` module."""
+
+import math
+
+import pytest
+
+from bolig_ping.data_models import Home, SearchQuery
+from bolig_ping.filtering import filter_results, get_priority
+
+
+@pytest.fixture
+def homes(monkeypatch: pytest.MonkeyPatch) -> list[Home]:
+    """Homes listed on different days, whose descriptions are served without network.
+
+    The odd homes have a balcony, and the even ones do not.
+    """
+    monkeypatch.setattr(
+        Home,
+        "fetch_description",
+        lambda self, **_: (
+            "Lejlighed med altan."
+            if int(self.url.split("/")[-1]) % 2
+            else "Lejlighed uden udendørsareal."
+        ),
+    )
+    return [
+        Home(
+            url=f"https://some.url/{idx}",
+            address=f"Vej {idx}",
+            price=1_000_000 * idx,
+            days_on_market=10 - idx,
+        )
+        for idx in range(1, 10)
+    ]
+
+
+class TestGetPriority:
+    """Tests for the `get_priority` function."""
+
+    def test_newest_listings_first(self) -> None:
+        """Test that newer listings have a higher priority."""
+        search_query = SearchQuery()
+        old = Home(url="", address="", days_on_market=30)
+        new = Home(url="", address="", days_on_market=1)
+        unknown = Home(url="", address="")
+        priorities = [
+            get_priority(home=home, search_query=search_query)
+            for home in [new, old, unknown]
+        ]
+        assert priorities == sorted(priorities)
+        assert priorities[-1] == (math.inf, math.inf)
+
+    def test_closest_to_range_middle_first(self) -> None:
+        """Test that ties are broken by the distance to the middle of the range."""
+        search_query = SearchQuery(min_price=2_000_000, max_price=4_000_000)
+        middle = Home(url="", address="", price=3_000_000, days_on_market=1)
+        edge = Home(url="", address="", price=4_000_000, days_on_market=1)
+        assert get_priority(home=middle, search_query=search_query) == (1, 0.0)
+        assert get_priority(home=edge, search_query=search_query) == (1, 1.0)
+
+
+class TestFilterResults:
+    """Tests for the `filter_results` function."""
+
+    def test_max_results_without_queries(self, homes: list[Home]) -> None:
+        """Test that the newest homes are kept when capping the results."""
+        filtered = filter_results(
+            homes=homes, search_query=SearchQuery(), max_results=3
+        )
+        assert filtered == homes[::-1][:3]
+
+    def test_max_results_stops_fetching(self, homes: list[Home]) -> None:
+        """Test that no more descriptions are fetched once enough homes match."""
+        filtered = filter_results(
+            homes=homes,
+            search_query=SearchQuery(queries=["altan"]),
+            max_workers=1,
+            max_results=2,
+        )
+        assert filtered == [homes[8], homes[6]]
+        assert sum(home.description_is_fetched() for home in homes) == 3
+
+    def test_max_description_fetches(self, homes: list[Home]) -> None:
+        """Test that only the budgeted descriptions are fetched, newest first."""
+        filtered = filter_results(
+            homes=homes,
+            search_query=SearchQuery(queries=["altan"]),
+            max_workers=4,
+            max_description_fetches=6,
+        )
+        assert filtered == [homes[8], homes[6], homes[4]]
+        assert [home.description_is_fetched() for home in homes] == [False] * 3 + [
+            True
+        ] * 6
+
+    def test_prefetched_descriptions_are_free(self, homes: list[Home]) -> None:
+        """Test that descriptions that are already known do not count as fetches."""
+        for home in homes[:5]:
+            home.set_description(description="Lejlighed med altan.")
+        filtered = filter_results(
+            homes=homes,
+            search_query=SearchQuery(queries=["altan"]),
+            max_description_fetches=2,
+        )
+        assert filtered == [homes[8], homes[4], homes[3], homes[2], homes[1], homes[0]]
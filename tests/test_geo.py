@@ -0,0 +1,80 @@
+"""Tests for the `geo` module."""
+
+import random
+from collections.abc import Generator
+
+import pytest
+
+from bolig_ping.data_models import Circle, Home, Polygon
+from bolig_ping.geo import GridIndex, filter_by_area, haversine_distance
+
+
+@pytest.fixture(scope="module")
+def homes() -> Generator[list[Home], None, None]:
+    """Yield homes spread randomly around Copenhagen."""
+    rng = random.Random(4242)
+    yield [
+        Home(
+            url=f"https://some.url/{idx}",
+            address=f"Address {idx}",
+            latitude=55.6 + rng.random() * 0.2,
+            longitude=12.4 + rng.random() * 0.3,
+        )
+        for idx in range(2_000)
+    ] + [Home(url="https://some.url/no-coordinates", address="Unknown")]
+
+
+@pytest.mark.parametrize(
+    argnames=["circle"],
+    argvalues=[
+        (Circle(latitude=55.68, longitude=12.57, radius_km=2),),
+        (Circle(latitude=55.65, longitude=12.45, radius_km=0.5),),
+        (Circle(latitude=55.7, longitude=12.55, radius_km=50),),
+    ],
+    ids=["small", "tiny", "covering"],
+)
+def test_query_circle(homes: list[Home], circle: Circle) -> None:
+    """Test that the index finds exactly the homes inside a circle."""
+    expected = {
+        home.url
+        for home in homes
+        if haversine_distance(
+            circle.latitude, circle.longitude, home.latitude, home.longitude
+        )
+        <= circle.radius_km
+    }
+    index = GridIndex(homes=homes)
+    assert {home.url for home in index.query_circle(circle)} == expected
+
+
+def test_query_polygon(homes: list[Home]) -> None:
+    """Test that the index finds exactly the homes inside a polygon."""
+    triangle = Polygon(vertices=[(55.65, 12.5), (55.75, 12.5), (55.65, 12.6)])
+    expected = {
+        home.url
+        for home in homes
+        if home.latitude is not None
+        and home.longitude is not None
+        and home.latitude > 55.65
+        and home.longitude > 12.5
+        and (home.latitude - 55.65) + (home.longitude - 12.5) < 0.1
+    }
+    index = GridIndex(homes=homes)
+    assert {home.url for home in index.query_polygon(triangle)} == expected
+
+
+def test_filter_by_area(homes: list[Home]) -> None:
+    """Test that homes inside any area are kept in their original order."""
+    circle = Circle(latitude=55.68, longitude=12.57, radius_km=2)
+    square = Polygon(
+        vertices=[(55.6, 12.4), (55.6, 12.45), (55.65, 12.45), (55.65, 12.4)]
+    )
+    index = GridIndex(homes=homes)
+    expected_urls = {home.url for home in index.query_circle(circle)} | {
+        home.url for home in index.query_polygon(square)
+    }
+    filtered = filter_by_area(homes=homes, circles=[circle], polygons=[square])
+    assert [home.url for home in filtered] == [
+        home.url for home in homes if home.url in expected_urls
+    ]
+    assert filter_by_area(homes=homes, circles=[], polygons=[]) == []
@@ -0,0 +1,153 @@
+"""Tests for the `http_cache` module."""
+
+import datetime as dt
+import json
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.data_models import Home
+from bolig_ping.deadline import Deadline
+from bolig_ping.http_cache import CachedPage, PageCache, SearchPage
+from bolig_ping.rate_limiting import RateLimiter
+from bolig_ping.scraper import fetch_search_page
+
+RESULT = dict(
+    caseID="abc",
+    address=dict(roadName="Søvej", houseNumber="1", zipCode=2100, cityName="København"),
+    priceCash=3_000_000,
+)
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """Request handler serving a search page with an ETag."""
+
+    num_full_responses = 0
+    num_not_modified = 0
+
+    def do_GET(self) -> None:
+        """Respond with 304 if the ETag matches, and with the page otherwise."""
+        if self.headers.get("If-None-Match") == '"v1"':
+            SearchHandler.num_not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        SearchHandler.num_full_responses += 1
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(json.dumps(dict(cases=[RESULT], totalHits=1)).encode())
+
+
+@pytest.fixture(scope="module")
+def server_url(serve_http: Callable[[type[BaseHTTPRequestHandler]], str]) -> str:
+    """Get the URL of a local server serving search pages."""
+    return serve_http(SearchHandler)
+
+
+@pytest.fixture(autouse=True)
+def reset_counts() -> None:
+    """Reset the request counts of the server."""
+    SearchHandler.num_full_responses = 0
+    SearchHandler.num_not_modified = 0
+
+
+def fetch(url: str, page_cache: PageCache | None) -> int:
+    """Fetch a search page, returning its number of hits."""
+    search_page = fetch_search_page(
+        url=url,
+        rate_limiter=RateLimiter(),
+        deadline=Deadline(seconds=None),
+        page_cache=page_cache,
+    )
+    assert [home.url.split("/")[-1] for home in search_page.homes] == ["abc"]
+    return search_page.total_hits
+
+
+def test_without_cache(server_url: str) -> None:
+    """Test that pages are always fetched in full without a cache."""
+    for _ in range(2):
+        assert fetch(url=f"{server_url}/search", page_cache=None) == 1
+    assert SearchHandler.num_full_responses == 2
+
+
+def test_fresh_pages_are_not_requested(server_url: str) -> None:
+    """Test that a page within the TTL is used without any request."""
+    page_cache = PageCache(cache_path=None, ttl=dt.timedelta(minutes=1))
+    for _ in range(3):
+        fetch(url=f"{server_url}/search", page_cache=page_cache)
+    assert SearchHandler.num_full_responses == 1
+    assert SearchHandler.num_not_modified == 0
+
+
+def test_stale_pages_are_revalidated(server_url: str, tmp_path: Path) -> None:
+    """Test that a stale page is revalidated, also by a later process."""
+    cache_path = tmp_path / "cache"
+    page_cache = PageCache(cache_path=cache_path, ttl=dt.timedelta(0))
+    fetch(url=f"{server_url}/search", page_cache=page_cache)
+    fetch(url=f"{server_url}/search", page_cache=page_cache)
+
+    # A new page cache, as in the next run, revalidates the stored page
+    new_page_cache = PageCache(cache_path=cache_path, ttl=dt.timedelta(0))
+    fetch(url=f"{server_url}/search", page_cache=new_page_cache)
+    assert SearchHandler.num_full_responses == 1
+    assert SearchHandler.num_not_modified == 2
+
+
+def test_changed_pages_are_not_parsed_from_the_cache(
+    server_url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that a stored page which has changed is never parsed from the cache."""
+    cache_path = tmp_path / "cache"
+    PageCache(cache_path=cache_path).store(
+        url=f"{server_url}/search", page=SearchPage(total_hits=0, homes=[]), etag='"v0"'
+    )
+    parsed_pages: list[CachedPage] = list()
+    parse_page = CachedPage.get_page
+
+    def get_page(self: CachedPage) -> SearchPage:
+        parsed_pages.append(self)
+        return parse_page(self)
+
+    monkeypatch.setattr(CachedPage, "get_page", get_page)
+    fetch(
+        url=f"{server_url}/search",
+        page_cache=PageCache(cache_path=cache_path, ttl=dt.timedelta(0)),
+    )
+    assert SearchHandler.num_full_responses == 1
+    assert parsed_pages == []
+
+
+def test_old_pages_are_removed(server_url: str, tmp_path: Path) -> None:
+    """Test that pages older than the maximum age are removed from the cache file."""
+    cache_path = tmp_path / "cache"
+    page_cache = PageCache(cache_path=cache_path)
+    fetch(url=f"{server_url}/search", page_cache=page_cache)
+    new_page_cache = PageCache(cache_path=cache_path, max_age=dt.timedelta(0))
+    assert new_page_cache.lookup(url=f"{server_url}/search") is None
+
+
+def test_memory_eviction() -> None:
+    """Test that the least recently used pages are evicted from memory."""
+    page_cache = PageCache(cache_path=None, max_memory_entries=2)
+    for idx in range(3):
+        page_cache.store(url=str(idx), page=SearchPage(total_hits=idx, homes=[]))
+    assert page_cache.lookup(url="0") is None
+    assert page_cache.lookup(url="2") is not None
+
+
+def test_descriptions_are_cached(tmp_path: Path) -> None:
+    """Test that the known descriptions of the homes are kept in the cache file."""
+    cache_path = tmp_path / "cache"
+    home = Home(url="https://some.url/1", address="Vej 1")
+    home.set_description(description="Lejlighed med altan.")
+    PageCache(cache_path=cache_path).store(
+        url="page", page=SearchPage(total_hits=1, homes=[home])
+    )
+    cached_page = PageCache(cache_path=cache_path).lookup(url="page")
+    assert cached_page is not None
+    (cached_home,) = cached_page.get_page().homes
+    assert cached_home.description_is_fetched()
+    assert cached_home.description == "Lejlighed med altan."
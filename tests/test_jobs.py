@@ -0,0 +1,121 @@
+"""Tests for the `jobs` module."""
+
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.data_models import SearchQuery
+from bolig_ping.jobs import (
+    SavedSearch,
+    acknowledge_job,
+    add_saved_search,
+    claim_job,
+    list_saved_searches,
+    release_job,
+    remove_saved_search,
+    run_worker,
+)
+
+TIMEOUT = dt.timedelta(minutes=15)
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> Path:
+    """The path to a cache holding three saved searches."""
+    cache_path = tmp_path / "cache"
+    for idx in range(3):
+        add_saved_search(
+            saved_search=SavedSearch(
+                name=f"search-{idx}",
+                search_query=SearchQuery(cities=["københavn"], max_price=idx),
+                emails=["test@example.com"],
+            ),
+            cache_path=cache_path,
+        )
+    return cache_path
+
+
+def test_claimed_jobs_are_hidden(cache_path: Path) -> None:
+    """Test that a claimed saved search cannot be claimed by another worker."""
+    names = [
+        job.saved_search.name
+        for job in iter(lambda: claim_job(TIMEOUT, cache_path=cache_path), None)
+    ]
+    assert sorted(names) == ["search-0", "search-1", "search-2"]
+
+
+def test_concurrent_claims(cache_path: Path) -> None:
+    """Test that concurrent workers never claim the same saved search."""
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        jobs = list(
+            executor.map(
+                lambda _: claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path),
+                range(6),
+            )
+        )
+    names = [job.saved_search.name for job in jobs if job is not None]
+    assert sorted(names) == ["search-0", "search-1", "search-2"]
+
+
+def test_acknowledged_jobs_are_rescheduled(cache_path: Path) -> None:
+    """Test that an acknowledged saved search is not due until its next run."""
+    remove_saved_search(name="search-1", cache_path=cache_path)
+    remove_saved_search(name="search-2", cache_path=cache_path)
+    job = claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path)
+    assert job is not None
+    assert acknowledge_job(job=job, cache_path=cache_path)
+    assert claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path) is None
+
+
+def test_expired_leases_are_reclaimed(cache_path: Path) -> None:
+    """Test that the saved search of a crashed worker is claimed by another worker."""
+    remove_saved_search(name="search-1", cache_path=cache_path)
+    remove_saved_search(name="search-2", cache_path=cache_path)
+    crashed_job = claim_job(visibility_timeout=dt.timedelta(0), cache_path=cache_path)
+    job = claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path)
+    assert crashed_job is not None and job is not None
+    assert job.attempts == 2
+
+    # The crashed worker no longer holds the lease
+    assert not acknowledge_job(job=crashed_job, cache_path=cache_path)
+    assert acknowledge_job(job=job, cache_path=cache_path)
+
+
+def test_released_jobs_are_retried(cache_path: Path) -> None:
+    """Test that a released saved search is due again after the retry delay."""
+    remove_saved_search(name="search-1", cache_path=cache_path)
+    remove_saved_search(name="search-2", cache_path=cache_path)
+    job = claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path)
+    assert job is not None
+    release_job(job=job, retry_after=dt.timedelta(0), cache_path=cache_path)
+    job = claim_job(visibility_timeout=TIMEOUT, cache_path=cache_path)
+    assert job is not None
+    assert job.attempts == 2
+
+
+def test_run_worker(cache_path: Path) -> None:
+    """Test that a worker runs all due saved searches, retrying the failed ones."""
+    run_names: list[str] = list()
+
+    def run_search(saved_search: SavedSearch) -> None:
+        run_names.append(saved_search.name)
+        if saved_search.name == "search-1":
+            raise RuntimeError("Failed search")
+
+    num_succeeded = run_worker(
+        run_search=run_search, cache_path=cache_path, stop_when_idle=True
+    )
+    assert num_succeeded == 2
+    assert sorted(run_names) == ["search-0", "search-1", "search-2"]
+
+
+def test_list_saved_searches(cache_path: Path) -> None:
+    """Test that the saved searches are listed by name, until they are removed."""
+    names = [search.name for search in list_saved_searches(cache_path=cache_path)]
+    assert names == ["search-0", "search-1", "search-2"]
+    assert remove_saved_search(name="search-1", cache_path=cache_path)
+    assert not remove_saved_search(name="search-1", cache_path=cache_path)
+    names = [search.name for search in list_saved_searches(cache_path=cache_path)]
+    assert names == ["search-0", "search-2"]
@@ -0,0 +1,66 @@
+"""Tests for the `output` module."""
+
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.data_models import Home
+from bolig_ping.output import COLUMNS, ParquetWriter, get_writer
+
+HOMES = [
+    Home(
+        url=f"https://www.boligsiden.dk/viderestilling/{idx}",
+        address=f"Søvej {idx}, 2100 København Ø",
+        price=1_000_000 * idx,
+        size=50 + idx,
+        latitude=55.7,
+        longitude=12.6,
+    )
+    for idx in range(1, 6)
+]
+
+
+def test_jsonl(tmp_path: Path) -> None:
+    """Test that homes are written as JSON Lines."""
+    path = tmp_path / "homes.jsonl"
+    with get_writer(output_format="jsonl", path=path) as writer:
+        for home in HOMES:
+            writer.write(home=home)
+    assert writer.num_written == len(HOMES)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [Home.model_validate(json.loads(line)) for line in lines] == HOMES
+
+
+def test_jsonl_to_stdout(capsys: pytest.CaptureFixture) -> None:
+    """Test that homes are written to standard output if no path is given."""
+    with get_writer(output_format="jsonl") as writer:
+        writer.write(home=HOMES[0])
+    assert json.loads(capsys.readouterr().out)["address"] == HOMES[0].address
+
+
+def test_csv(tmp_path: Path) -> None:
+    """Test that homes are written as CSV with a header."""
+    path = tmp_path / "homes.csv"
+    with get_writer(output_format="csv", path=path) as writer:
+        for home in HOMES:
+            writer.write(home=home)
+    with path.open(encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == COLUMNS
+    assert [row["url"] for row in rows] == [home.url for home in HOMES]
+    assert rows[0]["num_rooms"] == ""
+
+
+def test_parquet(tmp_path: Path) -> None:
+    """Test that homes are written as Parquet in row groups."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "homes.parquet"
+    with ParquetWriter(path=path, batch_size=2) as writer:
+        for home in HOMES:
+            writer.write(home=home)
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().to_pylist() == [home.to_dict() for home in HOMES]
+    assert parquet_file.schema_arrow.names == COLUMNS
@@ -0,0 +1,64 @@
+"""Tests for the `polling` module."""
+
+import datetime as dt
+
+import pytest
+
+from bolig_ping.polling import PollingSchedule
+
+MINUTE = dt.timedelta(minutes=1)
+
+
+@pytest.fixture
+def schedule() -> PollingSchedule:
+    """A polling schedule between 5 minutes and 2 hours."""
+    return PollingSchedule(min_interval=5 * MINUTE, max_interval=120 * MINUTE)
+
+
+def test_initial_interval(schedule: PollingSchedule) -> None:
+    """Test that the schedule starts at the minimum interval."""
+    assert schedule.interval == 5 * MINUTE
+
+
+def test_quiet_periods_lengthen_interval(schedule: PollingSchedule) -> None:
+    """Test that polls without new homes lengthen the interval up to the maximum."""
+    schedule.record_poll(num_new=1, elapsed=10 * MINUTE)
+    intervals = [
+        schedule.record_poll(num_new=0, elapsed=schedule.interval) for _ in range(20)
+    ]
+    assert intervals == sorted(intervals)
+    assert intervals[0] > 10 * MINUTE
+    assert intervals[-1] == 120 * MINUTE
+
+
+def test_bursts_shorten_interval(schedule: PollingSchedule) -> None:
+    """Test that a burst of new homes shortens the interval right away."""
+    for _ in range(10):
+        schedule.record_poll(num_new=0, elapsed=schedule.interval)
+    assert schedule.interval == 120 * MINUTE
+    schedule.record_poll(num_new=100, elapsed=120 * MINUTE)
+    assert schedule.interval == 5 * MINUTE
+
+
+def test_no_arrivals_at_all(schedule: PollingSchedule) -> None:
+    """Test that the maximum interval is used if no homes have ever arrived."""
+    assert schedule.record_poll(num_new=0, elapsed=5 * MINUTE) == 120 * MINUTE
+
+
+@pytest.mark.parametrize(
+    argnames=["min_interval", "max_interval", "smoothing"],
+    argvalues=[
+        (0 * MINUTE, MINUTE, 0.3),
+        (2 * MINUTE, MINUTE, 0.3),
+        (MINUTE, MINUTE, 0),
+    ],
+    ids=["zero-minimum", "minimum-above-maximum", "zero-smoothing"],
+)
+def test_invalid_arguments(
+    min_interval: dt.timedelta, max_interval: dt.timedelta, smoothing: float
+) -> None:
+    """Test that invalid bounds or smoothing raise an error."""
+    with pytest.raises(ValueError):
+        PollingSchedule(
+            min_interval=min_interval, max_interval=max_interval, smoothing=smoothing
+        )
@@ -0,0 +1,104 @@
+"""Tests for the `rate_limiting` module."""
+
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from bolig_ping.rate_limiting import RateLimiter, get_with_retry, parse_retry_after
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Request handler that throttles the first requests to every path."""
+
+    num_requests: dict[str, int] = dict()
+
+    def do_GET(self) -> None:
+        """Respond with 429 for the first two requests to a path, then 200."""
+        num_requests = self.num_requests.get(self.path, 0)
+        self.num_requests[self.path] = num_requests + 1
+        if self.path.startswith("/missing"):
+            self.send_response(404)
+        elif num_requests < 2:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+@pytest.fixture(scope="module")
+def server_url(serve_http: Callable[[type[BaseHTTPRequestHandler]], str]) -> str:
+    """Get the URL of a local server that throttles requests."""
+    return serve_http(FlakyHandler)
+
+
+class TestRateLimiter:
+    """Tests for the `RateLimiter` class."""
+
+    def test_additive_increase(self) -> None:
+        """Test that successes increase the concurrency up to the maximum."""
+        rate_limiter = RateLimiter(initial_concurrency=2, max_concurrency=4)
+        for _ in range(100):
+            rate_limiter.record_success()
+        assert rate_limiter.concurrency == 4
+
+    def test_multiplicative_decrease(self) -> None:
+        """Test that throttles halve the concurrency down to the minimum."""
+        rate_limiter = RateLimiter(initial_concurrency=8, max_concurrency=8)
+        rate_limiter.record_throttle()
+        assert rate_limiter.concurrency == 4
+        for _ in range(10):
+            rate_limiter.record_throttle()
+        assert rate_limiter.concurrency == 1
+
+
+class TestGetWithRetry:
+    """Tests for the `get_with_retry` function."""
+
+    def test_retries_until_success(self, server_url: str) -> None:
+        """Test that throttled requests are retried."""
+        rate_limiter = RateLimiter(initial_concurrency=4)
+        response = get_with_retry(
+            url=f"{server_url}/retry", rate_limiter=rate_limiter, backoff_base=0.01
+        )
+        assert response.status_code == 200
+        assert FlakyHandler.num_requests["/retry"] == 3
+        assert rate_limiter.concurrency < 4
+
+    def test_gives_up_after_max_retries(self, server_url: str) -> None:
+        """Test that an error is raised after all retries are used."""
+        with pytest.raises(requests.HTTPError):
+            get_with_retry(
+                url=f"{server_url}/give-up",
+                rate_limiter=RateLimiter(),
+                max_retries=1,
+                backoff_base=0.01,
+            )
+
+    def test_client_errors_are_not_retried(self, server_url: str) -> None:
+        """Test that client errors are raised immediately."""
+        with pytest.raises(requests.HTTPError):
+            get_with_retry(url=f"{server_url}/missing", rate_limiter=RateLimiter())
+        assert FlakyHandler.num_requests["/missing"] == 1
+
+
+@pytest.mark.parametrize(
+    argnames=["header", "expected"],
+    argvalues=[
+        (None, None),
+        ("3", 3.0),
+        ("-1", 0.0),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+        ("soon", None),
+    ],
+    ids=["missing", "seconds", "negative", "past-date", "invalid"],
+)
+def test_parse_retry_after(header: str | None, expected: float | None) -> None:
+    """Test the `parse_retry_after` function."""
+    response = requests.Response()
+    if header is not None:
+        response.headers["Retry-After"] = header
+    assert parse_retry_after(response=response) == expected
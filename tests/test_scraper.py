@@ -1 +1,49 @@
 """Tests for the `scraper` module."""
+
+from bolig_ping.data_models import Home
+from bolig_ping.scraper import get_home_from_result
+
+
+def test_get_home_from_result() -> None:
+    """Test that a home is extracted from a search result."""
+    result = dict(
+        caseID="abc-123",
+        address=dict(
+            roadName="Some road",
+            houseNumber="12",
+            floor="0",
+            door="tv",
+            zipCode=2200,
+            cityName="København N",
+        ),
+        priceCash=3_000_000,
+        numberOfRooms=3,
+        housingArea=80,
+        monthlyExpense=2_500,
+        yearBuilt=1900,
+        coordinates=dict(lat=55.69, lon=12.55, type="EPSG4326"),
+    )
+    assert get_home_from_result(result=result) == Home(
+        url="https://boligsiden.dk/viderestilling/abc-123",
+        address="Some road 12 st. tv 2200 København N",
+        price=3_000_000,
+        num_rooms=3,
+        size=80,
+        monthly_fee=2_500,
+        year=1900,
+        latitude=55.69,
+        longitude=12.55,
+    )
+
+
+def test_embedded_description_is_used() -> None:
+    """Test that a description embedded in a search result is used as-is."""
+    result = dict(
+        caseID="abc-123",
+        address=dict(roadName="Some road", cityName="København N"),
+        descriptionTitle="Lys lejlighed",
+        descriptionBody="Med altan og badekar.",
+    )
+    home = get_home_from_result(result=result)
+    assert home.description_is_fetched()
+    assert home.description == "Lys lejlighed\nMed altan og badekar."
@@ -0,0 +1,195 @@
+"""Tests for the `sharding` module."""
+
+import pytest
+import requests
+
+from bolig_ping import sharding
+from bolig_ping.data_models import Home, SearchQuery
+from bolig_ping.deadline import Deadline
+from bolig_ping.rate_limiting import RateLimiter
+from bolig_ping.scraper import ScrapeStatus
+from bolig_ping.sharding import (
+    PRICE_SPLIT_START,
+    plan_shards,
+    scrape_sharded_results,
+    split_search_query,
+)
+
+
+@pytest.mark.parametrize(
+    argnames=["search_query", "expected"],
+    argvalues=[
+        (
+            SearchQuery(cities=["aarhus", "odense"], max_price=100),
+            [
+                SearchQuery(cities=["aarhus"], max_price=100),
+                SearchQuery(cities=["odense"], max_price=100),
+            ],
+        ),
+        (
+            SearchQuery(property_type=["house", "ejerlejlighed"]),
+            [
+                SearchQuery(property_type=["house"]),
+                SearchQuery(property_type=["ejerlejlighed"]),
+            ],
+        ),
+        (
+            SearchQuery(cities=["aarhus"], min_price=100, max_price=201),
+            [
+                SearchQuery(cities=["aarhus"], min_price=100, max_price=150),
+                SearchQuery(cities=["aarhus"], min_price=151, max_price=201),
+            ],
+        ),
+        (
+            SearchQuery(max_price=2 * PRICE_SPLIT_START),
+            [
+                SearchQuery(min_price=0, max_price=PRICE_SPLIT_START),
+                SearchQuery(
+                    min_price=PRICE_SPLIT_START + 1, max_price=2 * PRICE_SPLIT_START
+                ),
+            ],
+        ),
+        (
+            SearchQuery(),
+            [
+                SearchQuery(min_price=0, max_price=PRICE_SPLIT_START),
+                SearchQuery(min_price=PRICE_SPLIT_START + 1),
+            ],
+        ),
+        (
+            SearchQuery(min_price=PRICE_SPLIT_START + 1),
+            [
+                SearchQuery(
+                    min_price=PRICE_SPLIT_START + 1, max_price=2 * PRICE_SPLIT_START + 2
+                ),
+                SearchQuery(min_price=2 * PRICE_SPLIT_START + 3),
+            ],
+        ),
+        (SearchQuery(min_price=100, max_price=100), []),
+    ],
+    ids=[
+        "cities",
+        "property-types",
+        "price-band",
+        "lower-unbounded-price",
+        "no-price-bound",
+        "upper-unbounded-price",
+        "unsplittable",
+    ],
+)
+def test_split_search_query(
+    search_query: SearchQuery, expected: list[SearchQuery]
+) -> None:
+    """Test the `split_search_query` function."""
+    assert split_search_query(search_query=search_query) == expected
+
+
+def test_split_search_query_is_disjoint() -> None:
+    """Test that repeatedly splitting a price band gives disjoint covering bands."""
+    shards = [SearchQuery(min_price=0, max_price=1_000)]
+    for _ in range(5):
+        shards = [
+            sub_query for shard in shards for sub_query in split_search_query(shard)
+        ]
+    prices = [
+        price
+        for shard in shards
+        for price in range(shard.min_price or 0, (shard.max_price or 0) + 1)
+    ]
+    assert sorted(prices) == list(range(1_001))
+
+
+class TestPlanShards:
+    """Tests for the `plan_shards` function."""
+
+    def plan(self, prices: list[int | None], monkeypatch: pytest.MonkeyPatch) -> list:
+        """Plan the shards of a full-market search over homes with the given prices."""
+
+        def get_total_hits(search_query: SearchQuery, **_) -> int:
+            min_price, max_price = search_query.min_price, search_query.max_price
+            if min_price is None and max_price is None:
+                return len(prices)
+            return sum(
+                price is not None
+                and (min_price is None or price >= min_price)
+                and (max_price is None or price <= max_price)
+                for price in prices
+            )
+
+        monkeypatch.setattr(sharding, "get_total_hits", get_total_hits)
+        shards = plan_shards(
+            search_query=SearchQuery(),
+            max_hits_per_shard=10,
+            rate_limiter=RateLimiter(),
+            deadline=Deadline(seconds=None),
+        )
+        return [get_total_hits(search_query=shard) for shard in shards]
+
+    def test_full_market_is_split(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that a search without a price bound is split into price bands."""
+        prices: list[int | None] = [100_000 * idx for idx in range(1, 31)]
+        assert self.plan(prices=prices, monkeypatch=monkeypatch) == [10, 10, 10]
+
+    def test_homes_without_price_are_kept(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test that a search is not split into price bands leaving out homes."""
+        prices: list[int | None] = [100_000 * idx for idx in range(1, 31)] + [None]
+        assert self.plan(prices=prices, monkeypatch=monkeypatch) == [31]
+
+
+class TestScrapeShardedResults:
+    """Tests for the `scrape_sharded_results` function."""
+
+    @pytest.fixture
+    def failing_cities(self, monkeypatch: pytest.MonkeyPatch) -> set[str]:
+        """Mock the API of two cities, failing the requests of the given cities."""
+        failing_cities: set[str] = set()
+
+        def get_total_hits(search_query: SearchQuery, **_) -> int:
+            if len(search_query.cities) > 1:
+                return 2_000
+            if search_query.cities[0] in failing_cities:
+                raise requests.HTTPError("503 Service Unavailable")
+            return 10
+
+        def scrape_results(search_query: SearchQuery, **_) -> list[Home]:
+            (city,) = search_query.cities
+            if city in failing_cities:
+                raise requests.HTTPError("503 Service Unavailable")
+            return [Home(url=f"https://some.url/{city}", address=city)]
+
+        monkeypatch.setattr(sharding, "get_total_hits", get_total_hits)
+        monkeypatch.setattr(sharding, "scrape_results", scrape_results)
+        return failing_cities
+
+    @pytest.mark.parametrize(
+        argnames=["failing_city"],
+        argvalues=[("odense",), ("aarhus",)],
+        ids=["failing-shard", "failing-count"],
+    )
+    def test_failed_shards_are_skipped(
+        self, failing_cities: set[str], failing_city: str
+    ) -> None:
+        """Test that the homes of the other shards are kept when a shard fails."""
+        failing_cities.add(failing_city)
+        status = ScrapeStatus()
+        homes = scrape_sharded_results(
+            search_query=SearchQuery(cities=["aarhus", "odense"]),
+            max_hits_per_shard=100,
+            status=status,
+        )
+        assert homes is not None
+        assert [home.address for home in homes] == list(
+            {"aarhus", "odense"} - failing_cities
+        )
+        assert not status.is_complete()
+
+    def test_all_shards_failing(self, failing_cities: set[str]) -> None:
+        """Test that the error is raised when every shard fails."""
+        failing_cities.update({"aarhus", "odense"})
+        with pytest.raises(requests.HTTPError):
+            scrape_sharded_results(
+                search_query=SearchQuery(cities=["aarhus", "odense"]),
+                max_hits_per_shard=100,
+            )
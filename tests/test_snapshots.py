@@ -0,0 +1,263 @@
+"""Tests for the `snapshots` module."""
+
+import datetime as dt
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from bolig_ping.data_models import Home, HomeChange, SearchQuery
+from bolig_ping.snapshots import find_changes, update_snapshots
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> Generator[Path, None, None]:
+    """Yield the path to an empty cache."""
+    yield tmp_path / "cache"
+
+
+@pytest.fixture(scope="module")
+def search_query() -> Generator[SearchQuery, None, None]:
+    """Yield a search query."""
+    yield SearchQuery(cities=["aarhus"])
+
+
+def make_home(price: int, monthly_fee: int = 1_000) -> Home:
+    """Make a home with the given price and monthly fee."""
+    return Home(
+        url="https://some.url/1",
+        address="Some address",
+        price=price,
+        monthly_fee=monthly_fee,
+    )
+
+
+def record_scrape(
+    homes: list[Home],
+    search_query: SearchQuery,
+    recipients: list[str],
+    cache_path: Path,
+    is_complete: bool = True,
+    relist_after: dt.timedelta = dt.timedelta(days=7),
+) -> list[HomeChange]:
+    """Find the changes of a scrape, and update the snapshots with the scrape."""
+    changes = find_changes(
+        homes=homes,
+        search_query=search_query,
+        recipients=recipients,
+        cache_path=cache_path,
+        relist_after=relist_after,
+    )
+    update_snapshots(
+        homes=homes,
+        search_query=search_query,
+        recipients=recipients,
+        cache_path=cache_path,
+        is_complete=is_complete,
+    )
+    return changes
+
+
+def test_new_homes_are_not_changes(search_query: SearchQuery, cache_path: Path) -> None:
+    """Test that homes seen for the first time are not reported as changes."""
+    assert (
+        record_scrape(
+            homes=[make_home(price=1_000)],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+        )
+        == []
+    )
+
+
+def test_unchanged_homes_are_not_changes(
+    search_query: SearchQuery, cache_path: Path
+) -> None:
+    """Test that unchanged homes and price increases are not reported as changes."""
+    for price in [1_000, 1_000, 2_000]:
+        changes = record_scrape(
+            homes=[make_home(price=price, monthly_fee=price)],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+        )
+        assert changes == []
+
+
+def test_price_reduction(search_query: SearchQuery, cache_path: Path) -> None:
+    """Test that a price reduction is reported once."""
+    record_scrape(
+        homes=[make_home(price=2_000)],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+    )
+    home = make_home(price=1_500)
+    for expected in [
+        [HomeChange(home=home, kind="price_reduced", previous_price=2_000)],
+        [],
+    ]:
+        changes = record_scrape(
+            homes=[home],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+        )
+        assert changes == expected
+
+
+def test_changes_are_found_until_stored(
+    search_query: SearchQuery, cache_path: Path
+) -> None:
+    """Test that changes are found again until the snapshots are updated."""
+    record_scrape(
+        homes=[make_home(price=2_000)],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+    )
+    home = make_home(price=1_500)
+    for _ in range(2):
+        changes = find_changes(
+            homes=[home],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+        )
+        assert changes == [
+            HomeChange(home=home, kind="price_reduced", previous_price=2_000)
+        ]
+
+
+def test_relisting(search_query: SearchQuery, cache_path: Path) -> None:
+    """Test that a home missing from a complete scrape is reported as relisted."""
+    home = make_home(price=1_000)
+    other_home = Home(url="https://some.url/2", address="Other address")
+    for scraped_homes in [[home, other_home], [other_home]]:
+        record_scrape(
+            homes=scraped_homes,
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+        )
+    for expected in [
+        [HomeChange(home=home, kind="relisted", previous_price=1_000)],
+        [],
+    ]:
+        changes = record_scrape(
+            homes=[home, other_home],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+            relist_after=dt.timedelta(seconds=0),
+        )
+        assert changes == expected
+
+
+def test_homes_still_listed_are_not_relisted(
+    search_query: SearchQuery, cache_path: Path
+) -> None:
+    """Test that homes seen in every scrape are not relisted, however long ago."""
+    home = make_home(price=1_000)
+    for _ in range(2):
+        changes = record_scrape(
+            homes=[home],
+            search_query=search_query,
+            recipients=["a"],
+            cache_path=cache_path,
+            relist_after=dt.timedelta(seconds=0),
+        )
+        assert changes == []
+
+
+def test_partial_scrapes_do_not_mark_homes_missing(
+    search_query: SearchQuery, cache_path: Path
+) -> None:
+    """Test that homes missing from a partial scrape are not relisted."""
+    home = make_home(price=1_000)
+    other_home = Home(url="https://some.url/2", address="Other address")
+    record_scrape(
+        homes=[home, other_home],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+    )
+    record_scrape(
+        homes=[other_home],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+        is_complete=False,
+    )
+    changes = record_scrape(
+        homes=[home, other_home],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+        relist_after=dt.timedelta(seconds=0),
+    )
+    assert changes == []
+
+
+def test_snapshots_are_per_query(search_query: SearchQuery, cache_path: Path) -> None:
+    """Test that snapshots of different search queries are kept apart."""
+    record_scrape(
+        homes=[make_home(price=2_000)],
+        search_query=search_query,
+        recipients=["a"],
+        cache_path=cache_path,
+    )
+    changes = record_scrape(
+        homes=[make_home(price=1_000)],
+        search_query=SearchQuery(cities=["odense"]),
+        recipients=["a"],
+        cache_path=cache_path,
+    )
+    assert changes == []
+
+
+@pytest.mark.parametrize(
+    argnames=["other_search_query", "other_recipients"],
+    argvalues=[
+        (SearchQuery(cities=["aarhus"], queries=["altan"]), ["a"]),
+        (SearchQuery(cities=["aarhus"]), ["b"]),
+    ],
+    ids=["other-keywords", "other-recipients"],
+)
+def test_snapshots_are_per_subscription(
+    search_query: SearchQuery,
+    other_search_query: SearchQuery,
+    other_recipients: list[str],
+    cache_path: Path,
+) -> None:
+    """Test that subscriptions sharing the same listings each get their changes."""
+    subscriptions = [(search_query, ["a"]), (other_search_query, other_recipients)]
+    for query, recipients in subscriptions:
+        record_scrape(
+            homes=[make_home(price=2_000)],
+            search_query=query,
+            recipients=recipients,
+            cache_path=cache_path,
+        )
+    home = make_home(price=1_000)
+    for query, recipients in subscriptions:
+        changes = record_scrape(
+            homes=[home],
+            search_query=query,
+            recipients=recipients,
+            cache_path=cache_path,
+        )
+        assert changes == [
+            HomeChange(home=home, kind="price_reduced", previous_price=2_000)
+        ]
+
+
+def test_describe_change() -> None:
+    """Test that changes are described."""
+    home = make_home(price=1_500_000)
+    change = HomeChange(home=home, kind="price_reduced", previous_price=2_000_000)
+    assert change.describe() == "Price reduced from 2,000,000 kr. to 1,500,000 kr."
+    assert change.to_text().startswith("Change: Price reduced")
+    change = HomeChange(home=home, kind="relisted")
+    assert change.describe() == "Back on the market"
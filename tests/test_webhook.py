@@ -0,0 +1,126 @@
+"""Tests for the `webhook` module."""
+
+import json
+import threading
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from bolig_ping.data_models import Home, HomeChange
+from bolig_ping.webhook import WebhookNotifier
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    """Request handler collecting the posted batches, over keep-alive connections."""
+
+    protocol_version = "HTTP/1.1"
+    requests: list[tuple[str, dict[str, str], bytes]] = list()
+    client_ports: set[int] = set()
+    num_throttled: dict[str, int] = dict()
+    lock = threading.Lock()
+
+    def do_POST(self) -> None:
+        """Store the batch, throttling the first request to `/flaky`."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.lock:
+            self.client_ports.add(self.client_address[1])
+            if self.path == "/flaky" and not self.num_throttled.get(self.path):
+                self.num_throttled[self.path] = 1
+                status = 429
+            else:
+                self.requests.append((self.path, dict(self.headers), body))
+                status = 200 if self.path != "/missing" else 404
+        self.send_response(status)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def server_url(serve_http: Callable[[type[BaseHTTPRequestHandler]], str]) -> str:
+    """Get the URL of a local webhook sink."""
+    return serve_http(SinkHandler)
+
+
+@pytest.fixture
+def sink_url(server_url: str) -> str:
+    """Get the URL of a local webhook sink, which has received no requests yet."""
+    SinkHandler.requests = list()
+    SinkHandler.client_ports = set()
+    SinkHandler.num_throttled = dict()
+    return server_url
+
+
+@pytest.fixture
+def homes() -> list[Home]:
+    """Homes to send."""
+    return [
+        Home(url=f"https://some.url/{idx}", address=f"Vej {idx}", price=1_000_000)
+        for idx in range(10)
+    ]
+
+
+class TestWebhookNotifier:
+    """Tests for the `WebhookNotifier` class."""
+
+    def test_json_batches(self, sink_url: str, homes: list[Home]) -> None:
+        """Test that the homes are posted as JSON in batches."""
+        change = HomeChange(home=homes[0], kind="price_reduced", previous_price=2)
+        with WebhookNotifier(urls=[f"{sink_url}/hook"], batch_size=4) as notifier:
+            num_requests = notifier.send(homes=homes, changes=[change])
+        assert num_requests == 3
+        payloads = [json.loads(body) for _, _, body in SinkHandler.requests]
+        assert sorted(len(payload["homes"]) for payload in payloads) == [2, 4, 4]
+        posted_urls = {home["url"] for payload in payloads for home in payload["homes"]}
+        assert posted_urls == {home.url for home in homes}
+        (posted_change,) = [
+            change for payload in payloads for change in payload["changes"]
+        ]
+        assert posted_change["kind"] == "price_reduced"
+
+    def test_ntfy_message(self, sink_url: str, homes: list[Home]) -> None:
+        """Test that a single home is posted as a plain text ntfy message."""
+        with WebhookNotifier(
+            urls=[f"{sink_url}/topic"], webhook_format="ntfy"
+        ) as notifier:
+            notifier.send(homes=homes[:1])
+        ((path, headers, body),) = SinkHandler.requests
+        assert path == "/topic"
+        assert headers["Title"] == "[BoligPing] Found a new home!"
+        assert headers["Click"] == homes[0].url
+        assert body.decode() == homes[0].to_text()
+
+    def test_connections_are_reused(self, sink_url: str, homes: list[Home]) -> None:
+        """Test that many batches are delivered over a few keep-alive connections."""
+        with WebhookNotifier(
+            urls=[f"{sink_url}/hook"], batch_size=1, max_concurrency=2
+        ) as notifier:
+            for _ in range(5):
+                notifier.send(homes=homes)
+        assert len(SinkHandler.requests) == 50
+        assert len(SinkHandler.client_ports) <= 2
+
+    def test_throttled_requests_are_retried(
+        self, sink_url: str, homes: list[Home]
+    ) -> None:
+        """Test that a throttled request is retried."""
+        with WebhookNotifier(urls=[f"{sink_url}/flaky"]) as notifier:
+            notifier.send(homes=homes)
+        assert len(SinkHandler.requests) == 1
+
+    def test_failed_requests_raise(self, sink_url: str, homes: list[Home]) -> None:
+        """Test that a failing webhook raises, after posting to the other webhooks."""
+        with WebhookNotifier(
+            urls=[f"{sink_url}/missing", f"{sink_url}/hook"]
+        ) as notifier:
+            with pytest.raises(requests.HTTPError):
+                notifier.send(homes=homes)
+        assert {path for path, _, _ in SinkHandler.requests} == {"/missing", "/hook"}
+
+    def test_nothing_to_send(self, sink_url: str) -> None:
+        """Test that no requests are made without homes."""
+        with WebhookNotifier(urls=[f"{sink_url}/hook"]) as notifier:
+            assert notifier.send(homes=[]) == 0
+        assert SinkHandler.requests == []